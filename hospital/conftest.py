@@ -0,0 +1,109 @@
+import json
+from datetime import time, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from doctors import aio
+from doctors.models import Appointment, Doctor, Schedule
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--perf-results",
+        default=None,
+        help="Путь к JSON-файлу с результатами замеров производительности.",
+    )
+    parser.addoption(
+        "--perf-latency",
+        action="store_true",
+        help="Проверять бюджеты времени ответа (p95) из performance_budgets.json.",
+    )
+
+
+def pytest_configure(config):
+    config.perf_results = []
+
+
+def pytest_sessionfinish(session, exitstatus):
+    path = session.config.getoption("--perf-results")
+    if path and session.config.perf_results:
+        with open(path, "w", encoding="utf-8") as stream:
+            json.dump(session.config.perf_results, stream, ensure_ascii=False, indent=2)
+
+
+class Replica:
+    """Локальная реплика: копия основной SQLite-базы по требованию."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def sync(self):
+        from hospital.database import copy_sqlite_database
+
+        copy_sqlite_database("default", self.alias)
+
+
+@pytest.fixture
+def replica(settings):
+    """Включает чтение с реплики ``replica`` и синхронизирует её с основной базой."""
+    settings.DATABASE_REPLICAS = ["replica"]
+    replica = Replica("replica")
+    replica.sync()
+    return replica
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Локальный кэш общий для всех тестов процесса: каждый начинает с пустого."""
+    cache.clear()
+
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    """Новый пул ``doctors.aio``: его потоки открывают подключения уже внутри теста."""
+    monkeypatch.setattr(aio, "_executor", None)
+    yield
+    if aio._executor is not None:
+        aio._executor.shutdown()
+
+
+@pytest.fixture
+def doctor():
+    return Doctor.objects.create(name="Сидоров Сидор", specialization="Невролог", office="303")
+
+
+@pytest.fixture
+def patient():
+    return User.objects.create_user("patient", "patient@example.com", "password")
+
+
+@pytest.fixture
+def tomorrow():
+    return timezone.localdate() + timedelta(days=1)
+
+
+@pytest.fixture
+def schedule(doctor):
+    """Добавляет врачу ``doctor`` приём в день недели даты ``day``."""
+
+    def add(day, start=time(9, 0), end=time(10, 0)):
+        return Schedule.objects.create(
+            doctor=doctor, day_of_week=day.isoweekday(), start_time=start, end_time=end
+        )
+
+    return add
+
+
+@pytest.fixture
+def book(doctor, patient):
+    """Записывает пациента ``patient`` к врачу ``doctor`` на ``date`` и ``time``."""
+
+    def create(date, time=time(9, 0), **fields):
+        fields.setdefault("doctor", doctor)
+        fields.setdefault("patient", patient)
+        return Appointment.objects.create(date=date, time=time, **fields)
+
+    return create
@@ -1,6 +1,117 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.paginator import Paginator
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 
-from .models import Doctor, Schedule, Appointment
+from . import stats, waitlist
+from .cache import AVAILABILITY, bump_version
+from .models import (
+    Doctor, Schedule, Appointment, AppointmentArchive, Notification, WaitlistEntry,
+    is_slot_conflict,
+)
+from .search import search_doctors
+
+
+ADMIN_SEARCH_LIMIT = 500
+# Точное число строк считается не дальше этого предела.
+ADMIN_COUNT_LIMIT = 10000
+
+
+def estimate_row_count(model, using):
+    """
+    Оценка числа строк таблицы из статистики базы данных
+    или ``None``, если статистики нет.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif (
+            connection.vendor == "sqlite"
+            and "sqlite_stat1" in connection.introspection.table_names(cursor)
+        ):
+            # Заполняется командой ANALYZE; первое число в stat — строки таблицы.
+            cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    return estimate if estimate > 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator без полного ``COUNT(*)``.
+
+    Для всей таблицы берётся оценка из статистики базы, для отфильтрованного
+    списка строки считаются не дальше ``ADMIN_COUNT_LIMIT``: дальние
+    страницы большого списка удобнее открывать фильтрами и датами.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_COUNT_LIMIT:
+                return estimate
+        return queryset.order_by()[:ADMIN_COUNT_LIMIT].count()
+
+
+class DoctorFilter(admin.SimpleListFilter):
+    """
+    Фильтр по слагу врача в виде поля ввода: список всех врачей
+    в боковой панели строится слишком долго.
+    """
+
+    title = "врачу"
+    parameter_name = "doctor"
+    template = "admin/input_filter.html"
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        # Остальные параметры фильтрации передаются скрытыми полями формы.
+        yield {
+            "value": self.value() or "",
+            "other_params": [
+                (key, value)
+                for key, value in changelist.get_filters_params().items()
+                if key != self.parameter_name
+            ],
+            "reset_query_string": changelist.get_query_string(remove=[self.parameter_name]),
+        }
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(doctor__slug=self.value())
+        return queryset
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без полного подсчёта строк и с навигацией по датам через индекс."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = "admin/doctors/large_change_list.html"
+
+
+class SearchRankChangeList(ChangeList):
+    """Результаты поиска без выбранной сортировки идут по релевантности."""
+
+    def get_ordering(self, request, queryset):
+        if "search_rank" in queryset.query.annotations and ORDER_VAR not in self.params:
+            return ["search_rank", "-pk"]
+        return super().get_ordering(request, queryset)
 
 
 @admin.register(Doctor)
@@ -10,16 +121,117 @@ class DoctorAdmin(admin.ModelAdmin):
     search_fields = ("name", "specialization", "office")
     prepopulated_fields = {"slug": ("office",)}
 
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_doctors(queryset, search_term, limit=ADMIN_SEARCH_LIMIT), False
+
 
 @admin.register(Schedule)
-class ScheduleAdmin(admin.ModelAdmin):
+class ScheduleAdmin(LargeTableAdmin):
     list_display = ("doctor", "day_of_week", "start_time", "end_time", "office")
     list_editable = ("office",)
-    list_filter = ("doctor", "day_of_week")
+    list_filter = (DoctorFilter, "day_of_week")
+    list_select_related = ("doctor",)
+    autocomplete_fields = ("doctor",)
 
 
 @admin.register(Appointment)
-class AppointmentAdmin(admin.ModelAdmin):
+class AppointmentAdmin(LargeTableAdmin):
     list_display = ("doctor", "patient", "date", "time", "status")
     list_editable = ("status",)
-    list_filter = ("doctor", "date", "status")
+    list_filter = (DoctorFilter, "status")
+    list_select_related = ("doctor", "patient")
+    autocomplete_fields = ("doctor", "patient")
+    date_hierarchy = "date"
+    # Совпадает с индексом (date, time): страницы и фильтр по году читаются по индексу.
+    ordering = ("-date", "-time", "-id")
+    actions = ("mark_completed", "mark_cancelled")
+
+    def update_status(self, request, queryset, status):
+        """Меняет статус выбранных записей одним ``UPDATE``."""
+        doctor_ids = list(queryset.order_by().values_list("doctor_id", flat=True).distinct())
+        try:
+            with transaction.atomic():
+                stats.record_status_change(queryset, status)
+                if status == "cancelled":
+                    waitlist.release_slots(
+                        queryset.filter(
+                            is_published=True,
+                            status__in=Appointment.APPOINTMENT_STATUSES,
+                            date__gte=timezone.localdate(),
+                        ).values_list("doctor_id", "date", "time")
+                    )
+                updated = queryset.update(status=status)
+        except IntegrityError as error:
+            if not is_slot_conflict(error):
+                raise
+            self.message_user(
+                request,
+                "Статус не изменён: у врача уже есть активная запись на это время.",
+                messages.ERROR,
+            )
+            return
+        # update() не вызывает сигналы, поэтому кэш свободного времени сбрасывается здесь.
+        for doctor_id in doctor_ids:
+            bump_version(doctor_id, AVAILABILITY)
+        self.message_user(request, f"Изменено записей: {updated}.", messages.SUCCESS)
+
+    @admin.action(description="Отметить выбранные записи как завершённые")
+    def mark_completed(self, request, queryset):
+        self.update_status(request, queryset, "completed")
+
+    @admin.action(description="Отменить выбранные записи")
+    def mark_cancelled(self, request, queryset):
+        self.update_status(request, queryset, "cancelled")
+
+
+@admin.register(AppointmentArchive)
+class AppointmentArchiveAdmin(LargeTableAdmin):
+    """Архив только для просмотра: записи попадают в него командой archive_appointments."""
+
+    list_display = ("doctor", "patient", "date", "time", "status", "archived_at")
+    list_filter = ("status",)
+    list_select_related = ("doctor", "patient")
+    date_hierarchy = "date"
+    raw_id_fields = ("doctor", "patient")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Notification)
+class NotificationAdmin(LargeTableAdmin):
+    """Очередь писем только для просмотра: её разбирает команда send_notifications."""
+
+    list_display = (
+        "appointment_id", "waitlist_entry_id", "kind", "status", "attempts", "next_attempt_at",
+        "sent_at",
+    )
+    list_filter = ("status", "kind")
+    ordering = ("-id",)
+    raw_id_fields = ("appointment", "waitlist_entry")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WaitlistEntry)
+class WaitlistEntryAdmin(LargeTableAdmin):
+    list_display = (
+        "doctor", "patient", "date_from", "date_to", "status", "offer_date", "offer_time",
+        "created_at",
+    )
+    list_filter = (DoctorFilter, "status")
+    list_select_related = ("doctor", "patient")
+    ordering = ("-id",)
+    raw_id_fields = ("doctor", "patient")
@@ -0,0 +1,120 @@
+"""
+Обращения к базе из асинхронных view.
+
+ORM Django синхронный, поэтому запросы выполняются в отдельном пуле
+потоков ограниченного размера (``ASYNC_DB_WORKERS``): число одновременных
+подключений к базе не растёт вместе с числом открытых HTTP-запросов.
+Задачи передаются в пул через ``sync_to_async``, как синхронные view
+у Django, а вокруг каждой задачи, как вокруг запроса, вызывается
+``close_old_connections``: поток держит своё подключение между задачами,
+пока не истечёт ``CONN_MAX_AGE``. Потоки пула не переживают ``fork``
+(gunicorn ``--preload``), поэтому дочерний процесс создаёт свой пул.
+
+Обращения к локальному кэшу (``LocMemCache``) — это чтение памяти без
+ожидания, они выполняются прямо в цикле событий. Обращения к внешнему
+кэшу блокируют поток и тоже идут через пул.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import close_old_connections
+
+from . import cache
+from .models import Doctor
+from .slots import CachedRange, WeeklySlotGrid, free_slots_by_date, occupied_rows, schedule_rows
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "ASYNC_DB_WORKERS", 8),
+                thread_name_prefix="async-db",
+            )
+        return _executor
+
+
+def _forget_executor():
+    # После fork от пула остаётся объект без потоков: задачи в нём ждали бы
+    # вечно. Блокировку тоже заменяем — её мог держать другой поток.
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_executor)
+
+
+def _run_task(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет ``func`` в пуле потоков базы данных в контексте вызывающего кода."""
+    task = sync_to_async(_run_task, thread_sensitive=False, executor=get_executor())
+    return await task(func, *args, **kwargs)
+
+
+async def run_cache(func, *args, **kwargs):
+    """Выполняет обращение к кэшу: в цикле событий для локального кэша, иначе в пуле."""
+    if isinstance(cache.get_cache(), LocMemCache):
+        return func(*args, **kwargs)
+    return await run_db(func, *args, **kwargs)
+
+
+def _load_user_and_doctor(request, slug):
+    # Пользователь загружается из сессии лениво; здесь это происходит в потоке пула.
+    user = request.user
+    if not user.is_authenticated:
+        return user, None
+    doctor_id = (
+        Doctor.objects.filter(slug=slug, is_published=True)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    return user, doctor_id
+
+
+async def load_user_and_doctor(request, slug):
+    """Пара ``(user, doctor_id)`` за одно обращение к пулу."""
+    return await run_db(_load_user_and_doctor, request, slug)
+
+
+def login_redirect(request):
+    return redirect_to_login(request.get_full_path())
+
+
+async def get_free_slots_range(doctor_id, start_date, days):
+    """
+    Асинхронный ``get_cached_free_slots_range``.
+
+    Если все дни есть в локальном кэше, ответ собирается без пула потоков.
+    Иначе расписание и занятые записи загружаются параллельно.
+    """
+    cached = await run_cache(CachedRange, doctor_id, start_date, days)
+    if cached.slots is not None:
+        return cached.slots
+
+    dates = cached.dates
+    rows, occupied = await asyncio.gather(
+        run_db(schedule_rows, doctor_id),
+        run_db(occupied_rows, doctor_id, dates[0], dates[-1]),
+    )
+    return await run_cache(
+        cached.store, free_slots_by_date(WeeklySlotGrid(rows), dates, occupied)
+    )
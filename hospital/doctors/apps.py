@@ -5,3 +5,9 @@ class DoctorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'doctors'
     verbose_name = 'Врачи'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from hospital.database import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid="configure_sqlite")
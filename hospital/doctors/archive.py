@@ -0,0 +1,78 @@
+"""
+Перенос старых записей на приём в архив.
+
+Записи с датой раньше срока хранения переносятся пачками: в одной
+транзакции пачка вставляется в ``AppointmentArchive`` с теми же ``id``
+и удаляется из ``Appointment``. Прерванный перенос продолжается
+повторным запуском: уже перенесённые записи в горячей таблице не остаются,
+а повторная вставка тех же ``id`` пропускается.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cache import AVAILABILITY, bump_version
+from .models import Appointment, AppointmentArchive
+from .roster import chunked
+
+
+ARCHIVE_FIELDS = ("id", "doctor_id", "patient_id", "date", "time", "status", "is_published")
+
+
+def retention_cutoff(days=None):
+    """Первая дата, записи на которую остаются в горячей таблице."""
+    if days is None:
+        days = getattr(settings, "APPOINTMENT_RETENTION_DAYS", 365)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def delete_rows(using, ids):
+    """
+    Удаляет записи ``DELETE`` по списку ``id``. ``QuerySet.delete()`` загрузил бы
+    каждую строку ради сигналов, а они здесь не нужны: счётчики
+    ``DoctorDayStats`` за прошедшие дни остаются, версии кэша увеличиваются
+    один раз на врача, а уведомления ссылаются на запись без внешнего ключа.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(Appointment._meta.db_table)
+    column = connection.ops.quote_name(Appointment._meta.pk.column)
+    # Число параметров в запросе ограничено (SQLite до 3.32 — 999).
+    step = connection.features.max_query_params or len(ids)
+    with connection.cursor() as cursor:
+        for chunk in chunked(ids, step):
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(f"DELETE FROM {table} WHERE {column} IN ({placeholders})", chunk)
+
+
+def archive_batch(cutoff, batch_size, using="default"):
+    """Переносит одну пачку записей старше ``cutoff``; возвращает её размер."""
+    with transaction.atomic(using=using):
+        rows = list(
+            Appointment.objects.using(using)
+            .filter(date__lt=cutoff)
+            .order_by("date", "pk")
+            .select_for_update()
+            .values_list(*ARCHIVE_FIELDS)[:batch_size]
+        )
+        if not rows:
+            return 0
+        AppointmentArchive.objects.using(using).bulk_create(
+            [AppointmentArchive(**dict(zip(ARCHIVE_FIELDS, row))) for row in rows],
+            ignore_conflicts=True,
+        )
+        delete_rows(using, [row[0] for row in rows])
+
+    for doctor_id in {row[1] for row in rows}:
+        bump_version(doctor_id, AVAILABILITY)
+    return len(rows)
+
+
+def archive_appointments(cutoff, batch_size=5000, using="default"):
+    """Переносит все записи старше ``cutoff``, возвращая размер каждой пачки."""
+    while True:
+        moved = archive_batch(cutoff, batch_size, using)
+        if not moved:
+            return
+        yield moved
@@ -0,0 +1,185 @@
+"""
+Версионированный кэш данных врача.
+
+Ключ записи содержит врача и версию его данных. Версия увеличивается
+сигналами при изменениях после фиксации транзакции, поэтому устаревшие
+значения не удаляются, а просто перестают читаться. Читатель берёт
+версию до запроса к базе: данные, посчитанные до фиксации, попадают
+под старую версию. Версии ведутся отдельно для свободных слотов
+(меняются вместе с записями на приём и расписанием) и для фрагментов
+шаблонов (меняются вместе с врачом и расписанием). Модуль работает
+с любым бэкендом кэша Django.
+
+Кэш общий для всех, поэтому в него пишутся только данные основной базы.
+Прочитанное с отстающей реплики легло бы под уже увеличенную версию
+и читалось бы до следующего изменения. Пока чтение закреплено
+за основной базой, кэш не используется вовсе.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+from django.db import transaction
+
+from hospital import database
+
+
+CACHE_ALIAS = "default"
+
+AVAILABILITY = "availability"
+FRAGMENTS = "fragments"
+SLOTS_TIMEOUT = 60 * 60
+FRAGMENT_TIMEOUT = 60 * 60
+VERSION_TIMEOUT = None
+
+VERSION_KEY = "doctors:{namespace}:version:{doctor_id}"
+SLOTS_KEY = "doctors:availability:{doctor_id}:{version}:{date}"
+STATS_KEY = "doctors:availability:stats:{name}"
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def reads_enabled():
+    """Можно ли в текущем запросе читать кэш."""
+    return not database.is_pinned()
+
+
+def writes_enabled():
+    """Можно ли в текущем запросе писать в кэш."""
+    return reads_enabled() and not database.reads_from_replica()
+
+
+def _initial_version():
+    # Если ключ версии вытеснен из кэша, новая версия не совпадёт
+    # со старыми ключами и не вернёт устаревшие слоты.
+    return time.time_ns() // 1000
+
+
+def get_version(doctor_id, namespace=AVAILABILITY):
+    """Текущая версия данных врача в пространстве ``namespace``."""
+    cache = get_cache()
+    key = VERSION_KEY.format(namespace=namespace, doctor_id=doctor_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def get_versions(doctor_ids, namespace=AVAILABILITY):
+    """Версии сразу для нескольких врачей одним обращением к кэшу."""
+    cache = get_cache()
+    keys = {
+        VERSION_KEY.format(namespace=namespace, doctor_id=doctor_id): doctor_id
+        for doctor_id in doctor_ids
+    }
+    versions = {keys[key]: value for key, value in cache.get_many(keys).items()}
+    for doctor_id in set(keys.values()) - set(versions):
+        versions[doctor_id] = get_version(doctor_id, namespace)
+    return versions
+
+
+def bump_version(doctor_id, namespace=AVAILABILITY):
+    """Делает недействительными все закэшированные данные врача в ``namespace``."""
+    cache = get_cache()
+    key = VERSION_KEY.format(namespace=namespace, doctor_id=doctor_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), VERSION_TIMEOUT)
+
+
+def bump_version_on_commit(doctor_id, namespace=AVAILABILITY, using=None):
+    """
+    ``bump_version`` после фиксации текущей транзакции (без транзакции — сразу).
+    Иначе читатель, получивший новую версию до фиксации, положил бы под
+    неё ещё старые данные.
+    """
+    transaction.on_commit(lambda: bump_version(doctor_id, namespace), using=using)
+
+
+def attach_fragment_versions(doctors):
+    """
+    Проставляет врачам ``fragment_version`` для ключей кэша фрагментов
+    шаблонов (карточка врача, таблица расписания) и ``fragment_timeout``.
+
+    Шаблон отрисовывается уже после выхода из view, поэтому решение
+    принимается здесь. Нулевой срок — фрагмент не сохраняется; без
+    версии — и не читается.
+    """
+    versions = {}
+    if reads_enabled():
+        versions = get_versions([doctor.pk for doctor in doctors], FRAGMENTS)
+    timeout = FRAGMENT_TIMEOUT if writes_enabled() else 0
+    for doctor in doctors:
+        doctor.fragment_version = versions.get(doctor.pk)
+        doctor.fragment_timeout = timeout
+    return doctors
+
+
+def slots_key(doctor_id, version, day):
+    return SLOTS_KEY.format(doctor_id=doctor_id, version=version, date=day.isoformat())
+
+
+class CacheStats:
+    """
+    Счётчики попаданий и промахов кэша.
+
+    Значения копятся в процессе и периодически переносятся в общий кэш,
+    чтобы видеть суммарную долю попаданий по всем воркерам.
+    """
+
+    names = ("hits", "misses")
+    flush_every = 100
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local = dict.fromkeys(self.names, 0)
+        self._pending = dict.fromkeys(self.names, 0)
+
+    def record(self, name, count=1):
+        if not count:
+            return
+        with self._lock:
+            self.local[name] += count
+            self._pending[name] += count
+            should_flush = sum(self._pending.values()) >= self.flush_every
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, dict.fromkeys(self.names, 0)
+        cache = get_cache()
+        for name, count in pending.items():
+            if not count:
+                continue
+            key = STATS_KEY.format(name=name)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                if not cache.add(key, count, None):
+                    cache.incr(key, count)
+
+    def shared(self):
+        """Суммарные счётчики всех процессов."""
+        self.flush()
+        keys = {STATS_KEY.format(name=name): name for name in self.names}
+        values = get_cache().get_many(keys)
+        return {name: values.get(key, 0) for key, name in keys.items()}
+
+    def reset(self):
+        with self._lock:
+            self.local = dict.fromkeys(self.names, 0)
+            self._pending = dict.fromkeys(self.names, 0)
+        get_cache().delete_many([STATS_KEY.format(name=name) for name in self.names])
+
+    @staticmethod
+    def hit_rate(counters):
+        total = counters["hits"] + counters["misses"]
+        return counters["hits"] / total if total else 0.0
+
+
+stats = CacheStats()
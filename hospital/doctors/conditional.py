@@ -0,0 +1,123 @@
+"""
+Условные GET-запросы (ETag / Last-Modified) для страниц врачей.
+
+Состояние страницы вычисляется одним лёгким запросом по отметкам
+``updated_at`` и количеству строк, без отрисовки шаблона. Если клиент
+прислал совпадающие ``If-None-Match`` или ``If-Modified-Since``,
+возвращается ``304``.
+
+ETag учитывает пользователя и параметры запроса, а ``Last-Modified`` —
+только время изменения. Поэтому ``Last-Modified`` отдаётся лишь общему
+варианту страницы (аноним, без параметров): иначе ``If-Modified-Since``
+подтвердил бы клиенту страницу другого пользователя или другого поиска.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Doctor
+
+
+def make_etag(*parts):
+    return hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _viewer(request):
+    """
+    Часть ключа, зависящая от пользователя: шапка страницы у всех разная,
+    а формы содержат CSRF-токен, который меняется при каждом входе.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return "anonymous"
+    csrf_secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME, "")
+    return f"{user.pk}:{int(user.is_staff)}:{csrf_secret}"
+
+
+def _shared_last_modified(request, updated):
+    """``updated`` для общего варианта страницы, иначе ``None``."""
+    if request.user.is_authenticated or request.GET:
+        return None
+    return updated
+
+
+def _latest(*values):
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+def doctor_list_state(request, *args, **kwargs):
+    state = Doctor.objects.filter(is_published=True).aggregate(
+        updated=Max("updated_at"), total=Count("id")
+    )
+    etag = make_etag(
+        state["updated"], state["total"], request.GET.urlencode(), _viewer(request)
+    )
+    return _shared_last_modified(request, state["updated"]), etag
+
+
+def doctor_detail_state(request, slug, *args, **kwargs):
+    state = (
+        Doctor.objects.filter(slug=slug, is_published=True)
+        .annotate(schedule_updated=Max("schedules__updated_at"), schedules_total=Count("schedules"))
+        .values("updated_at", "schedule_updated", "schedules_total")
+        .first()
+    )
+    if state is None:
+        return None, None
+    updated = _latest(state["updated_at"], state["schedule_updated"])
+    etag = make_etag(updated, state["schedules_total"], _viewer(request))
+    return _shared_last_modified(request, updated), etag
+
+
+def availability_etag(request, doctor_id):
+    # Версия меняется при любом изменении записей или расписания врача.
+    return make_etag(doctor_id, cache.get_version(doctor_id), request.GET.urlencode())
+
+
+def availability_state(request, slug, *args, **kwargs):
+    doctor_id = (
+        Doctor.objects.filter(slug=slug, is_published=True)
+        .values_list("pk", flat=True)
+        .first()
+    )
+    if doctor_id is None:
+        return None, None
+    return None, availability_etag(request, doctor_id)
+
+
+def conditional_page(state_func):
+    """
+    Декоратор view: отвечает ``304`` для неизменившейся страницы.
+
+    ``state_func(request, *args, **kwargs)`` возвращает пару
+    ``(last_modified, etag)`` и вызывается один раз за запрос.
+    """
+    def decorator(view_func):
+        def get_state(request, *args, **kwargs):
+            if not hasattr(request, "_conditional_state"):
+                request._conditional_state = state_func(request, *args, **kwargs)
+            return request._conditional_state
+
+        conditional_view = condition(
+            etag_func=lambda request, *args, **kwargs: get_state(request, *args, **kwargs)[1],
+            last_modified_func=lambda request, *args, **kwargs: get_state(request, *args, **kwargs)[0],
+        )(view_func)
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # Ответы анонимам одинаковы и могут храниться общим кэшем;
+            # max-age=0 заставляет его перепроверять страницу через ETag.
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+            else:
+                patch_cache_control(response, public=True, max_age=0, must_revalidate=True)
+            return response
+        return wrapper
+    return decorator
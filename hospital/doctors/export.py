@@ -0,0 +1,103 @@
+"""
+Выгрузка записей на приём для отчётов.
+
+Строки читаются курсором базы (``iterator``) пачками по ``chunk_size``
+через ``values_list`` с именами врача и пациента из JOIN: объекты моделей
+не создаются, и расход памяти не зависит от числа строк. Текст
+формируется пачками строк, поэтому выгрузку можно отдавать потоком
+(``StreamingHttpResponse``) или писать в файл командой
+``export_appointments``.
+"""
+import csv
+import io
+import json
+
+from .models import Appointment, AppointmentArchive
+
+
+APPOINTMENT_FIELDS = (
+    "id", "date", "time", "status", "doctor", "doctor_name", "specialization",
+    "patient", "patient_name",
+)
+APPOINTMENT_COLUMNS = (
+    "pk", "date", "time", "status", "doctor__slug", "doctor__name",
+    "doctor__specialization", "patient__username", "patient__first_name",
+    "patient__last_name",
+)
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+ROWS_PER_WRITE = 500
+
+
+def export_queryset(date_from=None, date_to=None, doctor=None, status=None, archived=False):
+    """
+    Строки выгрузки по фильтрам; ``doctor`` — слаг врача.
+
+    База выбирается сразу (``using``), а не при первом чтении: поток
+    читается уже после выхода из view, вне ``replica_reads``.
+    """
+    model = AppointmentArchive if archived else Appointment
+    queryset = model.objects.all()
+    if date_from:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(date__lte=date_to)
+    if doctor:
+        queryset = queryset.filter(doctor__slug=doctor)
+    if status:
+        queryset = queryset.filter(status=status)
+    return (
+        queryset.using(queryset.db)
+        .order_by("date", "time", "pk")
+        .values_list(*APPOINTMENT_COLUMNS)
+    )
+
+
+def export_rows(queryset, chunk_size=2000):
+    for pk, date, time, status, slug, name, specialization, username, first, last in (
+        queryset.iterator(chunk_size=chunk_size)
+    ):
+        yield (
+            pk, date.isoformat(), time.strftime("%H:%M"), status, slug, name,
+            specialization, username, f"{last} {first}".strip(),
+        )
+
+
+def iter_csv(rows):
+    """Текст CSV с заголовком, по ``ROWS_PER_WRITE`` строк за раз."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(APPOINTMENT_FIELDS)
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % ROWS_PER_WRITE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(rows):
+    """Текст JSON Lines, по ``ROWS_PER_WRITE`` строк за раз."""
+    lines = []
+    for row in rows:
+        lines.append(json.dumps(dict(zip(APPOINTMENT_FIELDS, row)), ensure_ascii=False))
+        if len(lines) == ROWS_PER_WRITE:
+            lines.append("")
+            yield "\n".join(lines)
+            lines = []
+    if lines:
+        lines.append("")
+        yield "\n".join(lines)
+
+
+ENCODERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+
+def export_appointments(queryset, fmt, chunk_size=2000):
+    """Куски текста выгрузки в формате ``fmt`` (``csv`` или ``jsonl``)."""
+    return ENCODERS[fmt](export_rows(queryset, chunk_size))
@@ -1,9 +1,15 @@
+from datetime import timedelta
+
 from django import forms
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from django.forms import ModelForm
+from django.forms.fields import CallableChoiceIterator
 from django.utils import timezone
 
-from .models import Appointment, Schedule
+from . import notifications
+from .models import Appointment, Notification, is_slot_conflict
+from .slots import get_cached_free_slots
 
 
 class AppointmentForm(forms.ModelForm):
@@ -24,8 +30,10 @@ class AppointmentForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         self.doctor = doctor
         if self.doctor:
-            selected_date = self.get_selected_date()
-            self.fields["time"].choices = self._get_available_times(selected_date)
+            # Слоты считаются только при отрисовке выпадающего списка.
+            self.fields["time"].choices = CallableChoiceIterator(
+                lambda: self._get_available_times(self.get_selected_date())
+            )
 
     def get_selected_date(self):
         if self.is_bound:
@@ -41,56 +49,98 @@ class AppointmentForm(forms.ModelForm):
         """
         Возвращает список доступных временных интервалов для записи на прием к врачу.
         """
-        day_of_week = selected_date.isoweekday()
-        if not hasattr(self, "_schedule_cache"):
-            self._schedule_cache = {}
+        return [(label, label) for label in get_cached_free_slots(self.doctor, selected_date)]
+
+    def book(self, patient):
+        """
+        Сохраняет запись на приём.
 
-        if day_of_week not in self._schedule_cache:
-            self._schedule_cache[day_of_week] = Schedule.objects.filter(
-                doctor=self.doctor, day_of_week=day_of_week
+        Занятость времени проверяет уникальное ограничение в базе данных,
+        поэтому отдельного запроса перед вставкой нет. Если время уже
+        заняли, в форму добавляется ошибка и возвращается ``None``.
+        """
+        appointment = self.save(commit=False)
+        appointment.doctor = self.doctor
+        appointment.patient = patient
+        try:
+            with transaction.atomic():
+                appointment.save()
+                notifications.enqueue(appointment, Notification.BOOKED)
+        except IntegrityError as error:
+            if not is_slot_conflict(error):
+                raise
+            date, time = appointment.date, appointment.time
+            self.add_error(
+                None,
+                f"Время {time.strftime('%H:%M')} на {date.strftime('%Y-%m-%d')} уже занято."
             )
+            return None
+        return appointment
+
+
+class WaitlistForm(forms.Form):
+    """Диапазон дат, в который пациент готов прийти на освободившееся время."""
+
+    MAX_DAYS = 60
+
+    date_from = forms.DateField()
+    date_to = forms.DateField()
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get("date_from"), cleaned_data.get("date_to")
+        if not (date_from and date_to):
+            return cleaned_data
+        if date_from < timezone.localdate():
+            raise forms.ValidationError("Начало периода уже прошло.")
+        if date_from > date_to:
+            raise forms.ValidationError("Начало периода позже его окончания.")
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise forms.ValidationError(f"Период не может быть длиннее {self.MAX_DAYS} дней.")
+        return cleaned_data
+
+
+class ReportPeriodForm(forms.Form):
+    """Период отчёта о загрузке врачей."""
 
-        schedule_entries = self._schedule_cache[day_of_week]
-
-        occupied_times = set(
-            Appointment.objects.filter(
-                doctor=self.doctor,
-                date=selected_date,
-                status__in=["scheduled", "completed"],
-            ).values_list("time", flat=True)
-        )
-
-        available_times = []
-        for entry in schedule_entries:
-            current_time = entry.start_time
-            while current_time < entry.end_time:
-                if current_time not in occupied_times:
-                    available_times.append(
-                        (current_time.strftime("%H:%M"), current_time.strftime("%H:%M"))
-                    )
-                current_time = (
-                    timezone.datetime.combine(selected_date, current_time)
-                    + timezone.timedelta(minutes=30)
-                ).time()
-
-        return available_times
+    MAX_DAYS = 366
+
+    date_from = forms.DateField(
+        label="С", widget=forms.DateInput(attrs={"type": "date"}), required=False
+    )
+    date_to = forms.DateField(
+        label="По", widget=forms.DateInput(attrs={"type": "date"}), required=False
+    )
 
     def clean(self):
         cleaned_data = super().clean()
-        date = cleaned_data.get("date")
-        time = cleaned_data.get("time")
-
-        if date and time:
-            if Appointment.objects.filter(
-                doctor=self.doctor,
-                date=date,
-                time=time,
-                status__in=["scheduled", "completed"],
-            ).exists():
-                raise forms.ValidationError(
-                    f"Время {time.strftime('%H:%M')} на {date.strftime('%Y-%m-%d')} уже занято."
-                )
+        today = timezone.localdate()
+        date_to = cleaned_data.get("date_to") or today
+        date_from = cleaned_data.get("date_from") or date_to - timedelta(days=29)
+        if date_from > date_to:
+            raise forms.ValidationError("Начало периода позже его окончания.")
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise forms.ValidationError(f"Период не может быть длиннее {self.MAX_DAYS} дней.")
+        cleaned_data["date_from"], cleaned_data["date_to"] = date_from, date_to
+        return cleaned_data
+
+
+class AppointmentExportForm(forms.Form):
+    """Фильтры выгрузки записей на приём."""
 
+    date_from = forms.DateField(required=False)
+    date_to = forms.DateField(required=False)
+    doctor = forms.SlugField(required=False)
+    status = forms.ChoiceField(choices=Appointment.STATUS_CHOICES, required=False)
+    archived = forms.BooleanField(required=False)
+    format = forms.ChoiceField(choices=(("csv", "CSV"), ("jsonl", "JSON Lines")), required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get("date_from"), cleaned_data.get("date_to")
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("Начало периода позже его окончания.")
+        cleaned_data["format"] = cleaned_data.get("format") or "csv"
         return cleaned_data
 
 
@@ -0,0 +1,151 @@
+"""
+Уменьшенные копии фотографий врачей.
+
+Для каждой загруженной фотографии строятся копии фиксированной ширины
+в JPEG и WebP. Они сохраняются рядом с оригиналом в том же хранилище
+(``MEDIA_ROOT``) и используются в ``srcset``. Обработка выполняется
+в пуле потоков после фиксации транзакции, чтобы не задерживать запрос.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import FRAGMENTS, bump_version
+
+
+logger = logging.getLogger(__name__)
+
+VARIANT_WIDTHS = (320, 640)
+VARIANT_FORMATS = (
+    ("webp", "WEBP", "image/webp"),
+    ("jpg", "JPEG", "image/jpeg"),
+)
+QUALITY = 82
+# Pillow 9.1+ держит фильтры в Image.Resampling, Pillow 10 убрал старые имена.
+LANCZOS = getattr(Image, "Resampling", Image).LANCZOS
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(name, width, extension):
+    stem, _ = os.path.splitext(name)
+    return f"{stem}_w{width}.{extension}"
+
+
+def variant_names(name):
+    return [
+        variant_name(name, width, extension)
+        for extension, _, _ in VARIANT_FORMATS
+        for width in VARIANT_WIDTHS
+    ]
+
+
+def variant_widths(source_width):
+    """Ширины копий: копия не бывает шире оригинала."""
+    return [width for width in VARIANT_WIDTHS if width <= source_width]
+
+
+def srcset(name, extension, source_width, storage=default_storage):
+    """Значение атрибута ``srcset`` для копий одного формата."""
+    return ", ".join(
+        f"{storage.url(variant_name(name, width, extension))} {width}w"
+        for width in variant_widths(source_width)
+    )
+
+
+def build_variants(name, storage=default_storage):
+    """
+    Строит копии фотографии ``name``; существующие перезаписываются.
+    Возвращает ширину оригинала.
+    """
+    with storage.open(name, "rb") as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    for width in variant_widths(image.width):
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), LANCZOS)
+        else:
+            resized = image
+        for extension, image_format, _ in VARIANT_FORMATS:
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=QUALITY, optimize=True)
+            target = variant_name(name, width, extension)
+            if storage.exists(target):
+                storage.delete(target)
+            storage.save(target, ContentFile(buffer.getvalue()))
+    return image.width
+
+
+def delete_variants(name, storage=default_storage):
+    for target in variant_names(name):
+        if storage.exists(target):
+            storage.delete(target)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+                thread_name_prefix="image-variants",
+            )
+        return _executor
+
+
+def process_doctor_image(doctor_id, name):
+    """Строит копии и отмечает врача как готового к выводу ``srcset``."""
+    from .models import Doctor
+
+    width = build_variants(name)
+    Doctor.objects.filter(pk=doctor_id, image=name).update(
+        image_variants_ready=True, image_width=width, updated_at=timezone.now()
+    )
+    bump_version(doctor_id, FRAGMENTS)
+
+
+def _run_in_worker(doctor_id, name):
+    close_old_connections()
+    try:
+        process_doctor_image(doctor_id, name)
+    except Exception:
+        logger.exception("Не удалось построить копии изображения %s", name)
+    finally:
+        close_old_connections()
+
+
+def _delete_in_worker(name):
+    try:
+        delete_variants(name)
+    except Exception:
+        logger.exception("Не удалось удалить копии изображения %s", name)
+
+
+def schedule_doctor_image(doctor_id, name):
+    """Ставит построение копий в очередь пула потоков."""
+    if getattr(settings, "IMAGE_VARIANTS_SYNC", False):
+        process_doctor_image(doctor_id, name)
+    else:
+        get_executor().submit(_run_in_worker, doctor_id, name)
+
+
+def schedule_variants_cleanup(name):
+    """Ставит удаление копий заменённой или удалённой фотографии в очередь."""
+    if getattr(settings, "IMAGE_VARIANTS_SYNC", False):
+        delete_variants(name)
+    else:
+        get_executor().submit(_delete_in_worker, name)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from doctors.archive import archive_appointments, retention_cutoff
+from doctors.models import Appointment
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит записи на приём старше срока хранения в архив пачками. "
+        "Прерванный перенос продолжается повторным запуском."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=None,
+            help="Срок хранения в днях (по умолчанию APPOINTMENT_RETENTION_DAYS).",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Только посчитать записи для переноса."
+        )
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff(options["days"])
+        if options["dry_run"]:
+            count = Appointment.objects.filter(date__lt=cutoff).count()
+            self.stdout.write(f"Записей раньше {cutoff}: {count}")
+            return
+
+        moved = 0
+        for batch in archive_appointments(cutoff, options["batch_size"]):
+            moved += batch
+            self.stdout.write(f"Перенесено: {moved}", ending="\r")
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(f"В архив перенесено записей раньше {cutoff}: {moved}"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from doctors.cache import CacheStats, stats
+
+
+class Command(BaseCommand):
+    help = "Показывает счётчики попаданий и промахов кэша доступности."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Обнулить счётчики после вывода."
+        )
+
+    def handle(self, *args, **options):
+        counters = stats.shared()
+        self.stdout.write(
+            f"Попадания: {counters['hits']}\n"
+            f"Промахи: {counters['misses']}\n"
+            f"Доля попаданий: {CacheStats.hit_rate(counters):.1%}"
+        )
+        if options["reset"]:
+            stats.reset()
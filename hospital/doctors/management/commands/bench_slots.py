@@ -0,0 +1,56 @@
+from datetime import date, datetime, time, timedelta
+from timeit import Timer
+
+from django.core.management.base import BaseCommand
+
+from doctors.slots import WeeklySlotGrid
+
+
+def legacy_free_slots(rows, selected_date, occupied_times):
+    """Прежний расчёт слотов: шаг в 30 минут через ``datetime.combine``."""
+    available_times = []
+    for day_of_week, start_time, end_time in rows:
+        if day_of_week != selected_date.isoweekday():
+            continue
+        current_time = start_time
+        while current_time < end_time:
+            if current_time not in occupied_times:
+                available_times.append(current_time.strftime("%H:%M"))
+            current_time = (
+                datetime.combine(selected_date, current_time) + timedelta(minutes=30)
+            ).time()
+    return available_times
+
+
+class Command(BaseCommand):
+    help = "Сравнивает скорость расчёта свободных слотов с прежним циклом."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=20000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows = [
+            (day, time(8, 0), time(12, 0)) for day in range(1, 8)
+        ] + [
+            (day, time(13, 0), time(20, 0)) for day in range(1, 8)
+        ]
+        selected_date = date(2025, 1, 13)
+        occupied = {time(9, 0), time(10, 30), time(14, 0), time(17, 30)}
+
+        grid = WeeklySlotGrid(rows)
+        expected = legacy_free_slots(rows, selected_date, occupied)
+        actual = grid.free_labels(selected_date, occupied)
+        if actual != expected:
+            self.stderr.write("Результаты расчёта не совпадают.")
+            return
+
+        number, repeat = options["number"], options["repeat"]
+        cases = (
+            ("legacy", lambda: legacy_free_slots(rows, selected_date, occupied)),
+            ("compile+grid", lambda: WeeklySlotGrid(rows).free_labels(selected_date, occupied)),
+            ("grid", lambda: grid.free_labels(selected_date, occupied)),
+        )
+        for name, func in cases:
+            best = min(Timer(func).repeat(repeat=repeat, number=number)) / number
+            self.stdout.write(f"{name:>14}: {best * 1e6:8.2f} мкс на вызов")
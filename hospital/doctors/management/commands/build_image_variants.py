@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from doctors.cache import FRAGMENTS, bump_version
+from doctors.images import build_variants
+from doctors.models import Doctor
+
+
+class Command(BaseCommand):
+    help = "Строит уменьшенные копии фотографий врачей, у которых их ещё нет."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="Перестроить копии для всех врачей."
+        )
+        parser.add_argument("--workers", type=int, default=4)
+
+    def handle(self, *args, **options):
+        doctors = Doctor.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["force"]:
+            doctors = doctors.filter(image_variants_ready=False)
+        rows = list(doctors.values_list("pk", "image"))
+
+        # Потоки только обрабатывают файлы, база обновляется в основном потоке.
+        built, failed = [], 0
+        now = timezone.now()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            futures = {executor.submit(build_variants, name): (pk, name) for pk, name in rows}
+            for future in as_completed(futures):
+                pk, name = futures[future]
+                try:
+                    width = future.result()
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    built.append(Doctor(
+                        pk=pk, image_variants_ready=True, image_width=width, updated_at=now
+                    ))
+
+        Doctor.objects.bulk_update(
+            built, ["image_variants_ready", "image_width", "updated_at"], batch_size=500
+        )
+        for doctor in built:
+            bump_version(doctor.pk, FRAGMENTS)
+
+        self.stdout.write(self.style.SUCCESS(f"Готово: {len(built)}, ошибок: {failed}"))
@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.export import export_appointments, export_queryset
+from doctors.forms import AppointmentExportForm
+from doctors.roster import detect_format
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает записи на приём в CSV или JSON Lines потоком, "
+        "не загружая их в память целиком."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", help="Дата начала, ГГГГ-ММ-ДД.")
+        parser.add_argument("--to", dest="date_to", help="Дата окончания, ГГГГ-ММ-ДД.")
+        parser.add_argument("--doctor", help="Слаг врача.")
+        parser.add_argument("--status")
+        parser.add_argument("--archived", action="store_true", help="Выгрузить архив.")
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--output", help="Путь к файлу; по умолчанию stdout.")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        output = options["output"]
+        form = AppointmentExportForm({
+            key: options[key]
+            for key in ("date_from", "date_to", "doctor", "status", "archived")
+            if options[key]
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+        filters = dict(form.cleaned_data)
+        filters.pop("format")
+        fmt = detect_format(output or "", options["format"])
+        chunks = export_appointments(export_queryset(**filters), fmt, options["chunk_size"])
+
+        if output:
+            with open(output, "w", encoding="utf-8", newline="") as stream:
+                stream.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
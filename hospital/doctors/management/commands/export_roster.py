@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from doctors.roster import (
+    DOCTOR_FIELDS, SCHEDULE_FIELDS, detect_format, export_doctors, export_schedules, write_records
+)
+
+
+class Command(BaseCommand):
+    help = "Выгружает врачей или расписания в CSV или JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", choices=("doctors", "schedules"), required=True)
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--output", help="Путь к файлу; по умолчанию stdout.")
+
+    def handle(self, *args, **options):
+        if options["kind"] == "doctors":
+            records, fields = export_doctors(), DOCTOR_FIELDS
+        else:
+            records, fields = export_schedules(), SCHEDULE_FIELDS
+
+        output = options["output"]
+        fmt = detect_format(output or "", options["format"])
+        if output:
+            with open(output, "w", encoding="utf-8", newline="") as stream:
+                write_records(stream, records, fields, fmt)
+        else:
+            # Строки записей уже заканчиваются переводом строки.
+            self.stdout.ending = ""
+            write_records(self.stdout, records, fields, fmt)
@@ -0,0 +1,209 @@
+import itertools
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from doctors.cache import AVAILABILITY, FRAGMENTS, bump_version
+from doctors.models import Appointment, Doctor, Schedule
+from doctors.roster import chunked, import_doctors
+from doctors.slots import SLOT_TIMES, WeeklySlotGrid, iter_minutes
+from doctors.stats import rebuild_day_stats
+
+
+SPECIALIZATIONS = (
+    "Терапевт", "Хирург", "Кардиолог", "Невролог", "Офтальмолог",
+    "Оториноларинголог", "Эндокринолог", "Гастроэнтеролог", "Дерматолог",
+    "Уролог", "Гинеколог", "Травматолог-ортопед", "Педиатр", "Стоматолог",
+)
+SHIFTS = (
+    (time(8, 0), time(12, 0)),
+    (time(9, 0), time(14, 0)),
+    (time(13, 0), time(18, 0)),
+    (time(15, 0), time(20, 0)),
+)
+PAST_STATUSES = (("completed", 0.8), ("cancelled", 0.15), ("scheduled", 0.05))
+FUTURE_STATUSES = (("scheduled", 0.9), ("cancelled", 0.1))
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими врачами, расписаниями, пациентами "
+        "и записями на приём. При одинаковых --seed и --today в пустой базе "
+        "данные совпадают."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=200)
+        parser.add_argument("--users", type=int, default=5000)
+        parser.add_argument("--appointments", type=int, default=100000)
+        parser.add_argument("--past-days", type=int, default=365)
+        parser.add_argument("--future-days", type=int, default=60)
+        parser.add_argument(
+            "--unpublished-share", type=float, default=0.02,
+            help="Доля снятых с публикации врачей и записей.",
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--today", help="Дата ГГГГ-ММ-ДД, от которой отсчитываются дни; по умолчанию сегодня.",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.faker = Faker("ru_RU")
+        self.faker.seed_instance(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.unpublished_share = options["unpublished_share"]
+        try:
+            self.today = (
+                date.fromisoformat(options["today"]) if options["today"]
+                else timezone.localdate()
+            )
+        except ValueError:
+            raise CommandError(f"Неверная дата --today: {options['today']}")
+
+        doctor_ids = self.create_doctors(options["doctors"])
+        schedules = self.create_schedules(doctor_ids)
+        patient_ids = self.create_users(options["users"])
+        created = self.create_appointments(
+            schedules, patient_ids, options["appointments"],
+            options["past_days"], options["future_days"],
+        )
+        # bulk_create не вызывает Appointment.save, счётчики строятся отдельно.
+        rebuild_day_stats(doctor_ids)
+
+        for doctor_id in doctor_ids:
+            bump_version(doctor_id, AVAILABILITY)
+            bump_version(doctor_id, FRAGMENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f"Врачей: {len(doctor_ids)}, пациентов: {len(patient_ids)}, записей: {created}"
+        ))
+
+    def free_offices(self, count):
+        """``count`` номеров кабинетов, которых нет ни у врачей, ни в расписании."""
+        used = set(Doctor.objects.values_list("office", flat=True))
+        used.update(Schedule.objects.values_list("office", flat=True))
+        candidates = (str(number) for number in itertools.count(1))
+        return list(itertools.islice((office for office in candidates if office not in used), count))
+
+    def create_doctors(self, count):
+        records = (
+            {
+                "name": self.faker.name(),
+                "specialization": self.rng.choice(SPECIALIZATIONS),
+                "office": office,
+                "is_published": self.rng.random() >= self.unpublished_share,
+            }
+            for office in self.free_offices(count)
+        )
+        last_pk = Doctor.objects.aggregate(last=Max("pk"))["last"] or 0
+        import_doctors(enumerate(records, start=1), batch_size=self.batch_size)
+        return list(
+            Doctor.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)
+        )
+
+    def create_schedules(self, doctor_ids):
+        """Каждому врачу — одна смена в 3–5 случайных дней недели."""
+        schedules = {}
+        to_create = []
+        offices = dict(Doctor.objects.filter(pk__in=doctor_ids).values_list("pk", "office"))
+        for doctor_id in doctor_ids:
+            start_time, end_time = self.rng.choice(SHIFTS)
+            days = sorted(self.rng.sample(range(1, 8), self.rng.randint(3, 5)))
+            rows = [(day, start_time, end_time) for day in days]
+            schedules[doctor_id] = WeeklySlotGrid(rows)
+            to_create.extend(
+                Schedule(
+                    doctor_id=doctor_id, day_of_week=day, start_time=start_time,
+                    end_time=end_time, office=offices[doctor_id],
+                )
+                for day, start_time, end_time in rows
+            )
+        Schedule.objects.bulk_create(to_create, batch_size=self.batch_size)
+        return schedules
+
+    def create_users(self, count):
+        # Хэш пароля считается один раз: это самая дорогая часть создания пользователя.
+        password = make_password("password")
+        last_pk = User.objects.aggregate(last=Max("pk"))["last"] or 0
+        start = last_pk + 1
+        users = (
+            User(
+                username=f"patient{start + number}",
+                first_name=self.faker.first_name(),
+                last_name=self.faker.last_name(),
+                email=f"patient{start + number}@example.com",
+                password=password,
+            )
+            for number in range(count)
+        )
+        for batch in chunked(users, self.batch_size):
+            User.objects.bulk_create(batch)
+        return list(
+            User.objects.filter(pk__gt=last_pk).order_by("pk").values_list("pk", flat=True)
+        )
+
+    def iter_appointments(self, schedules, patient_ids, dates, count, capacity):
+        """
+        Выбирает ровно ``count`` из ``capacity`` слотов расписания
+        с одинаковой вероятностью (выборка Кнута), так что записи
+        не занимают один слот дважды.
+        """
+        status_mix = {
+            True: ([status for status, _ in PAST_STATUSES], [weight for _, weight in PAST_STATUSES]),
+            False: ([status for status, _ in FUTURE_STATUSES], [weight for _, weight in FUTURE_STATUSES]),
+        }
+        for doctor_id, grid in schedules.items():
+            for day in dates:
+                statuses, weights = status_mix[day < self.today]
+                for minute in iter_minutes(grid.day_mask(day.isoweekday())):
+                    if count == 0:
+                        return
+                    selected = self.rng.random() * capacity < count
+                    capacity -= 1
+                    if not selected:
+                        continue
+                    count -= 1
+                    yield Appointment(
+                        doctor_id=doctor_id,
+                        patient_id=self.rng.choice(patient_ids),
+                        date=day,
+                        time=SLOT_TIMES[minute],
+                        status=self.rng.choices(statuses, weights)[0],
+                        is_published=self.rng.random() >= self.unpublished_share,
+                    )
+
+    def create_appointments(self, schedules, patient_ids, target, past_days, future_days):
+        if not patient_ids or not schedules:
+            return 0
+        dates = [
+            self.today + timedelta(days=offset) for offset in range(-past_days, future_days + 1)
+        ]
+        capacity = sum(
+            bin(grid.day_mask(day.isoweekday())).count("1")
+            for grid in schedules.values()
+            for day in dates
+        )
+        if target > capacity:
+            self.stderr.write(self.style.WARNING(
+                f"Запрошено записей: {target}, свободных слотов: {capacity}; "
+                f"не хватает {target - capacity}. Увеличьте --doctors или число дней."
+            ))
+        created = 0
+        appointments = self.iter_appointments(
+            schedules, patient_ids, dates, min(target, capacity), capacity
+        )
+        for batch in chunked(appointments, self.batch_size):
+            with transaction.atomic():
+                Appointment.objects.bulk_create(batch)
+            created += len(batch)
+            self.stdout.write(f"Записей создано: {created}", ending="\r")
+        self.stdout.write("")
+        return created
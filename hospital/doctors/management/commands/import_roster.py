@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from doctors.roster import (
+    RosterError, detect_format, import_doctors, import_schedules, read_records
+)
+
+
+class Command(BaseCommand):
+    help = "Загружает врачей или расписания из CSV или JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу.")
+        parser.add_argument("--kind", choices=("doctors", "schedules"), required=True)
+        parser.add_argument("--format", choices=("csv", "jsonl"))
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--max-errors", type=int, default=20, help="Сколько ошибок выводить."
+        )
+
+    def handle(self, *args, **options):
+        importer = import_doctors if options["kind"] == "doctors" else import_schedules
+        fmt = detect_format(options["path"], options["format"])
+        try:
+            with open(options["path"], encoding="utf-8", newline="") as stream:
+                result = importer(
+                    read_records(stream, fmt), batch_size=options["batch_size"]
+                )
+        except OSError as error:
+            raise CommandError(error)
+        except RosterError as error:
+            raise CommandError(f"{error}. Пачки до этой строки уже загружены.")
+
+        for line, message in result.errors[:options["max_errors"]]:
+            self.stderr.write(f"Строка {line}: {message}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {result.created}, обновлено: {result.updated}, "
+            f"отклонено: {len(result.errors)}"
+        ))
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Соединение закрыто сервером")
+    status = int(status_line.split()[1])
+    length, close = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "connection" and value.strip().lower() == "close":
+            close = True
+    await reader.readexactly(length)
+    return status, close
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест: отправляет GET-запросы по адресу через "
+        "постоянные соединения и выводит пропускную способность и задержки. "
+        "Сервер (gunicorn, uvicorn, daphne) нужно запустить отдельно."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("url", nargs="+", help="Адреса; запросы идут по ним по кругу.")
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--user", help="Запросы от имени пользователя с этим логином.")
+        parser.add_argument("--json", action="store_true", help="Вывести результат в JSON.")
+
+    def handle(self, *args, **options):
+        parts = [urlsplit(url) for url in options["url"]]
+        if len({(part.hostname, part.port) for part in parts}) != 1:
+            raise CommandError("Все адреса должны указывать на один сервер.")
+        self.host, self.port = parts[0].hostname, parts[0].port or 80
+        self.paths = [part.path + (f"?{part.query}" if part.query else "") for part in parts]
+        self.cookie = self.login(options["user"]) if options["user"] else None
+
+        result = asyncio.run(self.run(options["requests"], options["concurrency"]))
+        if options["json"]:
+            self.stdout.write(json.dumps(result, ensure_ascii=False))
+            return
+        for name, value in result.items():
+            self.stdout.write(f"{name}: {value}")
+
+    def login(self, username):
+        """Создаёт сессию пользователя, как это делает ``Client.force_login``."""
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"Пользователь {username!r} не найден")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f"sessionid={session.session_key}"
+
+    def build_request(self, path):
+        headers = [f"GET {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        if self.cookie:
+            headers.append(f"Cookie: {self.cookie}")
+        return ("\r\n".join(headers) + "\r\n\r\n").encode()
+
+    async def run(self, total, concurrency):
+        requests = [self.build_request(path) for path in self.paths]
+        counter = iter(range(total))
+        timings, statuses, errors = [], {}, 0
+
+        async def worker():
+            nonlocal errors
+            reader = writer = None
+            for number in counter:
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(self.host, self.port)
+                    started = time.perf_counter()
+                    writer.write(requests[number % len(requests)])
+                    status, close = await read_response(reader)
+                    timings.append((time.perf_counter() - started) * 1000)
+                    statuses[status] = statuses.get(status, 0) + 1
+                except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                    errors += 1
+                    close = True
+                if close and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        if not timings:
+            raise CommandError("Ни один запрос не выполнен")
+        return {
+            "requests": len(timings),
+            "errors": errors,
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "seconds": round(elapsed, 2),
+            "rps": round(len(timings) / elapsed, 1),
+            "p50_ms": round(statistics.median(timings), 2),
+            "p95_ms": round(percentile(timings, 0.95), 2),
+            "p99_ms": round(percentile(timings, 0.99), 2),
+        }
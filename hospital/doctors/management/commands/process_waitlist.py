@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from doctors.waitlist import expire_entries, process
+
+
+class Command(BaseCommand):
+    help = (
+        "Предлагает время, освободившееся после отмены, пациентам из листа "
+        "ожидания в порядке очереди и закрывает просроченные предложения."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop", action="store_true", help="Работать постоянно, проверяя очередь."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=2, help="Пауза между проверками в секундах."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_entries()
+            if expired:
+                self.stdout.write(f"Истёк срок заявок и предложений: {expired}")
+            while True:
+                freed, offered = process(options["batch_size"])
+                if freed:
+                    self.stdout.write(f"Освободилось: {freed}, предложено из очереди: {offered}")
+                if freed < options["batch_size"]:
+                    break
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from doctors.stats import rebuild_day_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает дневные счётчики загрузки врачей (DoctorDayStats) "
+        "по записям на приём и архиву."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--doctor", type=int, action="append", dest="doctor_ids",
+            help="Пересчитать только этого врача (id); можно указать несколько раз.",
+        )
+        parser.add_argument("--batch-size", type=int, default=100, help="Врачей в пачке.")
+
+    def handle(self, *args, **options):
+        rows = rebuild_day_stats(options["doctor_ids"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Строк счётчиков: {rows}"))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from doctors.notifications import dispatch, enqueue_reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Отправляет письма из очереди уведомлений пачками через одно "
+        "соединение с почтовым сервером и ставит в очередь напоминания "
+        "о завтрашних приёмах."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop", action="store_true", help="Работать постоянно, проверяя очередь."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=10, help="Пауза между проверками в секундах."
+        )
+        parser.add_argument(
+            "--no-reminders", action="store_true", help="Не искать завтрашние записи."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if not options["no_reminders"]:
+                reminders = enqueue_reminders()
+                if reminders:
+                    self.stdout.write(f"Напоминаний в очереди: {reminders}")
+            self.drain(options["batch_size"])
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
+
+    def drain(self, batch_size):
+        while True:
+            result = dispatch(batch_size)
+            if not result:
+                return
+            self.stdout.write(", ".join(f"{status}: {count}" for status, count in sorted(result.items())))
+            if sum(result.values()) < batch_size:
+                return
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from doctors.stats import snapshot_capacity
+
+
+class Command(BaseCommand):
+    help = (
+        "Запоминает ёмкость расписания врачей на день для отчёта о загрузке. "
+        "Запускается в конце каждого дня: прошедшие дни отчёт считает по снимкам."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Дата ГГГГ-ММ-ДД; по умолчанию сегодня.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Врачей в пачке.")
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options["date"]) if options["date"] else timezone.localdate()
+        except ValueError:
+            raise CommandError(f"Неверная дата: {options['date']}")
+        count = snapshot_capacity(day, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Ёмкость на {day} сохранена для врачей: {count}"))
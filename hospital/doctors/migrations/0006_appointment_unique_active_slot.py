@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0005_auto_20250108_2203'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_published', True), ('status__in', ['scheduled', 'completed'])), fields=('doctor', 'date', 'time'), name='unique_active_appointment_slot'),
+        ),
+    ]
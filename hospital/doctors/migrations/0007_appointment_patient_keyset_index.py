@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0006_appointment_unique_active_slot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'status', 'date', 'time'], name='doctors_app_patient_1d8fcd_idx'),
+        ),
+    ]
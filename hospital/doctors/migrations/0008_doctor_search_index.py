@@ -0,0 +1,78 @@
+from django.db import migrations
+from unidecode import unidecode
+
+
+# Таблица индекса на момент этой миграции; модуль doctors.search может меняться.
+INDEX_TABLE = "doctors_doctor_search"
+BATCH_SIZE = 2000
+
+INSTALL = {
+    "sqlite": [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+            name, specialization, office,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3 4'
+        )
+        """,
+    ],
+    "postgresql": [
+        f"""
+        CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+            doctor_id bigint PRIMARY KEY REFERENCES doctors_doctor (id)
+                ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+            document tsvector NOT NULL
+        )
+        """,
+        f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_gin ON {INDEX_TABLE} USING gin (document)",
+    ],
+}
+
+INSERT = {
+    "sqlite": (
+        f"INSERT INTO {INDEX_TABLE} (rowid, name, specialization, office) "
+        "VALUES (%s, %s, %s, %s)"
+    ),
+    "postgresql": (
+        f"INSERT INTO {INDEX_TABLE} (doctor_id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C'))"
+    ),
+}
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in INSTALL:
+        return
+    Doctor = apps.get_model('doctors', 'Doctor')
+    rows = Doctor.objects.using(connection.alias).values_list(
+        'pk', 'name', 'specialization', 'office'
+    )
+    with connection.cursor() as cursor:
+        for statement in INSTALL[connection.vendor]:
+            cursor.execute(statement)
+        batch = []
+        for pk, *values in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append((pk, *(unidecode(value or "").lower() for value in values)))
+            if len(batch) >= BATCH_SIZE:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def uninstall(apps, schema_editor):
+    if schema_editor.connection.vendor in INSTALL:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {INDEX_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0007_appointment_patient_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:10
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0010_doctor_image_variants_ready'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AppointmentArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID записи')),
+                ('date', models.DateField(verbose_name='Дата приёма')),
+                ('time', models.TimeField(verbose_name='Время приёма')),
+                ('status', models.CharField(choices=[('scheduled', 'Запланирован'), ('completed', 'Завершен'), ('cancelled', 'Отменен')], max_length=20, verbose_name='Статус')),
+                ('is_published', models.BooleanField(default=True, verbose_name='Опубликован')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Перенесена в архив')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to='doctors.doctor', verbose_name='Врач')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_appointments', to=settings.AUTH_USER_MODEL, verbose_name='Пациент')),
+            ],
+            options={
+                'verbose_name': 'Архивная запись на приём',
+                'verbose_name_plural': 'Архив записей на приём',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointmentarchive',
+            index=models.Index(fields=['patient', 'date', 'time'], name='doctors_app_patient_40bdde_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointmentarchive',
+            index=models.Index(fields=['doctor', 'date'], name='doctors_app_doctor__4af382_idx'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:20
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_day_stats(apps, schema_editor):
+    """Счётчики по уже существующим записям и архиву, как в ``rebuild_day_stats``."""
+    using = schema_editor.connection.alias
+    DoctorDayStats = apps.get_model('doctors', 'DoctorDayStats')
+    counts = defaultdict(lambda: {'scheduled': 0, 'completed': 0, 'cancelled': 0})
+    for name in ('Appointment', 'AppointmentArchive'):
+        rows = (
+            apps.get_model('doctors', name).objects.using(using)
+            .filter(is_published=True)
+            .order_by()
+            .values('doctor_id', 'date', 'status')
+            .annotate(count=models.Count('pk'))
+            .values_list('doctor_id', 'date', 'status', 'count')
+        )
+        for doctor_id, date, status, count in rows:
+            counts[(doctor_id, date)][status] += count
+    DoctorDayStats.objects.using(using).bulk_create(
+        [
+            DoctorDayStats(doctor_id=doctor_id, date=date, **values)
+            for (doctor_id, date), values in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0011_appointment_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDayStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('scheduled', models.IntegerField(default=0, verbose_name='Запланировано')),
+                ('completed', models.IntegerField(default=0, verbose_name='Завершено')),
+                ('cancelled', models.IntegerField(default=0, verbose_name='Отменено')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_stats', to='doctors.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Загрузка врача за день',
+                'verbose_name_plural': 'Загрузка врачей по дням',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='doctordaystats',
+            index=models.Index(fields=['date'], name='doctors_doc_date_e31bd2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='doctordaystats',
+            constraint=models.UniqueConstraint(fields=('doctor', 'date'), name='unique_doctor_day_stats'),
+        ),
+        migrations.RunPython(fill_day_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:28
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('doctors', '0013_notification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('booked', 'Запись на приём'), ('cancelled', 'Отмена записи'), ('reminder', 'Напоминание о приёме'), ('waitlist', 'Запись из листа ожидания')], max_length=20, verbose_name='Тип'),
+        ),
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField(verbose_name='С даты')),
+                ('date_to', models.DateField(verbose_name='По дату')),
+                ('status', models.CharField(choices=[('waiting', 'Ожидает'), ('booked', 'Записан'), ('left', 'Отказался'), ('expired', 'Истёк срок')], default='waiting', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Встал в очередь')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='doctors.doctor', verbose_name='Врач')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to=settings.AUTH_USER_MODEL, verbose_name='Пациент')),
+            ],
+            options={
+                'verbose_name': 'Лист ожидания',
+                'verbose_name_plural': 'Листы ожидания',
+            },
+        ),
+        migrations.CreateModel(
+            name='FreedSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата приёма')),
+                ('time', models.TimeField(verbose_name='Время приёма')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Освободилось')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='freed_slots', to='doctors.doctor', verbose_name='Врач')),
+            ],
+            options={
+                'verbose_name': 'Освободившееся время',
+                'verbose_name_plural': 'Освободившееся время',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='waitlistentry',
+            index=models.Index(condition=models.Q(('status', 'waiting')), fields=['doctor', 'created_at'], name='waitlist_waiting_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'waiting')), fields=('doctor', 'patient'), name='unique_waiting_patient'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.16 on 2026-10-18 07:53
+
+from django.db import migrations, models
+
+
+def reset_variants(apps, schema_editor):
+    # Ширина оригинала неизвестна: копии перестраивает build_image_variants.
+    Doctor = apps.get_model('doctors', 'Doctor')
+    Doctor.objects.using(schema_editor.connection.alias).exclude(image='').update(
+        image_variants_ready=False
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0014_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctor',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='Ширина изображения'),
+        ),
+        migrations.RunPython(reset_variants, migrations.RunPython.noop),
+    ]
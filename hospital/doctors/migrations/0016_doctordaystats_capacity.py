@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0015_doctor_image_width'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctordaystats',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Слотов по расписанию'),
+        ),
+    ]
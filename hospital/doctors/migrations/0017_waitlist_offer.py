@@ -0,0 +1,61 @@
+# Generated by Django 3.2.16 on 2026-10-18 08:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0016_doctordaystats_capacity'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='waitlistentry',
+            name='unique_waiting_patient',
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='waitlist_entry',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='doctors.waitlistentry', verbose_name='Заявка в листе ожидания'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='offer_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Предложенная дата'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='offer_expires_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Предложение действует до'),
+        ),
+        migrations.AddField(
+            model_name='waitlistentry',
+            name='offer_time',
+            field=models.TimeField(blank=True, null=True, verbose_name='Предложенное время'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='appointment',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='notifications', to='doctors.appointment', verbose_name='Запись на приём'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='kind',
+            field=models.CharField(choices=[('booked', 'Запись на приём'), ('cancelled', 'Отмена записи'), ('reminder', 'Напоминание о приёме'), ('waitlist', 'Предложение из листа ожидания')], max_length=20, verbose_name='Тип'),
+        ),
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='status',
+            field=models.CharField(choices=[('waiting', 'Ожидает'), ('offered', 'Предложено время'), ('booked', 'Записан'), ('left', 'Отказался'), ('expired', 'Истёк срок')], default='waiting', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['waiting', 'offered'])), fields=('doctor', 'patient'), name='unique_waiting_patient'),
+        ),
+        migrations.AddConstraint(
+            model_name='waitlistentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'offered')), fields=('doctor', 'offer_date', 'offer_time'), name='unique_slot_offer'),
+        ),
+    ]
@@ -1,11 +1,26 @@
-from django.db import models
+import threading
+
+from django.db import connections, models, router, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.utils.text import slugify
-from django.db.models.signals import pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
 from unidecode import unidecode
 
+from . import images, search
+from .cache import FRAGMENTS, bump_version_on_commit
+
+
+# Поля, от которых зависит счётчик DoctorDayStats записи на приём.
+STATS_FIELDS = ("doctor_id", "date", "status", "is_published")
+
+SLOT_CONSTRAINT = "unique_active_appointment_slot"
+
+# Врачи, которых сейчас удаляет этот поток: ``{(using, pk)}``.
+_deleting_doctors = threading.local()
+
 
 class IsPublished(models.Model):
     is_published = models.BooleanField(default=True, verbose_name='Опубликован')
@@ -24,10 +39,34 @@ class Doctor(IsPublished):
         null=True,
         blank=True
     )
+    image_variants_ready = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Уменьшенные копии готовы'
+    )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина изображения'
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменён")
 
     def __str__(self):
         return f"{self.name} ({self.specialization})"
 
+    @property
+    def image_srcset(self):
+        """``srcset`` уменьшенных копий фотографии по форматам."""
+        if not (self.image and self.image_variants_ready and self.image_width):
+            return None
+        if not images.variant_widths(self.image_width):
+            return None
+        return {
+            extension: images.srcset(self.image.name, extension, self.image_width)
+            for extension, _, _ in images.VARIANT_FORMATS
+        }
+
     class Meta:
         verbose_name = "Врач"
         verbose_name_plural = "Врачи"
@@ -40,6 +79,52 @@ def create_doctor_slug(sender, instance, *args, **kwargs):
         instance.slug = slugify(unidecode(instance.name))
 
 
+@receiver(pre_save, sender=Doctor)
+def track_doctor_image(sender, instance, using, *args, **kwargs):
+    # Новый файл ещё не сохранён в хранилище: копии нужно построить заново.
+    if not instance.image or not instance.image._committed:
+        instance.image_variants_ready = False
+        instance.image_width = None
+        instance._image_changed = bool(instance.image)
+        if not instance._state.adding:
+            previous = (
+                Doctor.objects.using(using).filter(pk=instance.pk)
+                .values_list("image", flat=True).first()
+            )
+            if previous:
+                transaction.on_commit(
+                    lambda: images.schedule_variants_cleanup(previous), using=using
+                )
+
+
+@receiver(post_save, sender=Doctor)
+def queue_doctor_image_variants(sender, instance, *args, **kwargs):
+    if getattr(instance, "_image_changed", False):
+        instance._image_changed = False
+        pk, name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: images.schedule_doctor_image(pk, name))
+
+
+@receiver(post_save, sender=Doctor)
+def index_doctor(sender, instance, using, *args, **kwargs):
+    search.index_rows(
+        connections[using],
+        [(instance.pk, instance.name, instance.specialization, instance.office)],
+    )
+
+
+@receiver(post_delete, sender=Doctor)
+def unindex_doctor(sender, instance, using, *args, **kwargs):
+    search.unindex_ids(connections[using], [instance.pk])
+
+
+@receiver(post_delete, sender=Doctor)
+def delete_doctor_image_variants(sender, instance, using, *args, **kwargs):
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: images.schedule_variants_cleanup(name), using=using)
+
+
 class Appointment(IsPublished):
     STATUS_CHOICES = (
         ('scheduled', 'Запланирован'),
@@ -67,17 +152,36 @@ class Appointment(IsPublished):
     def __str__(self):
         return f"Приём у {self.doctor.name} на {self.date} в {self.time}"
 
-    def is_time_available(self):
-        """Проверяет, доступно ли время для записи."""
-        conflicting_appointments = Appointment.objects.filter(
-            doctor=self.doctor,
-            date=self.date,
-            time=self.time,
-            status__in=self.APPOINTMENT_STATUSES,
-            is_published=True
-        ).exclude(pk=self.pk)
+    def stats_key(self):
+        """Счётчик ``DoctorDayStats``, в который входит запись, или ``None``."""
+        if not self.is_published:
+            return None
+        return self.doctor_id, self.date, self.status
+
+    def save(self, *args, **kwargs):
+        # Счётчики меняются в той же транзакции, что и сама запись.
+        using = kwargs.get("using") or router.db_for_write(Appointment, instance=self)
+        with transaction.atomic(using=using):
+            previous = None if self._state.adding else self.locked_stats_key(using)
+            super().save(*args, **kwargs)
+            DoctorDayStats.objects.db_manager(using).move(previous, self.stats_key())
 
-        return not conflicting_appointments.exists()
+    def locked_stats_key(self, using):
+        """
+        Счётчик сохранённой в базе версии записи; строка блокируется до конца
+        транзакции. Загруженное в память состояние могло устареть: две
+        одновременные отмены иначе обе вычли бы запись из запланированных.
+        """
+        row = (
+            Appointment.objects.using(using)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values_list(*STATS_FIELDS)
+            .first()
+        )
+        if row is None or not row[3]:
+            return None
+        return row[:3]
 
     class Meta:
         verbose_name = "Запись на приём"
@@ -86,9 +190,314 @@ class Appointment(IsPublished):
             models.Index(fields=['doctor', 'date', 'time']),
             models.Index(fields=['date', 'time']),
             models.Index(fields=['status']),
+            models.Index(fields=['patient', 'status', 'date', 'time']),
+        ]
+        constraints = [
+            # Одно активное время у врача: защищает от двойной записи
+            # при одновременных запросах без блокировок.
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'time'],
+                condition=models.Q(status__in=['scheduled', 'completed'], is_published=True),
+                name=SLOT_CONSTRAINT,
+            ),
+        ]
+
+
+def is_slot_conflict(error):
+    """
+    ``IntegrityError`` из-за занятого времени врача. PostgreSQL называет
+    нарушенное ограничение, SQLite — его столбцы.
+    """
+    table = Appointment._meta.db_table
+    message = str(error)
+    return SLOT_CONSTRAINT in message or (
+        f"{table}.doctor_id, {table}.date, {table}.time" in message
+    )
+
+
+class AppointmentArchive(models.Model):
+    """Запись на приём, перенесённая из ``Appointment`` после срока хранения."""
+
+    id = models.BigIntegerField(primary_key=True, verbose_name="ID записи")
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        verbose_name="Врач",
+        related_name='archived_appointments'
+    )
+    patient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пациент",
+        related_name='archived_appointments'
+    )
+    date = models.DateField(verbose_name="Дата приёма")
+    time = models.TimeField(verbose_name="Время приёма")
+    status = models.CharField(max_length=20, choices=Appointment.STATUS_CHOICES, verbose_name="Статус")
+    is_published = models.BooleanField(default=True, verbose_name='Опубликован')
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Перенесена в архив")
+
+    def __str__(self):
+        return f"Приём у {self.doctor.name} на {self.date} в {self.time}"
+
+    class Meta:
+        verbose_name = "Архивная запись на приём"
+        verbose_name_plural = "Архив записей на приём"
+        indexes = [
+            models.Index(fields=['patient', 'date', 'time']),
+            models.Index(fields=['doctor', 'date']),
+        ]
+
+
+class DoctorDayStatsManager(models.Manager):
+    def apply(self, deltas):
+        """
+        Прибавляет к счётчикам ``deltas``: ``{(doctor_id, date, status): n}``.
+
+        Строки счётчиков создаются при первой записи на день.
+        """
+        by_day = {}
+        for (doctor_id, date, status), count in deltas.items():
+            if count:
+                by_day.setdefault((doctor_id, date), {})[status] = count
+        for (doctor_id, date), changes in by_day.items():
+            updates = {status: models.F(status) + count for status, count in changes.items()}
+            rows = self.filter(doctor_id=doctor_id, date=date)
+            if rows.update(**updates):
+                continue
+            # Строки нет: вычитать не из чего. Строка с отрицательным
+            # счётчиком могла бы ссылаться на удаляемого врача.
+            increments = {
+                status: models.F(status) + count for status, count in changes.items() if count > 0
+            }
+            if increments:
+                self.bulk_create([DoctorDayStats(doctor_id=doctor_id, date=date)], ignore_conflicts=True)
+                rows.update(**increments)
+
+    def move(self, previous, current):
+        """Переносит одну запись из счётчика ``previous`` в ``current``."""
+        if previous == current:
+            return
+        deltas = {}
+        if previous is not None:
+            deltas[previous] = -1
+        if current is not None:
+            deltas[current] = deltas.get(current, 0) + 1
+        self.apply(deltas)
+
+
+class DoctorDayStats(models.Model):
+    """Число записей врача на день по статусам; ведётся вместе с ``Appointment``."""
+
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        verbose_name="Врач",
+        related_name='day_stats'
+    )
+    date = models.DateField(verbose_name="Дата")
+    scheduled = models.IntegerField(default=0, verbose_name="Запланировано")
+    completed = models.IntegerField(default=0, verbose_name="Завершено")
+    cancelled = models.IntegerField(default=0, verbose_name="Отменено")
+    # Снимок ёмкости расписания на этот день (stats.snapshot_capacity):
+    # расписание меняется, а прошедшие дни должны считаться по тому,
+    # что действовало тогда.
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name="Слотов по расписанию"
+    )
+
+    objects = DoctorDayStatsManager()
+
+    def __str__(self):
+        return f"Загрузка {self.doctor_id} на {self.date}"
+
+    class Meta:
+        verbose_name = "Загрузка врача за день"
+        verbose_name_plural = "Загрузка врачей по дням"
+        constraints = [
+            models.UniqueConstraint(fields=['doctor', 'date'], name='unique_doctor_day_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+
+class Notification(models.Model):
+    """
+    Письмо пациенту в очереди на отправку (outbox).
+
+    Строка создаётся в той же транзакции, что и запись на приём или её
+    отмена, а отправляет письма команда ``send_notifications``. Письмо
+    с предложением времени из листа ожидания ссылается на заявку, а не
+    на запись.
+    """
+
+    BOOKED = "booked"
+    CANCELLED = "cancelled"
+    REMINDER = "reminder"
+    WAITLIST = "waitlist"
+    KIND_CHOICES = (
+        (BOOKED, "Запись на приём"),
+        (CANCELLED, "Отмена записи"),
+        (REMINDER, "Напоминание о приёме"),
+        (WAITLIST, "Предложение из листа ожидания"),
+    )
+    PENDING = "pending"
+    SENT = "sent"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Ожидает отправки"),
+        (SENT, "Отправлено"),
+        (SKIPPED, "Не требуется"),
+        (FAILED, "Не удалось отправить"),
+    )
+
+    # Без внешнего ключа в базе: архивирование удаляет записи на приём
+    # одним DELETE, а история уведомлений при этом остаётся.
+    appointment = models.ForeignKey(
+        Appointment,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        verbose_name="Запись на приём",
+        related_name='notifications'
+    )
+    waitlist_entry = models.ForeignKey(
+        'WaitlistEntry',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Заявка в листе ожидания",
+        related_name='notifications'
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name="Тип")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name="Попыток")
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name="Следующая попытка")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Отправлено")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.appointment_id or self.waitlist_entry_id}"
+
+    class Meta:
+        verbose_name = "Уведомление"
+        verbose_name_plural = "Уведомления"
+        indexes = [
+            # Очередь: только неотправленные строки, по времени попытки.
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status='pending'),
+                name='notification_pending_idx',
+            ),
+        ]
+        constraints = [
+            # Напоминание о приёме создаётся один раз, сколько бы раз
+            # ни запускался поиск завтрашних записей.
+            models.UniqueConstraint(
+                fields=['appointment', 'kind'],
+                condition=models.Q(kind='reminder'),
+                name='unique_appointment_reminder',
+            ),
+        ]
+
+
+class WaitlistEntry(models.Model):
+    """Пациент ждёт освободившееся время у врача в диапазоне дат."""
+
+    WAITING = "waiting"
+    OFFERED = "offered"
+    BOOKED = "booked"
+    LEFT = "left"
+    EXPIRED = "expired"
+    STATUS_CHOICES = (
+        (WAITING, "Ожидает"),
+        (OFFERED, "Предложено время"),
+        (BOOKED, "Записан"),
+        (LEFT, "Отказался"),
+        (EXPIRED, "Истёк срок"),
+    )
+
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        verbose_name="Врач",
+        related_name='waitlist'
+    )
+    patient = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name="Пациент",
+        related_name='waitlist'
+    )
+    date_from = models.DateField(verbose_name="С даты")
+    date_to = models.DateField(verbose_name="По дату")
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=WAITING, verbose_name="Статус"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Встал в очередь")
+    # Время, предложенное пациенту; действует до ``offer_expires_at``.
+    offer_date = models.DateField(null=True, blank=True, verbose_name="Предложенная дата")
+    offer_time = models.TimeField(null=True, blank=True, verbose_name="Предложенное время")
+    offer_expires_at = models.DateTimeField(
+        null=True, blank=True, verbose_name="Предложение действует до"
+    )
+
+    def __str__(self):
+        return f"Ожидание {self.doctor_id} с {self.date_from} по {self.date_to}"
+
+    class Meta:
+        verbose_name = "Лист ожидания"
+        verbose_name_plural = "Листы ожидания"
+        indexes = [
+            # Очередь врача в порядке постановки; только ожидающие.
+            models.Index(
+                fields=['doctor', 'created_at'],
+                condition=models.Q(status='waiting'),
+                name='waitlist_waiting_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['doctor', 'patient'],
+                condition=models.Q(status__in=['waiting', 'offered']),
+                name='unique_waiting_patient',
+            ),
+            # Одно время предлагается одному пациенту за раз.
+            models.UniqueConstraint(
+                fields=['doctor', 'offer_date', 'offer_time'],
+                condition=models.Q(status='offered'),
+                name='unique_slot_offer',
+            ),
         ]
 
 
+class FreedSlot(models.Model):
+    """Время, освободившееся после отмены; разбирается командой ``process_waitlist``."""
+
+    doctor = models.ForeignKey(
+        Doctor,
+        on_delete=models.CASCADE,
+        verbose_name="Врач",
+        related_name='freed_slots'
+    )
+    date = models.DateField(verbose_name="Дата приёма")
+    time = models.TimeField(verbose_name="Время приёма")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Освободилось")
+
+    def __str__(self):
+        return f"Свободно у {self.doctor_id} {self.date} в {self.time}"
+
+    class Meta:
+        verbose_name = "Освободившееся время"
+        verbose_name_plural = "Освободившееся время"
+
+
 class Schedule(models.Model):
     DAYS_OF_WEEK = (
         (1, 'Понедельник'),
@@ -105,6 +514,7 @@ class Schedule(models.Model):
     start_time = models.TimeField(verbose_name="Время начала приёма")
     end_time = models.TimeField(verbose_name="Время окончания приёма")
     office = models.CharField(max_length=50, verbose_name="Номер кабинета", blank=True)
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Изменено")
 
     def __str__(self):
         return f"Расписание {self.doctor.name} на {self.get_day_of_week_display()}"
@@ -121,3 +531,54 @@ class Schedule(models.Model):
     def save(self, *args, **kwargs):
         self.office = getattr(self.doctor, 'office', self.office)
         super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def invalidate_doctor_availability(sender, instance, using, *args, **kwargs):
+    bump_version_on_commit(instance.doctor_id, using=using)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def invalidate_schedule_fragments(sender, instance, using, *args, **kwargs):
+    bump_version_on_commit(instance.doctor_id, FRAGMENTS, using)
+
+
+@receiver(post_save, sender=Doctor)
+@receiver(post_delete, sender=Doctor)
+def invalidate_doctor_fragments(sender, instance, using, *args, **kwargs):
+    bump_version_on_commit(instance.pk, FRAGMENTS, using)
+
+
+@receiver(pre_delete, sender=Appointment)
+def lock_deleted_appointment(sender, instance, using, *args, **kwargs):
+    # Удаление идёт в транзакции: счётчик берётся из базы под блокировкой строки.
+    instance._deleted_stats_key = instance.locked_stats_key(using)
+
+
+def deleting_doctors():
+    if not hasattr(_deleting_doctors, "keys"):
+        _deleting_doctors.keys = set()
+    return _deleting_doctors.keys
+
+
+@receiver(pre_delete, sender=Doctor)
+def mark_deleting_doctor(sender, instance, using, *args, **kwargs):
+    # Сигналы записей врача приходят между pre_delete и post_delete врача.
+    deleting_doctors().add((using, instance.pk))
+
+
+@receiver(post_delete, sender=Doctor)
+def unmark_deleting_doctor(sender, instance, using, *args, **kwargs):
+    deleting_doctors().discard((using, instance.pk))
+
+
+@receiver(post_delete, sender=Appointment)
+def uncount_appointment(sender, instance, using, *args, **kwargs):
+    # Счётчики удаляемого врача удаляются каскадом вместе с ним.
+    if (using, instance.doctor_id) in deleting_doctors():
+        return
+    DoctorDayStats.objects.db_manager(using).move(instance._deleted_stats_key, None)
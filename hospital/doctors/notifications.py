@@ -0,0 +1,175 @@
+"""
+Письма пациентам через очередь (outbox).
+
+View только добавляют строку ``Notification`` в транзакции записи
+на приём или её отмены: одна вставка, без обращения к почтовому серверу.
+Команда ``send_notifications`` забирает очередь пачками. Строки пачки
+«арендуются» сдвигом ``next_attempt_at``, чтобы их не взял второй
+обработчик, письма уходят через одно соединение с почтовым сервером,
+а неудачные повторяются с растущей паузой. Та же команда ставит
+в очередь напоминания о завтрашних приёмах.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Appointment, Notification, WaitlistEntry
+from .roster import chunked
+
+
+logger = logging.getLogger("doctors.notifications")
+
+LEASE = timedelta(minutes=5)
+SUBJECTS = {
+    Notification.BOOKED: "Вы записаны на приём",
+    Notification.CANCELLED: "Запись на приём отменена",
+    Notification.REMINDER: "Напоминание о приёме завтра",
+    Notification.WAITLIST: "Освободилось время у врача",
+}
+UPDATE_FIELDS = ("status", "attempts", "next_attempt_at", "last_error", "sent_at")
+
+
+def enqueue(appointment, kind):
+    """Ставит письмо в очередь; вызывается в транзакции изменения записи."""
+    if not getattr(settings, "APPOINTMENT_NOTIFICATIONS", True):
+        return None
+    return Notification.objects.create(appointment=appointment, kind=kind)
+
+
+def enqueue_offer(entry):
+    """Письмо о предложенном из листа ожидания времени."""
+    if not getattr(settings, "APPOINTMENT_NOTIFICATIONS", True):
+        return None
+    return Notification.objects.create(waitlist_entry=entry, kind=Notification.WAITLIST)
+
+
+def enqueue_reminders(day=None, batch_size=1000):
+    """Напоминания о записях на ``day`` (по умолчанию завтра); возвращает их число."""
+    day = day or timezone.localdate() + timedelta(days=1)
+    reminded = Notification.objects.filter(appointment=OuterRef("pk"), kind=Notification.REMINDER)
+    appointments = (
+        Appointment.objects.filter(date=day, status="scheduled", is_published=True)
+        .filter(~Exists(reminded))
+        .order_by("time", "pk")
+        .values_list("pk", flat=True)
+    )
+    created = 0
+    for chunk in chunked(appointments.iterator(chunk_size=batch_size), batch_size):
+        Notification.objects.bulk_create(
+            [Notification(appointment_id=pk, kind=Notification.REMINDER) for pk in chunk],
+            ignore_conflicts=True,
+        )
+        created += len(chunk)
+    return created
+
+
+def claim(batch_size):
+    """Забирает пачку готовых к отправке писем на время ``LEASE``."""
+    now = timezone.now()
+    with transaction.atomic():
+        pending = Notification.objects.filter(
+            status=Notification.PENDING, next_attempt_at__lte=now
+        ).order_by("next_attempt_at")
+        if connection.features.has_select_for_update_skip_locked:
+            pending = pending.select_for_update(skip_locked=True)
+        ids = list(pending.values_list("pk", flat=True)[:batch_size])
+        Notification.objects.filter(pk__in=ids).update(next_attempt_at=now + LEASE)
+    return ids
+
+
+def build_message(notification):
+    """Письмо по уведомлению или ``None``, если отправлять нечего."""
+    if notification.kind == Notification.WAITLIST:
+        return build_offer_message(notification)
+    appointment = notification.appointment
+    # Запись могли удалить: внешнего ключа в базе нет.
+    if appointment is None:
+        return None
+    patient = appointment.patient
+    if not patient.email:
+        return None
+    if notification.kind == Notification.REMINDER and appointment.status != "scheduled":
+        return None
+    body = render_to_string(
+        f"doctors/emails/{notification.kind}.txt",
+        {"appointment": appointment, "doctor": appointment.doctor, "patient": patient},
+    )
+    return EmailMessage(SUBJECTS[notification.kind], body, to=[patient.email])
+
+
+def build_offer_message(notification):
+    # Предложение, которое уже приняли, отклонили или закрыли, не отправляется.
+    entry = notification.waitlist_entry
+    if entry.status != WaitlistEntry.OFFERED or not entry.patient.email:
+        return None
+    body = render_to_string(
+        "doctors/emails/waitlist.txt",
+        {"entry": entry, "doctor": entry.doctor, "patient": entry.patient},
+    )
+    return EmailMessage(SUBJECTS[notification.kind], body, to=[entry.patient.email])
+
+
+def retry_delay(attempts):
+    base = getattr(settings, "NOTIFICATION_RETRY_SECONDS", 60)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def mark_failed(notification, error, now):
+    notification.attempts += 1
+    notification.last_error = f"{type(error).__name__}: {error}"
+    if notification.attempts >= getattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 6):
+        notification.status = Notification.FAILED
+    else:
+        notification.next_attempt_at = now + retry_delay(notification.attempts)
+    logger.warning("Уведомление %s не отправлено: %s", notification.pk, notification.last_error)
+
+
+def dispatch(batch_size=100):
+    """Отправляет одну пачку писем; возвращает число уведомлений по статусам."""
+    ids = claim(batch_size)
+    if not ids:
+        return Counter()
+    notifications = list(
+        Notification.objects.filter(pk__in=ids)
+        .select_related(
+            "appointment__doctor", "appointment__patient",
+            "waitlist_entry__doctor", "waitlist_entry__patient",
+        )
+    )
+
+    now = timezone.now()
+    mail = get_connection()
+    try:
+        mail.open()
+    except Exception as error:
+        # Почтовый сервер недоступен: вся пачка переносится на потом.
+        for notification in notifications:
+            mark_failed(notification, error, now)
+    else:
+        try:
+            for notification in notifications:
+                message = build_message(notification)
+                if message is None:
+                    notification.status = Notification.SKIPPED
+                    continue
+                message.connection = mail
+                try:
+                    message.send()
+                except Exception as error:
+                    # Ошибка одного письма не должна останавливать обработчик.
+                    mark_failed(notification, error, now)
+                else:
+                    notification.status = Notification.SENT
+                    notification.sent_at = timezone.now()
+        finally:
+            mail.close()
+
+    Notification.objects.bulk_update(notifications, UPDATE_FIELDS)
+    return Counter(notification.status for notification in notifications)
@@ -0,0 +1,212 @@
+"""
+Постраничный вывод по курсору (keyset pagination).
+
+Вместо ``OFFSET`` и ``COUNT(*)`` страница выбирается условием
+«строки после последней строки предыдущей страницы» по полям сортировки,
+что позволяет использовать индекс на любой глубине списка. Объект страницы
+совместим с шаблонами, рассчитанными на ``page_obj`` Django.
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+CURSOR_PARAM = "after"
+PAGE_PARAM = "page"
+
+
+def encode_cursor(values):
+    data = json.dumps(values, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    """Возвращает значения курсора или ``None``, если курсор некорректен."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(values, list) or len(values) != size:
+        return None
+    if not all(isinstance(value, (str, int, float)) for value in values):
+        return None
+    return values
+
+
+def field_name(field):
+    return field.lstrip("-")
+
+
+def reverse_field(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def seek_filter(fields, values, lookup):
+    """
+    Лексикографическое сравнение кортежа полей с курсором.
+
+    ``lookup`` — ``"gt"`` для строк после курсора или ``"lt"`` для строк
+    перед ним. Для полей с убывающей сортировкой (``"-date"``) сравнение
+    обращается.
+    """
+    reverse = {"gt": "lt", "lt": "gt"}
+    conditions = []
+    for index, field in enumerate(fields):
+        equal = {
+            field_name(name): value for name, value in zip(fields[:index], values[:index])
+        }
+        field_lookup = reverse[lookup] if field.startswith("-") else lookup
+        equal[f"{field_name(field)}__{field_lookup}"] = values[index]
+        conditions.append(Q(**equal))
+    return reduce(or_, conditions)
+
+
+class KeysetPage:
+    """Страница, совместимая с ``django.core.paginator.Page`` в шаблонах."""
+
+    is_keyset = True
+
+    def __init__(self, object_list, number, paginator, query, next_cursors, previous_cursors):
+        self.object_list = object_list
+        self.number = number
+        self.paginator = paginator
+        self._query = query
+        self._next_cursors = next_cursors
+        self._previous_cursors = previous_cursors
+
+    def __repr__(self):
+        return f"<KeysetPage {self.number}>"
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return bool(self._next_cursors)
+
+    def has_previous(self):
+        return bool(self._previous_cursors)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def _page_query(self, number, cursor):
+        query = self._query.copy()
+        query.pop(CURSOR_PARAM, None)
+        query.pop(PAGE_PARAM, None)
+        if cursor is not None:
+            query[CURSOR_PARAM] = cursor
+            query[PAGE_PARAM] = number
+        return query.urlencode()
+
+    @property
+    def first_page_query(self):
+        return self._page_query(1, None)
+
+    @property
+    def next_page_query(self):
+        return self._page_query(self.number + 1, self._next_cursors[0])
+
+    @property
+    def previous_page_query(self):
+        return self._page_query(self.number - 1, self._previous_cursors[0])
+
+    @property
+    def page_links(self):
+        """Ограниченное окно соседних страниц: ``(номер, строка запроса)``."""
+        previous = [
+            (self.number - offset, self._page_query(self.number - offset, cursor))
+            for offset, cursor in enumerate(self._previous_cursors, start=1)
+        ]
+        following = [
+            (self.number + offset, self._page_query(self.number + offset, cursor))
+            for offset, cursor in enumerate(self._next_cursors, start=1)
+        ]
+        return previous[::-1] + [(self.number, None)] + following
+
+
+class KeysetPaginator:
+    """
+    Пагинатор по уникальному упорядоченному набору полей ``ordering``;
+    поле с префиксом ``-`` сортируется по убыванию.
+
+    Выполняет не более двух запросов с ``LIMIT``: вперёд — для текущей
+    страницы и курсоров следующих, назад — для курсоров предыдущих страниц.
+    Число страниц не вычисляется.
+    """
+
+    def __init__(self, queryset, per_page, ordering, window=2):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.window = window
+
+    def _cursor(self, obj):
+        return encode_cursor([getattr(obj, field_name(field)) for field in self.ordering])
+
+    def get_page(self, query):
+        """Страница по параметрам запроса (``request.GET``)."""
+        per_page, window = self.per_page, self.window
+        values = None
+        if query.get(CURSOR_PARAM):
+            values = decode_cursor(query[CURSOR_PARAM], len(self.ordering))
+
+        queryset = self.queryset.order_by(*self.ordering)
+        before = []
+        if values is not None:
+            after = seek_filter(self.ordering, values, "gt")
+            try:
+                preceding = self.queryset.filter(~after)
+                following = queryset.filter(after)
+            except (ValidationError, TypeError, ValueError):
+                # Значения курсора не подходят к полям: показывается первая страница.
+                pass
+            else:
+                before = list(
+                    preceding.order_by(*map(reverse_field, self.ordering))[:per_page * window + 1]
+                )
+                queryset = following
+
+        previous_cursors = []
+        for offset in range(window):
+            if len(before) <= offset * per_page:
+                break
+            boundary = (offset + 1) * per_page
+            previous_cursors.append(
+                self._cursor(before[boundary]) if len(before) > boundary else None
+            )
+
+        rows = list(queryset[:per_page * (window + 1) + 1])
+        object_list = rows[:per_page]
+        next_cursors = [
+            self._cursor(rows[boundary - 1])
+            for boundary in range(per_page, len(rows), per_page)
+        ][:window]
+
+        try:
+            number = int(query.get(PAGE_PARAM, 1))
+        except ValueError:
+            number = 1
+        number = max(number, len(previous_cursors) + 1)
+        if not previous_cursors:
+            number = 1
+
+        return KeysetPage(object_list, number, self, query, next_cursors, previous_cursors)
@@ -0,0 +1,339 @@
+"""
+Массовая загрузка и выгрузка врачей и расписаний.
+
+Записи читаются потоком и обрабатываются пачками: для каждой пачки слаги
+и кабинеты вычисляются в памяти, пересечения расписаний проверяются
+по заранее построенному индексу интервалов, а запись выполняется через
+``bulk_create`` / ``bulk_update`` в одной транзакции. Сигналы моделей
+при этом не вызываются, поэтому поисковый индекс и версии кэша
+обновляются здесь явно.
+"""
+import csv
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from datetime import datetime, time
+from itertools import islice
+
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from unidecode import unidecode
+
+from . import search
+from .cache import AVAILABILITY, FRAGMENTS, bump_version
+from .models import Doctor, Schedule
+
+
+DOCTOR_FIELDS = ("slug", "name", "specialization", "office", "is_published")
+SCHEDULE_FIELDS = ("doctor", "day_of_week", "start_time", "end_time", "office")
+SLUG_MAX_LENGTH = Doctor._meta.get_field("slug").max_length
+
+TRUE_VALUES = {"1", "true", "yes", "да"}
+TIME_FORMATS = ("%H:%M", "%H:%M:%S")
+
+
+class RosterError(ValueError):
+    """Ошибка в строке входного файла."""
+
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if str(path).endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def read_records(stream, fmt):
+    """
+    Построчно читает записи из CSV или JSON Lines: пары ``(номер строки,
+    запись)``. Строка, которую нельзя разобрать, останавливает чтение
+    с ``RosterError``.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        try:
+            for record in reader:
+                yield reader.line_num, record
+        except csv.Error as error:
+            raise RosterError(f"Строка {reader.line_num}: {error}")
+        return
+    for number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise RosterError(f"Строка {number}: неверный JSON ({error})")
+        if not isinstance(record, dict):
+            raise RosterError(f"Строка {number}: ожидается объект JSON")
+        yield number, record
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_bool(value, default=True):
+    if value is None or value == "":
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def parse_time(value):
+    if isinstance(value, time):
+        return value
+    return _parse_time_string(str(value).strip())
+
+
+@lru_cache(maxsize=4096)
+def _parse_time_string(value):
+    # В расписаниях мало различных значений времени, поэтому разбор кэшируется.
+    for time_format in TIME_FORMATS:
+        try:
+            return datetime.strptime(value, time_format).time()
+        except ValueError:
+            continue
+    raise RosterError(f"Неверное время: {value!r}")
+
+
+class SlugAllocator:
+    """
+    Выдаёт уникальные слаги так же, как ``slugify(unidecode(name))``,
+    добавляя к совпадающим суффикс ``-2``, ``-3`` и т. д.
+    """
+
+    def __init__(self, existing):
+        self.taken = set(existing)
+
+    def allocate(self, name):
+        base = slugify(unidecode(name))[:SLUG_MAX_LENGTH] or "doctor"
+        slug, number = base, 1
+        while slug in self.taken:
+            number += 1
+            suffix = f"-{number}"
+            slug = f"{base[:SLUG_MAX_LENGTH - len(suffix)]}{suffix}"
+        self.taken.add(slug)
+        return slug
+
+
+class IntervalIndex:
+    """Непересекающиеся интервалы ``[start, end)`` по ключу."""
+
+    def __init__(self):
+        self._intervals = defaultdict(list)
+
+    def overlaps(self, key, start, end):
+        intervals = self._intervals[key]
+        position = bisect_left(intervals, (start, end))
+        if position and intervals[position - 1][1] > start:
+            return True
+        return position < len(intervals) and intervals[position][0] < end
+
+    def add(self, key, start, end):
+        intervals = self._intervals[key]
+        intervals.insert(bisect_left(intervals, (start, end)), (start, end))
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def error(self, line, message):
+        self.errors.append((line, message))
+
+
+def _office_conflict(using, doctor_id, office):
+    """Пересекается ли расписание врача с занятостью кабинета ``office``."""
+    schedules = Schedule.objects.using(using).values_list("day_of_week", "start_time", "end_time")
+    occupied = IntervalIndex()
+    for day, start, end in schedules.filter(office=office).exclude(doctor_id=doctor_id):
+        occupied.add(day, start, end)
+    return any(
+        occupied.overlaps(day, start, end)
+        for day, start, end in schedules.filter(doctor_id=doctor_id)
+    )
+
+
+def _refresh_search_index(using, doctor_ids):
+    rows = Doctor.objects.using(using).filter(pk__in=doctor_ids).values_list(
+        "pk", *search.SEARCH_FIELDS
+    )
+    search.index_rows(connections[using], list(rows))
+
+
+def import_doctors(records, batch_size=1000, using="default"):
+    """
+    Загружает врачей из пар ``(номер строки, запись)``. Запись с известным
+    слагом (в том числе созданным в этой же загрузке) обновляет врача,
+    остальные создаются с новым уникальным слагом.
+    """
+    result = ImportResult()
+    slugs = SlugAllocator(Doctor.objects.using(using).values_list("slug", flat=True))
+    existing = {
+        slug: (pk, office)
+        for slug, pk, office in Doctor.objects.using(using).values_list("slug", "pk", "office")
+    }
+
+    for chunk in chunked(records, batch_size):
+        now = timezone.now()
+        # По слагу: повторная запись о том же враче в пачке заменяет прежнюю.
+        to_create, to_update = {}, {}
+        for line, record in chunk:
+            name = str(record.get("name") or "").strip()
+            if not name:
+                result.error(line, "Не указано ФИО врача")
+                continue
+            slug = str(record.get("slug") or "").strip()
+            if slug and (slugify(slug) != slug or len(slug) > SLUG_MAX_LENGTH):
+                result.error(line, f"Неверный слаг: {slug!r}")
+                continue
+            doctor = Doctor(
+                updated_at=now,
+                name=name,
+                specialization=str(record.get("specialization") or "").strip(),
+                office=str(record.get("office") or "").strip(),
+                is_published=parse_bool(record.get("is_published")),
+            )
+            if slug in to_create:
+                doctor.slug = slug
+                to_create[slug] = doctor
+            elif slug in existing:
+                doctor.pk, doctor.slug = existing[slug][0], slug
+                if doctor.office != existing[slug][1] and _office_conflict(
+                    using, doctor.pk, doctor.office
+                ):
+                    result.error(line, f"Кабинет {doctor.office} занят в часы приёма врача")
+                    continue
+                to_update[slug] = doctor
+            else:
+                doctor.slug = slug if slug and slug not in slugs.taken else slugs.allocate(name)
+                slugs.taken.add(doctor.slug)
+                to_create[doctor.slug] = doctor
+        to_create, to_update = list(to_create.values()), list(to_update.values())
+
+        with transaction.atomic(using=using):
+            Doctor.objects.using(using).bulk_create(to_create, batch_size=batch_size)
+            Doctor.objects.using(using).bulk_update(
+                to_update, ["name", "specialization", "office", "is_published", "updated_at"],
+                batch_size=batch_size,
+            )
+            created = dict(
+                Doctor.objects.using(using)
+                .filter(slug__in=[doctor.slug for doctor in to_create])
+                .values_list("slug", "pk")
+            )
+            existing.update(
+                (doctor.slug, (created[doctor.slug], doctor.office)) for doctor in to_create
+            )
+            existing.update((doctor.slug, (doctor.pk, doctor.office)) for doctor in to_update)
+            # Кабинет врача копируется во все его расписания, как в Schedule.save().
+            for doctor in to_update:
+                Schedule.objects.using(using).filter(doctor_id=doctor.pk).exclude(
+                    office=doctor.office
+                ).update(office=doctor.office, updated_at=now)
+            changed = list(created.values()) + [doctor.pk for doctor in to_update]
+            _refresh_search_index(using, changed)
+
+        for doctor in to_update:
+            bump_version(doctor.pk, FRAGMENTS)
+        result.created += len(to_create)
+        result.updated += len(to_update)
+    return result
+
+
+def import_schedules(records, batch_size=5000, using="default"):
+    """
+    Загружает расписания. Кабинет берётся у врача; строки, пересекающиеся
+    по времени с расписанием того же врача или того же кабинета, отклоняются.
+    """
+    result = ImportResult()
+    doctors = {
+        slug: (pk, office)
+        for slug, pk, office in Doctor.objects.using(using).values_list("slug", "pk", "office")
+    }
+    by_doctor, by_office = IntervalIndex(), IntervalIndex()
+    rows = Schedule.objects.using(using).values_list(
+        "doctor_id", "office", "day_of_week", "start_time", "end_time"
+    )
+    for doctor_id, office, day, start, end in rows.iterator(chunk_size=batch_size):
+        by_doctor.add((doctor_id, day), start, end)
+        by_office.add((office, day), start, end)
+
+    for chunk in chunked(records, batch_size):
+        to_create = []
+        for line, record in chunk:
+            try:
+                slug = str(record.get("doctor") or "").strip()
+                if slug not in doctors:
+                    raise RosterError(f"Врач {slug!r} не найден")
+                doctor_id, office = doctors[slug]
+                day = int(record.get("day_of_week"))
+                if not 1 <= day <= 7:
+                    raise RosterError(f"Неверный день недели: {day}")
+                start = parse_time(record.get("start_time"))
+                end = parse_time(record.get("end_time"))
+                if start >= end:
+                    raise RosterError("Время начала должно быть раньше времени окончания")
+                if by_doctor.overlaps((doctor_id, day), start, end):
+                    raise RosterError("Пересекается с расписанием врача")
+                if by_office.overlaps((office, day), start, end):
+                    raise RosterError(f"Кабинет {office} в это время занят")
+            except (RosterError, TypeError, ValueError) as error:
+                result.error(line, str(error))
+                continue
+            by_doctor.add((doctor_id, day), start, end)
+            by_office.add((office, day), start, end)
+            to_create.append(Schedule(
+                doctor_id=doctor_id, day_of_week=day,
+                start_time=start, end_time=end, office=office,
+            ))
+
+        with transaction.atomic(using=using):
+            Schedule.objects.using(using).bulk_create(to_create, batch_size=batch_size)
+
+        for doctor_id in {schedule.doctor_id for schedule in to_create}:
+            bump_version(doctor_id, AVAILABILITY)
+            bump_version(doctor_id, FRAGMENTS)
+        result.created += len(to_create)
+    return result
+
+
+def export_doctors(using="default", chunk_size=2000):
+    rows = Doctor.objects.using(using).order_by("pk").values_list(*DOCTOR_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield dict(zip(DOCTOR_FIELDS, row))
+
+
+def export_schedules(using="default", chunk_size=5000):
+    rows = (
+        Schedule.objects.using(using)
+        .order_by("doctor__slug", "day_of_week", "start_time")
+        .values_list("doctor__slug", "day_of_week", "start_time", "end_time", "office")
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        record = dict(zip(SCHEDULE_FIELDS, row))
+        record["start_time"] = record["start_time"].strftime("%H:%M")
+        record["end_time"] = record["end_time"].strftime("%H:%M")
+        yield record
+
+
+def write_records(stream, records, fields, fmt):
+    if fmt == "csv":
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(records)
+        return
+    for record in records:
+        stream.write(json.dumps(record, ensure_ascii=False))
+        stream.write("\n")
@@ -0,0 +1,204 @@
+"""
+Полнотекстовый поиск врачей по ФИО, специализации и кабинету.
+
+Поля врача индексируются в транслитерированном виде (``unidecode``),
+а запрос транслитерируется так же, поэтому запросы кириллицей и латиницей
+находят одних и тех же врачей. Индекс хранится в отдельной таблице:
+FTS5 в SQLite и ``tsvector`` с GIN-индексом в PostgreSQL. На остальных
+бэкендах поиск выполняется через ``icontains``.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from unidecode import unidecode
+
+
+INDEX_TABLE = "doctors_doctor_search"
+SEARCH_RESULTS_LIMIT = 20
+SEARCH_FIELDS = ("name", "specialization", "office")
+
+WORD_RE = re.compile(r"\w+")
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5(
+        name, specialization, office,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )
+    """,
+]
+SQLITE_UNINSTALL = [f"DROP TABLE IF EXISTS {INDEX_TABLE}"]
+
+POSTGRESQL_INSTALL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {INDEX_TABLE} (
+        doctor_id bigint PRIMARY KEY REFERENCES doctors_doctor (id)
+            ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+        document tsvector NOT NULL
+    )
+    """,
+    f"CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_gin ON {INDEX_TABLE} USING gin (document)",
+]
+POSTGRESQL_UNINSTALL = [f"DROP TABLE IF EXISTS {INDEX_TABLE}"]
+
+# Веса полей: совпадение в ФИО важнее специализации и кабинета.
+SQLITE_RANK = f"bm25({INDEX_TABLE}, 10.0, 4.0, 1.0)"
+POSTGRESQL_DOCUMENT = (
+    "setweight(to_tsvector('simple', %s), 'A') || "
+    "setweight(to_tsvector('simple', %s), 'B') || "
+    "setweight(to_tsvector('simple', %s), 'C')"
+)
+
+
+def transliterate(text):
+    return unidecode(text or "").lower()
+
+
+def query_words(query):
+    return WORD_RE.findall(transliterate(query))
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_index(connection):
+    """Создаёт таблицу поискового индекса для бэкенда соединения."""
+    _execute(connection, {
+        "sqlite": SQLITE_INSTALL,
+        "postgresql": POSTGRESQL_INSTALL,
+    }.get(connection.vendor, []))
+
+
+def uninstall_index(connection):
+    _execute(connection, {
+        "sqlite": SQLITE_UNINSTALL,
+        "postgresql": POSTGRESQL_UNINSTALL,
+    }.get(connection.vendor, []))
+
+
+def index_rows(connection, rows):
+    """
+    Записывает в индекс строки ``(id, name, specialization, office)``.
+
+    Используется и при сохранении одного врача, и при массовой загрузке.
+    """
+    rows = [
+        (pk, *(transliterate(value) for value in values))
+        for pk, *values in rows
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {INDEX_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {INDEX_TABLE} (rowid, name, specialization, office) "
+                "VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+        elif connection.vendor == "postgresql":
+            cursor.executemany(
+                f"INSERT INTO {INDEX_TABLE} (doctor_id, document) "
+                f"VALUES (%s, {POSTGRESQL_DOCUMENT}) "
+                "ON CONFLICT (doctor_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+
+def unindex_ids(connection, ids):
+    if connection.vendor == "sqlite":
+        column = "rowid"
+    elif connection.vendor == "postgresql":
+        column = "doctor_id"
+    else:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {INDEX_TABLE} WHERE {column} = %s", [(pk,) for pk in ids]
+        )
+
+
+def rebuild_index(model, using="default", batch_size=2000):
+    """Перестраивает индекс по всем врачам."""
+    connection = connections[using]
+    if connection.vendor not in ("sqlite", "postgresql"):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {INDEX_TABLE}")
+    rows = model._base_manager.using(using).values_list("pk", *SEARCH_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_rows(connection, batch)
+            batch = []
+    index_rows(connection, batch)
+
+
+def _ranked_ids(queryset, words, limit):
+    """
+    Идентификаторы врачей из ``queryset`` по убыванию релевантности.
+    Условия ``queryset`` входят в запрос к индексу, поэтому ``LIMIT``
+    применяется уже к подходящим строкам.
+    """
+    connection = connections[queryset.db]
+    candidates, candidate_params = (
+        queryset.order_by().values("pk").query.get_compiler(queryset.db).as_sql()
+    )
+    if connection.vendor == "sqlite":
+        sql = (
+            f"SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s "
+            f"AND rowid IN ({candidates}) ORDER BY {SQLITE_RANK}"
+        )
+        params = [" ".join(f'"{word}"*' for word in words), *candidate_params]
+    else:
+        sql = (
+            f"SELECT doctor_id FROM {INDEX_TABLE} "
+            f"WHERE document @@ to_tsquery('simple', %s) AND doctor_id IN ({candidates}) "
+            "ORDER BY ts_rank(document, to_tsquery('simple', %s)) DESC"
+        )
+        tsquery = " & ".join(f"{word}:*" for word in words)
+        params = [tsquery, *candidate_params, tsquery]
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_doctors(queryset, query, limit=SEARCH_RESULTS_LIMIT):
+    """
+    Врачи из ``queryset``, подходящие под запрос, по убыванию релевантности
+    (аннотация ``search_rank``).
+
+    Каждое слово запроса ищется как префикс, все слова обязательны.
+    """
+    words = query_words(query)
+    if not words:
+        return queryset.none()
+
+    if connections[queryset.db].vendor in ("sqlite", "postgresql"):
+        ids = _ranked_ids(queryset, words, limit)
+    else:
+        matches = queryset
+        for word in query.split():
+            matches = matches.filter(
+                Q(name__icontains=word)
+                | Q(specialization__icontains=word)
+                | Q(office__icontains=word)
+            )
+        ids = matches.values_list("pk", flat=True)
+        ids = list(ids[:limit] if limit else ids)
+    if not ids:
+        return queryset.none()
+    rank = Case(
+        *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+        output_field=IntegerField(),
+    )
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank).order_by("search_rank")
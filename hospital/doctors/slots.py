@@ -0,0 +1,200 @@
+"""
+Расчёт свободных слотов записи на приём.
+
+Недельное расписание врача компилируется в битовую сетку: для каждого дня
+недели одно целое число, в котором бит ``m`` выставлен, если в минуту ``m``
+от начала суток начинается слот приёма. Занятое время вычитается одной
+битовой операцией, а подписи и объекты ``time`` берутся из заранее
+посчитанных таблиц, поэтому на каждый запрос не создаются ``datetime``.
+"""
+from collections import defaultdict
+from datetime import time, timedelta
+
+from . import cache
+from .models import Appointment, Schedule
+
+
+SLOT_MINUTES = 30
+MINUTES_IN_DAY = 24 * 60
+
+SLOT_LABELS = tuple(f"{m // 60:02d}:{m % 60:02d}" for m in range(MINUTES_IN_DAY))
+SLOT_TIMES = tuple(time(m // 60, m % 60) for m in range(MINUTES_IN_DAY))
+
+
+def to_minutes(value):
+    """Переводит ``time`` в количество минут от начала суток."""
+    return value.hour * 60 + value.minute
+
+
+def interval_mask(start_time, end_time, step=SLOT_MINUTES):
+    """Битовая маска начал слотов от ``start_time`` до ``end_time``."""
+    mask = 0
+    for minute in range(to_minutes(start_time), to_minutes(end_time), step):
+        mask |= 1 << minute
+    return mask
+
+
+def times_mask(times):
+    """Битовая маска для набора значений ``time``."""
+    mask = 0
+    for value in times:
+        mask |= 1 << to_minutes(value)
+    return mask
+
+
+def iter_minutes(mask):
+    """Перебирает выставленные биты маски по возрастанию."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class WeeklySlotGrid:
+    """Скомпилированное недельное расписание врача."""
+
+    __slots__ = ("_days",)
+
+    def __init__(self, rows=()):
+        self._days = [0] * 8
+        for day_of_week, start_time, end_time in rows:
+            self._days[day_of_week] |= interval_mask(start_time, end_time)
+
+    @classmethod
+    def for_doctor(cls, doctor, day_of_week=None):
+        """Загружает расписание врача одним запросом."""
+        rows = Schedule.objects.filter(doctor=doctor)
+        if day_of_week is not None:
+            rows = rows.filter(day_of_week=day_of_week)
+        return cls(rows.values_list("day_of_week", "start_time", "end_time"))
+
+    def day_mask(self, day_of_week):
+        return self._days[day_of_week]
+
+    def free_mask(self, selected_date, occupied_times=()):
+        return self._days[selected_date.isoweekday()] & ~times_mask(occupied_times)
+
+    def free_labels(self, selected_date, occupied_times=()):
+        """Свободные слоты дня в виде строк ``HH:MM``."""
+        labels = SLOT_LABELS
+        return [labels[m] for m in iter_minutes(self.free_mask(selected_date, occupied_times))]
+
+    def free_times(self, selected_date, occupied_times=()):
+        """Свободные слоты дня в виде объектов ``time``."""
+        times = SLOT_TIMES
+        return [times[m] for m in iter_minutes(self.free_mask(selected_date, occupied_times))]
+
+
+def occupied_times(doctor, selected_date):
+    """Время уже занятых записей врача на указанную дату."""
+    return Appointment.objects.filter(
+        doctor=doctor,
+        date=selected_date,
+        status__in=Appointment.APPOINTMENT_STATUSES,
+        is_published=True,
+    ).values_list("time", flat=True)
+
+
+def get_free_slots(doctor, selected_date):
+    """Свободные слоты врача на дату в виде строк ``HH:MM``."""
+    grid = WeeklySlotGrid.for_doctor(doctor, selected_date.isoweekday())
+    if not grid.day_mask(selected_date.isoweekday()):
+        return []
+    return grid.free_labels(selected_date, occupied_times(doctor, selected_date))
+
+
+def schedule_rows(doctor):
+    """Строки недельного расписания врача для ``WeeklySlotGrid``."""
+    return list(
+        Schedule.objects.filter(doctor=doctor).values_list("day_of_week", "start_time", "end_time")
+    )
+
+
+def occupied_rows(doctor, start_date, end_date):
+    """Пары ``(date, time)`` занятых записей врача в диапазоне дат."""
+    return list(
+        Appointment.objects.filter(
+            doctor=doctor,
+            date__range=(start_date, end_date),
+            status__in=Appointment.APPOINTMENT_STATUSES,
+            is_published=True,
+        ).values_list("date", "time")
+    )
+
+
+def date_range(start_date, days):
+    return [start_date + timedelta(days=offset) for offset in range(days)]
+
+
+def free_slots_by_date(grid, dates, rows):
+    """Свободные слоты по датам из сетки и занятых записей ``rows``."""
+    occupied = defaultdict(set)
+    for appointment_date, appointment_time in rows:
+        occupied[appointment_date].add(appointment_time)
+    return {day: grid.free_labels(day, occupied.get(day, ())) for day in dates}
+
+
+def get_free_slots_range(doctor, start_date, days):
+    """
+    Свободные слоты врача на ``days`` дней начиная с ``start_date``.
+
+    Расписание и записи загружаются двумя запросами на весь диапазон
+    и группируются по датам в памяти.
+    """
+    grid = WeeklySlotGrid(schedule_rows(doctor))
+    dates = date_range(start_date, days)
+    rows = ()
+    if any(grid.day_mask(day.isoweekday()) for day in dates):
+        rows = occupied_rows(doctor, dates[0], dates[-1])
+    return free_slots_by_date(grid, dates, rows)
+
+
+def get_cached_free_slots(doctor, selected_date):
+    """То же, что ``get_free_slots``, но через кэш доступности."""
+    cached = CachedRange(doctor.pk, selected_date, 1)
+    if cached.slots is None:
+        cached.store({selected_date: get_free_slots(doctor, selected_date)})
+    return cached.slots[selected_date]
+
+
+class CachedRange:
+    """
+    Диапазон дней в кэше доступности.
+
+    Дни хранятся в кэше по отдельности; ``slots`` равен ``None``,
+    если хотя бы одного дня нет и диапазон нужно пересчитать. Когда кэш
+    в запросе не читается или не пишется (``cache.reads_enabled``,
+    ``cache.writes_enabled``), соответствующие обращения пропускаются.
+    """
+
+    def __init__(self, doctor_id, start_date, days):
+        self.dates = date_range(start_date, days)
+        self.keys, self.cached, self.slots = {}, {}, None
+        if not cache.reads_enabled():
+            return
+        version = cache.get_version(doctor_id)
+        self.keys = {cache.slots_key(doctor_id, version, day): day for day in self.dates}
+        self.cached = cache.get_cache().get_many(self.keys)
+        cache.stats.record("hits", len(self.cached))
+        self.slots = None
+        if len(self.cached) == len(self.keys):
+            self.slots = {day: self.cached[key] for key, day in self.keys.items()}
+        else:
+            cache.stats.record("misses", len(self.keys) - len(self.cached))
+
+    def store(self, slots):
+        if self.keys and cache.writes_enabled():
+            cache.get_cache().set_many(
+                {key: slots[day] for key, day in self.keys.items() if key not in self.cached},
+                cache.SLOTS_TIMEOUT,
+            )
+        self.slots = slots
+        return slots
+
+
+def get_cached_free_slots_range(doctor, start_date, days):
+    """То же, что ``get_free_slots_range``, но через кэш доступности."""
+    cached = CachedRange(doctor.pk, start_date, days)
+    if cached.slots is not None:
+        return cached.slots
+    return cached.store(get_free_slots_range(doctor, start_date, days))
@@ -0,0 +1,176 @@
+"""
+Загрузка врачей по дням.
+
+Счётчики ``DoctorDayStats`` ведутся при сохранении и удалении записей
+на приём (см. ``Appointment.save``), поэтому отчёт читает только их.
+Здесь — пересчёт счётчиков по записям и архиву, учёт массовой смены
+статуса и расчёт ёмкости расписания для отчёта.
+
+Ёмкость прошедших дней берётся из снимков ``DoctorDayStats.capacity``:
+``snapshot_capacity`` запускается в конце каждого дня (команда
+``snapshot_capacity``). Для сегодняшнего и будущих дней, а также для
+прошедших дней без снимка считается по текущему расписанию.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.db.models import Count
+
+from .models import Appointment, AppointmentArchive, Doctor, DoctorDayStats, Schedule
+from .roster import chunked
+from .slots import WeeklySlotGrid
+
+
+STATUSES = ("scheduled", "completed", "cancelled")
+
+
+def record_status_change(queryset, status):
+    """
+    Учитывает в счётчиках смену статуса выбранных записей на ``status``.
+
+    Вызывается в одной транзакции с ``queryset.update(status=status)``:
+    ``update`` не вызывает ``save`` и сигналы. Строки блокируются до
+    подсчёта, чтобы одновременная отмена не была учтена дважды.
+    """
+    ids = list(queryset.select_for_update().values_list("pk", flat=True))
+    deltas = defaultdict(int)
+    rows = (
+        Appointment.objects.using(queryset.db)
+        .filter(pk__in=ids, is_published=True)
+        .exclude(status=status)
+        .order_by()
+        .values("doctor_id", "date", "status")
+        .annotate(count=Count("pk"))
+        .values_list("doctor_id", "date", "status", "count")
+    )
+    for doctor_id, date, old_status, count in rows:
+        deltas[(doctor_id, date, old_status)] -= count
+        deltas[(doctor_id, date, status)] += count
+    DoctorDayStats.objects.db_manager(queryset.db).apply(deltas)
+
+
+def rebuild_day_stats(doctor_ids=None, batch_size=100, using="default"):
+    """
+    Пересчитывает счётчики по записям и архиву; возвращает число строк.
+
+    Врачи обрабатываются пачками, каждая — в своей транзакции. Записи,
+    сделанные во время пересчёта пачки, могут не попасть в счётчики,
+    поэтому команду лучше запускать в спокойное время.
+    """
+    doctors = Doctor.objects.using(using).order_by("pk").values_list("pk", flat=True)
+    if doctor_ids is not None:
+        doctors = doctors.filter(pk__in=doctor_ids)
+
+    created = 0
+    for chunk in chunked(doctors.iterator(), batch_size):
+        counts = defaultdict(lambda: dict.fromkeys(STATUSES, 0))
+        for model in (Appointment, AppointmentArchive):
+            rows = (
+                model.objects.using(using)
+                .filter(doctor_id__in=chunk, is_published=True)
+                .order_by()
+                .values("doctor_id", "date", "status")
+                .annotate(count=Count("pk"))
+                .values_list("doctor_id", "date", "status", "count")
+            )
+            for doctor_id, date, status, count in rows:
+                counts[(doctor_id, date)][status] += count
+
+        with transaction.atomic(using=using):
+            # Снимки ёмкости пересчитать нельзя: расписание с тех пор могло измениться.
+            snapshots = (
+                DoctorDayStats.objects.using(using)
+                .filter(doctor_id__in=chunk, capacity__isnull=False)
+                .values_list("doctor_id", "date", "capacity")
+            )
+            for doctor_id, date, capacity in snapshots:
+                counts[(doctor_id, date)]["capacity"] = capacity
+            DoctorDayStats.objects.using(using).filter(doctor_id__in=chunk).delete()
+            DoctorDayStats.objects.using(using).bulk_create(
+                [
+                    DoctorDayStats(doctor_id=doctor_id, date=date, **values)
+                    for (doctor_id, date), values in counts.items()
+                ],
+                batch_size=1000,
+            )
+        created += len(counts)
+    return created
+
+
+def schedule_grids(doctor_ids, using="default"):
+    """Текущее недельное расписание каждого врача: ``{doctor_id: WeeklySlotGrid}``."""
+    rows = defaultdict(list)
+    schedules = Schedule.objects.using(using).filter(doctor_id__in=doctor_ids).values_list(
+        "doctor_id", "day_of_week", "start_time", "end_time"
+    )
+    for doctor_id, *row in schedules:
+        rows[doctor_id].append(row)
+    return {doctor_id: WeeklySlotGrid(rows.get(doctor_id, ())) for doctor_id in doctor_ids}
+
+
+def slot_count(grid, day):
+    return bin(grid.day_mask(day.isoweekday())).count("1")
+
+
+def daily_capacity(doctor_ids, start_date, end_date):
+    """
+    Число слотов каждого врача по дням с ``start_date`` по ``end_date``:
+    ``{doctor_id: {date: n}}``.
+    """
+    today = timezone.localdate()
+    snapshots = defaultdict(dict)
+    if start_date < today:
+        rows = DoctorDayStats.objects.filter(
+            doctor_id__in=doctor_ids,
+            date__range=(start_date, min(end_date, today - timedelta(days=1))),
+            capacity__isnull=False,
+        ).values_list("doctor_id", "date", "capacity")
+        for doctor_id, date, capacity in rows:
+            snapshots[doctor_id][date] = capacity
+
+    grids = schedule_grids(doctor_ids)
+    result = {}
+    for doctor_id in doctor_ids:
+        days, day = {}, start_date
+        while day <= end_date:
+            days[day] = snapshots[doctor_id].get(day)
+            if days[day] is None:
+                days[day] = slot_count(grids[doctor_id], day)
+            day += timedelta(days=1)
+        result[doctor_id] = days
+    return result
+
+
+def capacity(doctor_ids, start_date, end_date):
+    """Число слотов каждого врача за весь период с ``start_date`` по ``end_date``."""
+    return {
+        doctor_id: sum(days.values())
+        for doctor_id, days in daily_capacity(doctor_ids, start_date, end_date).items()
+    }
+
+
+def snapshot_capacity(day, batch_size=500, using="default"):
+    """
+    Запоминает ёмкость расписания всех врачей на ``day``; возвращает
+    число врачей. Повторный запуск за тот же день перезаписывает снимок.
+    """
+    doctors = (
+        Schedule.objects.using(using).order_by("doctor_id")
+        .values_list("doctor_id", flat=True).distinct()
+    )
+    count = 0
+    for chunk in chunked(doctors.iterator(), batch_size):
+        grids = schedule_grids(chunk, using)
+        with transaction.atomic(using=using):
+            DoctorDayStats.objects.using(using).bulk_create(
+                [DoctorDayStats(doctor_id=doctor_id, date=day) for doctor_id in chunk],
+                ignore_conflicts=True,
+            )
+            for doctor_id in chunk:
+                DoctorDayStats.objects.using(using).filter(doctor_id=doctor_id, date=day).update(
+                    capacity=slot_count(grids[doctor_id], day)
+                )
+        count += len(chunk)
+    return count
@@ -0,0 +1,54 @@
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from .models import Appointment
+from .templatetags.doctors_admin import range_date_hierarchy
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def appointments(book):
+    return [book(day) for day in (date(2023, 12, 30), date(2024, 2, 10))]
+
+
+def changelist(**params):
+    return SimpleNamespace(
+        date_hierarchy="date",
+        params={f"date__{name}": value for name, value in params.items()},
+        queryset=Appointment.objects.all(),
+        get_query_string=lambda new, remove: "?" + "&".join(f"{k}={v}" for k, v in new.items()),
+    )
+
+
+def titles(result):
+    return [choice["title"] for choice in result["choices"]]
+
+
+def test_status_is_editable_in_list(client, appointments):
+    client.force_login(User.objects.create_superuser("admin", password="password"))
+    response = client.get(reverse("admin:doctors_appointment_changelist"))
+    assert 'name="form-0-status"' in response.content.decode()
+
+
+def test_date_hierarchy_levels(appointments):
+    assert titles(range_date_hierarchy(changelist())) == ["2023", "2024"]
+    months = titles(range_date_hierarchy(changelist(year="2024")))
+    assert months == ["Январь 2024 г.", "Февраль 2024 г."]
+    result = range_date_hierarchy(changelist(year="2024", month="2", day="10"))
+    assert result["back"]["link"] == "?date__year=2024&date__month=2"
+
+
+@pytest.mark.parametrize("params", [
+    {"year": "2024", "month": "2", "day": "31"},
+    {"year": "2024", "month": "13"},
+    {"year": "abc"},
+    {"year": "2024", "month": "2", "day": "x"},
+])
+def test_invalid_date_falls_back_to_years(appointments, params):
+    assert titles(range_date_hierarchy(changelist(**params))) == ["2023", "2024"]
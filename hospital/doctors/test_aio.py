@@ -0,0 +1,72 @@
+import json
+import threading
+from datetime import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+from . import aio, views
+
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+FREE_TIMES = ["09:00", "10:00", "10:30"]
+
+
+@pytest.fixture(autouse=True)
+def timetable(schedule, tomorrow, book):
+    schedule(tomorrow, end=time(11, 0))
+    book(tomorrow, time(9, 30))
+
+
+def async_request(user, method, path, data, **extra):
+    request = getattr(RequestFactory(), method)(path, data, **extra)
+    request.user = user
+    return request
+
+
+def free_slots_request(doctor, patient, tomorrow):
+    return async_request(
+        patient, "post", f"/doctors/{doctor.slug}/appointment/",
+        {"date": tomorrow.isoformat()}, HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+    )
+
+
+def test_availability_matches_sync_view(client, doctor, patient, tomorrow):
+    client.force_login(patient)
+    path = f"/doctors/{doctor.slug}/availability/"
+    params = {"from": tomorrow.isoformat(), "days": 3}
+    expected = client.get(path, params).json()
+    assert expected["days"][tomorrow.isoformat()] == FREE_TIMES
+    for _ in range(2):
+        # Второй запрос обслуживается из кэша.
+        response = async_to_sync(views.availability_async)(
+            async_request(patient, "get", path, params), slug=doctor.slug
+        )
+        assert response.status_code == 200
+        assert json.loads(response.content) == expected
+
+    request = async_request(patient, "get", path, params, HTTP_IF_NONE_MATCH=response["ETag"])
+    response = async_to_sync(views.availability_async)(request, slug=doctor.slug)
+    assert response.status_code == 304
+
+
+def test_free_slots_for_date(doctor, patient, tomorrow):
+    response = async_to_sync(views.create_appointment_async)(
+        free_slots_request(doctor, patient, tomorrow), slug=doctor.slug
+    )
+    assert json.loads(response.content) == {"times": FREE_TIMES}
+
+
+def test_shared_cache_is_used_from_pool(settings, doctor, patient, tomorrow):
+    def thread_name():
+        return threading.current_thread().name
+
+    assert not async_to_sync(aio.run_cache)(thread_name).startswith("async-db")
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    assert async_to_sync(aio.run_cache)(thread_name).startswith("async-db")
+    response = async_to_sync(views.create_appointment_async)(
+        free_slots_request(doctor, patient, tomorrow), slug=doctor.slug
+    )
+    assert json.loads(response.content) == {"times": FREE_TIMES}
@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .archive import archive_appointments, retention_cutoff
+from .cache import get_version
+from .models import Appointment, AppointmentArchive, DoctorDayStats, Notification
+
+
+pytestmark = pytest.mark.django_db
+
+CUTOFF = date(2024, 1, 10)
+
+
+def january(day):
+    return date(2024, 1, day)
+
+
+def test_old_appointments_are_moved_in_batches(doctor, book):
+    old = [book(january(day), status="completed") for day in range(1, 6)]
+    recent = book(january(10))
+    Notification.objects.create(appointment=old[0], kind=Notification.KIND_CHOICES[0][0])
+    stats = DoctorDayStats.objects.get(doctor=doctor, date=old[0].date)
+    version = get_version(doctor.pk)
+
+    assert list(archive_appointments(CUTOFF, batch_size=2)) == [2, 2, 1]
+
+    assert list(Appointment.objects.all()) == [recent]
+    archived = AppointmentArchive.objects.order_by("pk")
+    assert [row.pk for row in archived] == [appointment.pk for appointment in old]
+    assert {(row.date, row.status) for row in archived} == {
+        (appointment.date, "completed") for appointment in old
+    }
+    # Удаление идёт мимо сигналов: история и счётчики за прошлые дни остаются.
+    assert Notification.objects.filter(appointment_id=old[0].pk).exists()
+    assert DoctorDayStats.objects.get(pk=stats.pk).completed == stats.completed
+    assert get_version(doctor.pk) != version
+
+
+def test_rerun_skips_already_archived_ids(doctor, patient, book):
+    appointment = book(january(1))
+    AppointmentArchive.objects.create(
+        id=appointment.pk, doctor=doctor, patient=patient, date=appointment.date,
+        time=appointment.time, status="completed",
+    )
+    assert list(archive_appointments(CUTOFF)) == [1]
+    assert not Appointment.objects.exists()
+    assert AppointmentArchive.objects.get().status == "completed"
+    assert list(archive_appointments(CUTOFF)) == []
+
+
+def test_command(book, settings):
+    settings.APPOINTMENT_RETENTION_DAYS = 30
+    cutoff = retention_cutoff()
+    book(cutoff - timedelta(days=1))
+    book(cutoff)
+
+    out = StringIO()
+    call_command("archive_appointments", dry_run=True, stdout=out)
+    assert f"Записей раньше {cutoff}: 1" in out.getvalue()
+    assert AppointmentArchive.objects.count() == 0
+
+    call_command("archive_appointments", stdout=out)
+    assert AppointmentArchive.objects.count() == 1
+    assert Appointment.objects.get().date == cutoff
+
+
+def test_delete_is_split_by_query_param_limit(book, monkeypatch):
+    monkeypatch.setattr(connection.features, "max_query_params", 2)
+    for day in range(1, 6):
+        book(january(day), status="completed")
+    with CaptureQueriesContext(connection) as queries:
+        assert list(archive_appointments(CUTOFF)) == [5]
+    deletes = [query["sql"] for query in queries if query["sql"].startswith("DELETE")]
+    assert len(deletes) == 3
+    assert not Appointment.objects.exists()
+    assert AppointmentArchive.objects.count() == 5
@@ -0,0 +1,81 @@
+from datetime import time
+
+import pytest
+
+from hospital.database import PIN_COOKIE
+
+from .cache import get_version, stats as cache_stats
+from .models import Schedule
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_booking_invalidates_cached_slots(
+    client, doctor, patient, schedule, tomorrow, django_capture_on_commit_callbacks
+):
+    schedule(tomorrow)
+    client.force_login(patient)
+    cache_stats.reset()
+
+    def free_slots():
+        response = client.get(
+            f"/doctors/{doctor.slug}/availability/", {"from": tomorrow.isoformat(), "days": 1}
+        )
+        return response.json()["days"][tomorrow.isoformat()]
+
+    assert free_slots() == ["09:00", "09:30"]
+    assert free_slots() == ["09:00", "09:30"]
+    assert cache_stats.local == {"hits": 1, "misses": 1}
+
+    version = get_version(doctor.pk)
+    with django_capture_on_commit_callbacks() as callbacks:
+        client.post(
+            f"/doctors/{doctor.slug}/appointment/",
+            {"date": tomorrow.isoformat(), "time": "09:00"},
+        )
+    # До фиксации версия не меняется: иначе под ней оказались бы старые данные.
+    assert get_version(doctor.pk) == version
+    for callback in callbacks:
+        callback()
+    assert get_version(doctor.pk) != version
+
+    # Пока чтение закреплено за основной базой, кэш не используется.
+    assert free_slots() == ["09:30"]
+    assert cache_stats.local == {"hits": 1, "misses": 1}
+    del client.cookies[PIN_COOKIE]
+    assert free_slots() == ["09:30"]
+    assert cache_stats.local == {"hits": 1, "misses": 2}
+    assert cache_stats.shared() == {"hits": 1, "misses": 2}
+
+
+def pages(client, doctor):
+    return (
+        client.get(f"/doctors/{doctor.slug}/").content.decode(),
+        client.get("/").content.decode(),
+    )
+
+
+def test_doctor_change_refreshes_card_and_detail(
+    client, doctor, django_capture_on_commit_callbacks
+):
+    assert all("Невролог" in page for page in pages(client, doctor))
+    doctor.specialization = "Кардиолог"
+    with django_capture_on_commit_callbacks() as callbacks:
+        doctor.save()
+    assert all("Невролог" in page for page in pages(client, doctor))
+    for callback in callbacks:
+        callback()
+    assert all("Кардиолог" in page for page in pages(client, doctor))
+
+
+def test_schedule_change_refreshes_schedule(client, doctor, django_capture_on_commit_callbacks):
+    assert "Расписание не найдено" in pages(client, doctor)[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        schedule = Schedule.objects.create(
+            doctor=doctor, day_of_week=3, start_time=time(8, 15), end_time=time(9, 0)
+        )
+    assert "08:15" in pages(client, doctor)[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        schedule.delete()
+    assert "Расписание не найдено" in pages(client, doctor)[0]
@@ -0,0 +1,49 @@
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+
+def get(client, url, etag=None):
+    headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+    return client.get(url, **headers)
+
+
+def test_unchanged_page_is_not_modified(client, doctor):
+    url = f"/doctors/{doctor.slug}/"
+    etag = get(client, url)["ETag"]
+    assert get(client, url, etag).status_code == 304
+    doctor.office = "304"
+    doctor.save()
+    response = get(client, url, etag)
+    assert response.status_code == 200
+    assert response["ETag"] != etag
+
+
+def test_new_login_invalidates_page_with_csrf_token(client, doctor, patient):
+    url = f"/doctors/{doctor.slug}/"
+    credentials = {"username": "patient", "password": "password"}
+    client.post("/auth/login/", credentials)
+    etag = get(client, url)["ETag"]
+    assert get(client, url, etag).status_code == 304
+
+    # Вход меняет CSRF-токен: форма записи из кэша браузера получила бы 403.
+    client.get("/auth/logout/")
+    client.post("/auth/login/", credentials)
+    response = get(client, url, etag)
+    assert response.status_code == 200
+    assert "csrfmiddlewaretoken" in response.content.decode()
+
+
+def test_last_modified_only_for_shared_variant(client, doctor, patient):
+    since = client.get("/")["Last-Modified"]
+    assert client.get("/", HTTP_IF_MODIFIED_SINCE=since).status_code == 304
+    # Другой поиск и страница пользователя по одной дате не подтверждаются.
+    response = client.get("/", {"q": "Сидоров"}, HTTP_IF_MODIFIED_SINCE=since)
+    assert response.status_code == 200
+    assert "Last-Modified" not in response
+    client.force_login(patient)
+    for url in ("/", f"/doctors/{doctor.slug}/"):
+        response = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        assert response.status_code == 200
+        assert "Last-Modified" not in response
@@ -0,0 +1,65 @@
+from datetime import date
+from io import StringIO
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+
+from .models import Appointment, Doctor, Schedule
+
+
+pytestmark = pytest.mark.django_db
+
+OPTIONS = {"doctors": 3, "users": 5, "past_days": 7, "future_days": 7, "today": "2024-03-01"}
+
+
+def generate(**options):
+    stderr = StringIO()
+    call_command("generate_data", stdout=StringIO(), stderr=stderr, **{**OPTIONS, **options})
+    return stderr.getvalue()
+
+
+def snapshot():
+    return sorted(Appointment.objects.values_list(
+        "doctor__name", "patient__last_name", "date", "time", "status", "is_published"
+    ))
+
+
+def test_exact_count_without_double_booking():
+    assert generate(appointments=40) == ""
+    assert Appointment.objects.count() == 40
+    slots = Appointment.objects.values_list("doctor_id", "date", "time")
+    assert len(set(slots)) == 40
+    days = Appointment.objects.dates("date", "day")
+    assert date(2024, 2, 23) <= days.first() and days.last() <= date(2024, 3, 8)
+
+
+def test_same_seed_and_date_give_same_data():
+    generate(appointments=30)
+    first = snapshot()
+    for model in (Appointment, Schedule, Doctor, User):
+        model.objects.all().delete()
+    generate(appointments=30)
+    assert snapshot() == first
+
+    generate(appointments=30, seed=7)
+    assert Appointment.objects.count() == 60
+
+
+def test_shortfall_is_reported():
+    stderr = generate(appointments=10 ** 6)
+    capacity = Appointment.objects.count()
+    assert f"свободных слотов: {capacity}" in stderr
+    assert f"не хватает {10 ** 6 - capacity}" in stderr
+
+
+def test_invalid_date():
+    with pytest.raises(CommandError, match="--today"):
+        generate(appointments=1, today="2024-02-31")
+
+
+def test_new_doctors_get_free_offices():
+    Doctor.objects.create(name="Иванов Иван", specialization="Терапевт", office="2")
+    generate(appointments=10, doctors=3)
+    offices = list(Doctor.objects.order_by("pk").values_list("office", flat=True))
+    assert offices == ["2", "1", "3", "4"]
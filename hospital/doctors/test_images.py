@@ -0,0 +1,67 @@
+from io import BytesIO
+
+import pytest
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from . import images
+from .models import Doctor
+
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_VARIANTS_SYNC = True
+    return tmp_path
+
+
+def photo(width, name="photo.jpg"):
+    buffer = BytesIO()
+    Image.new("RGB", (width, width // 2), "white").save(buffer, "JPEG")
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def create_doctor(width):
+    doctor = Doctor(name=f"Орлова Ольга {width}", specialization="Терапевт", office="1")
+    doctor.image = photo(width)
+    doctor.save()
+    doctor.refresh_from_db()
+    return doctor
+
+
+def existing_variants(name):
+    return [target for target in images.variant_names(name) if default_storage.exists(target)]
+
+
+def test_variants_are_not_wider_than_original():
+    doctor = create_doctor(500)
+    assert doctor.image_width == 500
+    assert existing_variants(doctor.image.name) == [
+        images.variant_name(doctor.image.name, 320, "webp"),
+        images.variant_name(doctor.image.name, 320, "jpg"),
+    ]
+    assert doctor.image_srcset["webp"].endswith("_w320.webp 320w")
+
+    narrow = create_doctor(200)
+    assert narrow.image_variants_ready
+    assert existing_variants(narrow.image.name) == []
+    assert narrow.image_srcset is None
+
+
+def test_variants_are_deleted_with_replaced_photo_and_doctor():
+    doctor = create_doctor(800)
+    old_name = doctor.image.name
+    assert len(existing_variants(old_name)) == 4
+
+    doctor.image = photo(800, name="new.jpg")
+    doctor.save()
+    assert existing_variants(old_name) == []
+    new_name = Doctor.objects.get(pk=doctor.pk).image.name
+    assert len(existing_variants(new_name)) == 4
+
+    Doctor.objects.get(pk=doctor.pk).delete()
+    assert existing_variants(new_name) == []
@@ -0,0 +1,58 @@
+from datetime import time
+
+import pytest
+
+from . import notifications
+from .cache import get_version
+from .models import Appointment, DoctorDayStats, Notification
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def timetable(client, patient, schedule, tomorrow):
+    schedule(tomorrow)
+    client.force_login(patient)
+
+
+def test_booking_and_cancellation_are_queued(client, doctor, patient, tomorrow, mailoutbox):
+    client.post(
+        f"/doctors/{doctor.slug}/appointment/", {"date": tomorrow.isoformat(), "time": "09:00"}
+    )
+    appointment = Appointment.objects.get()
+    client.post(f"/appointments/{appointment.pk}/cancel/")
+    assert len(mailoutbox) == 0
+    assert list(Notification.objects.order_by("pk").values_list("kind", flat=True)) == [
+        Notification.BOOKED, Notification.CANCELLED,
+    ]
+
+    assert notifications.dispatch() == {Notification.SENT: 2}
+    assert [message.to for message in mailoutbox] == [[patient.email]] * 2
+    assert notifications.dispatch() == {}
+
+
+def test_repeated_cancellation_changes_nothing(
+    client, doctor, tomorrow, book, django_capture_on_commit_callbacks
+):
+    appointment = book(tomorrow)
+    version = get_version(doctor.pk)
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(f"/appointments/{appointment.pk}/cancel/")
+    assert get_version(doctor.pk) != version
+    version = get_version(doctor.pk)
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        client.post(f"/appointments/{appointment.pk}/cancel/")
+    assert callbacks == []
+    assert get_version(doctor.pk) == version
+    assert Notification.objects.filter(kind=Notification.CANCELLED).count() == 1
+    day = DoctorDayStats.objects.get(doctor=doctor, date=tomorrow)
+    assert (day.scheduled, day.cancelled) == (0, 1)
+
+
+def test_reminders_are_queued_once(tomorrow, book, mailoutbox):
+    book(tomorrow, time(9, 30))
+    assert notifications.enqueue_reminders() == 1
+    assert notifications.enqueue_reminders() == 0
+    assert notifications.dispatch() == {Notification.SENT: 1}
+    assert "09:30" in mailoutbox[0].body
@@ -0,0 +1,69 @@
+from datetime import date
+
+import pytest
+from django.http import QueryDict
+
+from .models import Appointment, Doctor
+from .pagination import KeysetPaginator, encode_cursor
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def doctors():
+    return [
+        Doctor.objects.create(name=f"Врач {index}", specialization="Терапевт", office=str(index))
+        for index in range(7)
+    ]
+
+
+def get_page(queryset, ordering, query=""):
+    return KeysetPaginator(queryset, 2, ordering).get_page(QueryDict(query))
+
+
+def slugs(page):
+    return [doctor.slug for doctor in page]
+
+
+def test_pages_follow_cursors(doctors):
+    ordered = sorted(doctor.slug for doctor in doctors)
+    page = get_page(Doctor.objects.all(), ("slug",))
+    seen = []
+    while True:
+        seen += slugs(page)
+        if not page.has_next():
+            break
+        page = get_page(Doctor.objects.all(), ("slug",), page.next_page_query)
+    assert seen == ordered
+    assert page.number == 4
+    assert [number for number, _ in page.page_links] == [2, 3, 4]
+
+    previous = get_page(Doctor.objects.all(), ("slug",), page.previous_page_query)
+    assert slugs(previous) == ordered[4:6]
+    assert previous.number == 3
+
+
+def test_descending_ordering(book):
+    for day in (1, 2, 3):
+        book(date(2024, 1, day))
+    ordering = ("-date", "-time", "-id")
+    page = get_page(Appointment.objects.all(), ordering)
+    page = get_page(Appointment.objects.all(), ordering, page.next_page_query)
+    assert [appointment.date.day for appointment in page] == [1]
+    assert page.has_previous() and not page.has_next()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!",
+    encode_cursor({"slug": "x"}),
+    encode_cursor([["x"]]),
+    encode_cursor(["x", "y", 1]),
+    encode_cursor([None, "09:00", 1]),
+    encode_cursor([5, "09:00", 1]),
+])
+def test_invalid_cursor_falls_back_to_first_page(cursor):
+    queryset = Appointment.objects.all()
+    page = get_page(queryset, ("date", "time", "id"), f"after={cursor}&page=5")
+    assert page.number == 1
+    assert not page.has_previous()
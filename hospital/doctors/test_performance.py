@@ -0,0 +1,171 @@
+"""
+Замеры производительности страниц врачей и записей на приём.
+
+Каждая страница запрашивается на заранее заполненной базе: сначала с
+пустым кэшем, затем повторно. Для обоих запросов считается число
+SQL-запросов ко всем базам (основной и репликам); оно должно точно
+совпадать с ``performance_budgets.json``. Для серии запросов с пустым
+кэшем считаются перцентили времени ответа; бюджет времени зависит
+от машины и проверяется только с ``--perf-latency``.
+
+Результаты можно сохранить для сравнения запусков::
+
+    python -m pytest doctors/test_performance.py --perf-latency --perf-results=perf.json
+"""
+import json
+import os
+import statistics
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Appointment, Doctor
+from .pagination import encode_cursor
+
+
+BUDGETS = json.loads(
+    Path(__file__).with_name("performance_budgets.json").read_text(encoding="utf-8")
+)
+ITERATIONS = int(os.environ.get("PERF_ITERATIONS", 20))
+SEED = 2024
+
+
+@pytest.fixture(scope="module")
+def dataset(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        call_command(
+            "generate_data", doctors=60, users=300, appointments=20000,
+            past_days=120, future_days=30, unpublished_share=0, seed=SEED,
+            stdout=StringIO(),
+        )
+        today = timezone.localdate()
+        appointment = (
+            Appointment.objects.filter(status="scheduled", date__gte=today, is_published=True)
+            .order_by("date", "time", "pk")
+            .first()
+        )
+        doctors = Doctor.objects.order_by("slug").values_list("slug", flat=True)
+        yield {
+            "appointment": appointment,
+            "patient": appointment.patient,
+            "doctor": appointment.doctor,
+            "deep_cursor": encode_cursor([doctors[len(doctors) // 2]]),
+            "date": today + timedelta(days=7),
+        }
+        call_command("flush", interactive=False, verbosity=0)
+
+
+def _index(client, data):
+    return client.get(reverse("doctors:index"))
+
+
+def _index_deep(client, data):
+    return client.get(reverse("doctors:index"), {"after": data["deep_cursor"], "page": 7})
+
+
+def _detail(client, data):
+    return client.get(reverse("doctors:detail", args=[data["doctor"].slug]))
+
+
+def _create_appointment(client, data):
+    return client.get(reverse("doctors:create_appointment", args=[data["doctor"].slug]))
+
+
+def _free_slots(client, data):
+    return client.post(
+        reverse("doctors:create_appointment", args=[data["doctor"].slug]),
+        {"date": data["date"].isoformat()},
+        HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+    )
+
+
+def _availability(client, data):
+    return client.get(reverse("doctors:availability", args=[data["doctor"].slug]))
+
+
+def _cancel_appointment(client, data):
+    return client.get(reverse("doctors:cancel_appointment", args=[data["appointment"].pk]))
+
+
+def _profile(client, data):
+    return client.get(reverse("doctors:profile", args=[data["patient"].pk]))
+
+
+CASES = {
+    "index": (_index, False),
+    "index_deep_page": (_index_deep, False),
+    "detail": (_detail, False),
+    "create_appointment": (_create_appointment, True),
+    "free_slots": (_free_slots, True),
+    "availability": (_availability, True),
+    "cancel_appointment": (_cancel_appointment, True),
+    "profile": (_profile, True),
+}
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def count_queries(request_func):
+    """Число запросов к каждой базе, в которую ходил ``request_func``."""
+    with ExitStack() as stack:
+        contexts = {
+            alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        }
+        response = request_func()
+    assert response.status_code == 200, response.status_code
+    return {
+        alias: len(context.captured_queries)
+        for alias, context in contexts.items() if context.captured_queries
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", list(CASES))
+def test_view_budget(name, dataset, client, pytestconfig):
+    request_func, login = CASES[name]
+    if login:
+        client.force_login(dataset["patient"])
+    call = lambda: request_func(client, dataset)  # noqa: E731
+
+    cache.clear()
+    cold_queries = count_queries(call)
+    warm_queries = count_queries(call)
+
+    timings = []
+    for _ in range(ITERATIONS):
+        cache.clear()
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+
+    result = {
+        "view": name,
+        "iterations": ITERATIONS,
+        "queries_cold": sum(cold_queries.values()),
+        "queries_warm": sum(warm_queries.values()),
+        "queries_by_alias": {"cold": cold_queries, "warm": warm_queries},
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "max_ms": round(max(timings), 2),
+    }
+    pytestconfig.perf_results.append(result)
+
+    budget = BUDGETS[name]
+    assert result["queries_cold"] == budget["queries_cold"], result
+    assert result["queries_warm"] == budget["queries_warm"], result
+    if pytestconfig.getoption("--perf-latency"):
+        assert result["p95_ms"] <= budget["p95_ms"], result
@@ -0,0 +1,92 @@
+import pytest
+from django.contrib.auth.models import User
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+
+from hospital.database import (
+    PIN_COOKIE, PrimaryPinMiddleware, PrimaryReplicaRouter, replica_reads
+)
+
+from .models import Appointment, Doctor
+
+
+pytestmark = pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+
+
+@pytest.fixture(autouse=True)
+def timetable(schedule, tomorrow):
+    schedule(tomorrow)
+
+
+def test_catalogue_is_read_from_replica(client, doctor, replica):
+    doctor_url = reverse("doctors:detail", args=[doctor.slug])
+    Doctor.objects.create(name="Новиков Олег", specialization="Уролог", office="304")
+    assert "Новиков" not in client.get(reverse("doctors:index")).content.decode()
+
+    replica.sync()
+    assert "Новиков" in client.get(reverse("doctors:index")).content.decode()
+    assert client.get(doctor_url).status_code == 200
+
+
+def test_booking_pins_reads_to_primary(client, doctor, patient, tomorrow, replica):
+    replica.sync()
+    client.force_login(patient)
+
+    response = client.post(
+        reverse("doctors:create_appointment", args=[doctor.slug]),
+        {"date": tomorrow.isoformat(), "time": "09:00"},
+    )
+    assert response.status_code == 302
+    assert PIN_COOKIE in response.cookies
+    assert Appointment.objects.using("replica").count() == 0
+
+    # Реплика ещё не знает о записи, но пациент читает основную базу.
+    url = reverse("doctors:availability", args=[doctor.slug])
+    assert client.get(url).json()["days"][tomorrow.isoformat()] == ["09:30"]
+
+    # Остальные видят отстающую реплику, но её данные не попадают в кэш.
+    del client.cookies[PIN_COOKIE]
+    assert client.get(url).json()["days"][tomorrow.isoformat()] == ["09:00", "09:30"]
+    replica.sync()
+    assert client.get(url).json()["days"][tomorrow.isoformat()] == ["09:30"]
+
+
+def test_replica_fragments_are_not_cached(client, doctor, replica):
+    url = reverse("doctors:detail", args=[doctor.slug])
+    replica.sync()
+    doctor.specialization = "Кардиолог"
+    doctor.save()
+
+    assert "Специализация: Невролог" in client.get(url).content.decode()
+    replica.sync()
+    assert "Специализация: Кардиолог" in client.get(url).content.decode()
+
+
+def test_one_replica_per_request(settings):
+    settings.DATABASE_REPLICAS = [f"replica{number}" for number in range(10)]
+    router = PrimaryReplicaRouter()
+
+    @replica_reads
+    def view(request):
+        aliases = {router.db_for_read(Doctor) for _ in range(20)}
+        return HttpResponse(",".join(aliases))
+
+    middleware = PrimaryPinMiddleware(view)
+    for _ in range(5):
+        aliases = middleware(RequestFactory().get("/")).content.decode().split(",")
+        assert len(aliases) == 1
+
+
+def test_export_streams_from_replica(client, doctor, tomorrow, book, replica):
+    staff = User.objects.create_user("staff", password="password", is_staff=True)
+    book(tomorrow, patient=staff)
+    client.force_login(staff)
+
+    # Поток читается после выхода из view, но всё равно с реплики.
+    response = client.get(reverse("doctors:export_appointments"))
+    assert b"".join(response.streaming_content).decode().count("\n") == 1
+
+    replica.sync()
+    response = client.get(reverse("doctors:export_appointments"), {"format": "jsonl"})
+    assert doctor.slug in b"".join(response.streaming_content).decode()
@@ -0,0 +1,83 @@
+from datetime import time
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from .models import Doctor, Schedule
+from .roster import RosterError, import_doctors, import_schedules, read_records
+
+
+pytestmark = pytest.mark.django_db
+
+
+def numbered(*records):
+    return list(enumerate(records, start=1))
+
+
+def test_slug_created_earlier_in_chunk_is_updated():
+    result = import_doctors(numbered(
+        {"name": "Иванов Иван", "specialization": "Терапевт", "office": "1"},
+        {"name": "Петров Пётр", "slug": "ivanov-ivan", "specialization": "Хирург", "office": "2"},
+    ))
+    assert result.errors == []
+    doctor = Doctor.objects.get()
+    assert (doctor.slug, doctor.name, doctor.office) == ("ivanov-ivan", "Петров Пётр", "2")
+
+
+def test_repeated_slug_update_keeps_last_record():
+    Doctor.objects.create(name="Иванов Иван", specialization="Терапевт", office="1")
+    import_doctors(numbered(
+        {"name": "Иванов И.", "slug": "ivanov-ivan", "office": "1"},
+        {"name": "Иванов Иван Иванович", "slug": "ivanov-ivan", "office": "1"},
+    ))
+    assert Doctor.objects.get().name == "Иванов Иван Иванович"
+
+
+@pytest.mark.parametrize("slug", ["Ivanov", "иванов", "ivanov ivan", "x" * 101])
+def test_invalid_slug_is_rejected(slug):
+    result = import_doctors(numbered({"name": "Иванов Иван", "slug": slug}))
+    assert [line for line, _ in result.errors] == [1]
+    assert not Doctor.objects.exists()
+
+
+@pytest.mark.parametrize("content, message", [
+    ('{"name": "Иванов Иван"}\n\n{"name": \n', "Строка 3: неверный JSON"),
+    ('{"name": "Иванов Иван"}\n["Петров"]\n', "Строка 2: ожидается объект JSON"),
+])
+def test_malformed_jsonl_stops_with_line_number(tmp_path, content, message):
+    path = tmp_path / "doctors.jsonl"
+    path.write_text(content, encoding="utf-8")
+    with pytest.raises(CommandError, match=message):
+        call_command("import_roster", str(path), kind="doctors", stdout=StringIO())
+    with pytest.raises(RosterError):
+        list(read_records(StringIO(content), "jsonl"))
+
+
+def test_schedule_overlaps_are_rejected():
+    first = Doctor.objects.create(name="Иванов Иван", specialization="Терапевт", office="1")
+    second = Doctor.objects.create(name="Петров Пётр", specialization="Хирург", office="1")
+    Schedule.objects.create(doctor=first, day_of_week=1, start_time=time(9), end_time=time(12))
+    result = import_schedules(numbered(
+        {"doctor": first.slug, "day_of_week": 1, "start_time": "11:00", "end_time": "13:00"},
+        {"doctor": second.slug, "day_of_week": 1, "start_time": "10:00", "end_time": "11:00"},
+        {"doctor": second.slug, "day_of_week": 1, "start_time": "12:00", "end_time": "14:00"},
+        {"doctor": second.slug, "day_of_week": 1, "start_time": "13:00", "end_time": "15:00"},
+    ))
+    assert result.errors == [
+        (1, "Пересекается с расписанием врача"),
+        (2, "Кабинет 1 в это время занят"),
+        (4, "Пересекается с расписанием врача"),
+    ]
+    assert result.created == 1
+
+
+def test_export_writes_to_command_stdout():
+    Doctor.objects.create(name="Иванов Иван", specialization="Терапевт", office="1")
+    out = StringIO()
+    call_command("export_roster", kind="doctors", format="jsonl", stdout=out)
+    assert list(read_records(StringIO(out.getvalue()), "jsonl")) == [(1, {
+        "slug": "ivanov-ivan", "name": "Иванов Иван", "specialization": "Терапевт",
+        "office": "1", "is_published": True,
+    })]
+    assert out.getvalue().count("\n") == 1
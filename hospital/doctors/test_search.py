@@ -0,0 +1,51 @@
+import pytest
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from .models import Doctor
+from .search import search_doctors
+
+
+pytestmark = pytest.mark.django_db
+
+
+def create(name, specialization="Терапевт", **fields):
+    return Doctor.objects.create(
+        name=name, specialization=specialization, office=fields.pop("office", "1"), **fields
+    )
+
+
+def test_cyrillic_and_latin_queries_match():
+    doctor = create("Иванов Иван", "Кардиолог")
+    create("Петров Пётр", "Хирург")
+    for query in ("иван", "Ivan", "кардио iv"):
+        assert list(search_doctors(Doctor.objects.all(), query)) == [doctor]
+    assert list(search_doctors(Doctor.objects.all(), "!!!")) == []
+
+
+def test_name_ranks_above_specialization():
+    by_specialization = create("Петров Пётр", "Иванов-терапевт")
+    by_name = create("Иванов Иван")
+    assert list(search_doctors(Doctor.objects.all(), "иванов")) == [by_name, by_specialization]
+
+
+def test_filters_apply_before_limit():
+    for index in range(5):
+        create(f"Иванов Иван {index}", is_published=False, slug=f"hidden-{index}")
+    published = create("Петрова Анна", "Иванов-терапевт")
+    results = search_doctors(Doctor.objects.filter(is_published=True), "иванов", limit=3)
+    assert list(results) == [published]
+
+
+def test_admin_results_are_ordered_by_rank(client):
+    by_specialization = create("Аникин Антон", "Иванов-терапевт", slug="a")
+    by_name = create("Иванов Иван", slug="b")
+    client.force_login(User.objects.create_superuser("admin", password="password"))
+    url = reverse("admin:doctors_doctor_changelist")
+
+    response = client.get(url, {"q": "иванов"})
+    assert list(response.context["cl"].result_list) == [by_name, by_specialization]
+    # Явно выбранная сортировка по столбцу важнее релевантности.
+    response = client.get(url, {"q": "иванов", "o": "3"})
+    assert list(response.context["cl"].result_list) == [by_specialization, by_name]
+    assert client.get(url, {"q": "!!!"}).status_code == 200
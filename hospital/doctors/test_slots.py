@@ -0,0 +1,43 @@
+from datetime import date, time
+
+from .slots import SLOT_TIMES, WeeklySlotGrid, iter_minutes, times_mask
+
+
+MONDAY = date(2024, 1, 1)
+
+
+def test_times_mask_sets_one_bit_per_minute():
+    mask = times_mask([time(0, 0), time(9, 30), time(9, 30), time(23, 59)])
+    assert list(iter_minutes(mask)) == [0, 570, 1439]
+    assert times_mask([]) == 0
+
+
+def test_slot_boundaries():
+    grid = WeeklySlotGrid([(1, time(9, 0), time(10, 0)), (1, time(10, 45), time(11, 30))])
+    # Окончание приёма не входит в расписание, неполный слот остаётся.
+    assert grid.free_labels(MONDAY) == ["09:00", "09:30", "10:45", "11:15"]
+    assert WeeklySlotGrid([(1, time(9, 0), time(9, 0))]).free_labels(MONDAY) == []
+
+
+def test_overlapping_schedules_are_merged():
+    grid = WeeklySlotGrid([
+        (1, time(9, 0), time(10, 30)),
+        (1, time(10, 0), time(11, 0)),
+        (1, time(9, 0), time(9, 30)),
+    ])
+    assert grid.free_labels(MONDAY) == ["09:00", "09:30", "10:00", "10:30"]
+
+
+def test_other_days_are_empty():
+    grid = WeeklySlotGrid([(2, time(9, 0), time(10, 0))])
+    assert grid.day_mask(1) == 0
+    assert grid.free_labels(MONDAY) == []
+    assert grid.free_labels(date(2024, 1, 2)) == ["09:00", "09:30"]
+
+
+def test_occupied_times_are_excluded():
+    grid = WeeklySlotGrid([(1, time(9, 0), time(11, 0))])
+    occupied = [time(9, 30), time(10, 30), time(12, 0), time(9, 15)]
+    assert grid.free_labels(MONDAY, occupied) == ["09:00", "10:00"]
+    assert grid.free_times(MONDAY, occupied) == [time(9, 0), time(10, 0)]
+    assert grid.free_times(MONDAY, occupied)[0] is SLOT_TIMES[540]
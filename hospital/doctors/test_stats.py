@@ -0,0 +1,122 @@
+from datetime import time, timedelta
+
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.utils import timezone
+
+from . import stats
+from .models import Appointment, DoctorDayStats, Schedule
+
+
+def counters():
+    return sorted(
+        row for row in DoctorDayStats.objects.values_list(
+            "doctor_id", "date", "scheduled", "completed", "cancelled"
+        )
+        if any(row[2:])
+    )
+
+
+@pytest.mark.django_db
+def test_counters_follow_changes(doctor, tomorrow, book):
+    first = book(tomorrow)
+    second = book(tomorrow, time(9, 30))
+    first.status = "cancelled"
+    first.save()
+    moved = Appointment.objects.only("pk").get(pk=second.pk)
+    moved.date += timedelta(days=1)
+    moved.save()
+    queryset = Appointment.objects.filter(pk=second.pk)
+    stats.record_status_change(queryset, "completed")
+    queryset.update(status="completed")
+    assert counters() == [(doctor.pk, tomorrow, 0, 0, 1), (doctor.pk, moved.date, 0, 1, 0)]
+
+    first.delete()
+    expected = counters()
+    stats.rebuild_day_stats()
+    assert counters() == expected
+
+
+@pytest.mark.django_db
+def test_stale_instances_are_counted_once(doctor, tomorrow, book):
+    appointment = book(tomorrow)
+    # Две отмены одной записи, загруженной до изменений (как в двух запросах).
+    copies = [Appointment.objects.get(pk=appointment.pk) for _ in range(2)]
+    for copy in copies:
+        copy.status = "cancelled"
+        copy.save()
+    assert counters() == [(doctor.pk, tomorrow, 0, 0, 1)]
+
+    appointment.delete()
+    copies[0].delete()
+    assert counters() == []
+
+
+@pytest.mark.django_db
+def test_doctor_with_appointments_can_be_deleted(doctor, tomorrow, book):
+    for slot in (time(9, 0), time(9, 30)):
+        book(tomorrow, slot)
+    doctor.delete()
+    # Счётчик с минусом ссылался бы на удалённого врача.
+    connection.check_constraints()
+    assert not DoctorDayStats.objects.exists()
+
+    # Вычитание из отсутствующего счётчика не создаёт строку.
+    DoctorDayStats.objects.apply({(doctor.pk, tomorrow, "scheduled"): -1})
+    assert not DoctorDayStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_past_days_use_capacity_snapshots(doctor):
+    today = timezone.localdate()
+    past, future = today - timedelta(days=7), today + timedelta(days=7)
+    schedule = Schedule.objects.create(
+        doctor=doctor, day_of_week=past.isoweekday(), start_time=time(9, 0), end_time=time(10, 0),
+    )
+    assert stats.snapshot_capacity(past) == 1
+    schedule.end_time = time(11, 0)
+    schedule.save()
+    stats.rebuild_day_stats()
+
+    days = stats.daily_capacity([doctor.pk], past, future)[doctor.pk]
+    # Все три даты приходятся на один день недели.
+    assert (days[past], days[today], days[future]) == (2, 4, 4)
+    assert stats.capacity([doctor.pk], past, future) == {doctor.pk: 10}
+
+
+@pytest.fixture
+def migrate():
+    """Переводит схему на ``targets`` и возвращает исторические модели."""
+
+    def run(targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    yield run
+    run(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_counts_existing_appointments(migrate):
+    apps = migrate([("doctors", "0011_appointment_archive")])
+    doctor = apps.get_model("doctors", "Doctor").objects.create(
+        name="Сидоров Сидор", slug="sidorov-sidor", specialization="Терапевт", office="303"
+    )
+    patient = apps.get_model("auth", "User").objects.create(username="patient")
+    day = timezone.localdate()
+    for slot, status in ((time(9, 0), "scheduled"), (time(9, 30), "cancelled")):
+        apps.get_model("doctors", "Appointment").objects.create(
+            doctor=doctor, patient=patient, date=day, time=slot, status=status
+        )
+    apps.get_model("doctors", "AppointmentArchive").objects.create(
+        id=100, doctor=doctor, patient=patient, date=day, time=time(10, 0), status="completed",
+    )
+
+    apps = migrate([("doctors", "0012_doctor_day_stats")])
+    day_stats = apps.get_model("doctors", "DoctorDayStats").objects
+    assert list(day_stats.values_list("date", "scheduled", "completed", "cancelled")) == [
+        (day, 1, 1, 1)
+    ]
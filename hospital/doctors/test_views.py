@@ -0,0 +1,117 @@
+import threading
+from datetime import time, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import Client
+from django.utils import timezone
+
+from .models import Appointment
+
+
+PATIENTS_COUNT = 12
+
+
+def post_booking(client, doctor, day, **data):
+    return client.post(
+        f"/doctors/{doctor.slug}/appointment/", {"date": day.isoformat(), **data}
+    )
+
+
+def book_when_released(client, doctor, day, barrier, statuses):
+    barrier.wait(timeout=30)
+    # Без предела зависший поток не дал бы тесту завершиться.
+    deadline = timezone.now() + timedelta(seconds=30)
+    try:
+        while timezone.now() < deadline:
+            try:
+                response = post_booking(client, doctor, day, time="09:00")
+            except OperationalError:
+                # Общая in-memory база SQLite не ждёт снятия блокировки
+                # таблицы, а сразу возвращает ошибку: повторяем запрос.
+                continue
+            statuses.append(response.status_code)
+            return
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_only_one_concurrent_booking_wins(doctor, schedule, tomorrow):
+    schedule(tomorrow, end=time(12, 0))
+    clients = []
+    for number in range(PATIENTS_COUNT):
+        client = Client()
+        client.force_login(User.objects.create_user(f"patient{number}", password="password"))
+        clients.append(client)
+
+    barrier = threading.Barrier(PATIENTS_COUNT)
+    statuses = []
+    threads = [
+        threading.Thread(
+            target=book_when_released, args=(client, doctor, tomorrow, barrier, statuses)
+        )
+        for client in clients
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(statuses) == PATIENTS_COUNT
+    assert statuses.count(302) <= 1
+    assert set(statuses) <= {200, 302}
+    assert Appointment.objects.filter(doctor=doctor, date=tomorrow, time=time(9, 0)).count() == 1
+
+
+@pytest.mark.django_db
+def test_taken_time_returns_form_error(client, doctor, schedule, tomorrow, book):
+    schedule(tomorrow, end=time(12, 0))
+    book(tomorrow)
+    client.force_login(User.objects.create_user("other", password="password"))
+    response = post_booking(client, doctor, tomorrow, time="09:00")
+    assert response.status_code == 200
+    assert "уже занято" in str(response.context["form"].non_field_errors())
+
+
+@pytest.mark.django_db
+def test_unpublished_appointment_does_not_occupy_slot(
+    client, doctor, patient, schedule, tomorrow, book
+):
+    schedule(tomorrow)
+    book(tomorrow, is_published=False)
+    book(tomorrow, time(9, 30))
+    client.force_login(patient)
+    response = client.get(
+        f"/doctors/{doctor.slug}/availability/", {"from": tomorrow.isoformat(), "days": 1}
+    )
+    assert response.json()["days"] == {tomorrow.isoformat(): ["09:00"]}
+
+
+@pytest.mark.django_db
+def test_availability_range_past_last_date_is_rejected(client, doctor, patient):
+    client.force_login(patient)
+    url = f"/doctors/{doctor.slug}/availability/"
+    assert client.get(url, {"from": "9999-12-30", "days": 5}).status_code == 400
+    assert client.get(url, {"from": "9999-12-30", "days": 2}).status_code == 200
+
+
+@pytest.mark.django_db
+def test_free_slot_requests_over_limit_are_rejected(client, settings, doctor, patient):
+    settings.THROTTLES = {"booking": {"user": "2/m", "ip": "100/m"}}
+    client.force_login(patient)
+
+    def post_date():
+        return client.post(
+            f"/doctors/{doctor.slug}/appointment/",
+            {"date": timezone.localdate().isoformat()},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+    assert [post_date().status_code for _ in range(2)] == [200, 200]
+    response = post_date()
+    assert response.status_code == 429
+    assert response["Retry-After"] == "30"
+    # Страница записи (GET) лимитом не ограничена.
+    assert client.get(f"/doctors/{doctor.slug}/appointment/").status_code == 200
@@ -0,0 +1,166 @@
+import threading
+from datetime import time, timedelta
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import Client
+from django.utils import timezone
+
+from . import notifications, waitlist
+from .models import Appointment, FreedSlot, Notification, WaitlistEntry
+
+
+@pytest.fixture
+def queue(doctor, schedule, tomorrow, book):
+    """Занятое время ``09:00`` и двое пациентов в листе ожидания."""
+    schedule(tomorrow, end=time(9, 30))
+    appointment = book(tomorrow)
+    first, second = (
+        User.objects.create_user(name, f"{name}@example.com", "password")
+        for name in ("first", "second")
+    )
+    for patient in (first, second):
+        waitlist.join(doctor, patient, timezone.localdate(), tomorrow)
+    return appointment, first
+
+
+@pytest.fixture
+def cancel(client, patient, queue):
+    def post():
+        client.force_login(patient)
+        client.post(f"/appointments/{queue[0].pk}/cancel/")
+
+    return post
+
+
+def statuses():
+    return list(WaitlistEntry.objects.order_by("pk").values_list("status", flat=True))
+
+
+@pytest.mark.django_db
+def test_offer_is_confirmed_by_patient(client, doctor, queue, cancel, mailoutbox):
+    first = queue[1]
+    cancel()
+    assert FreedSlot.objects.count() == 1
+    assert waitlist.process() == (1, 1)
+    assert not FreedSlot.objects.exists()
+    assert not Appointment.objects.filter(status="scheduled").exists()
+    assert statuses() == [WaitlistEntry.OFFERED, WaitlistEntry.WAITING]
+    assert notifications.dispatch() == {Notification.SENT: 2}
+    assert mailoutbox[-1].to == [first.email]
+    assert "09:00" in mailoutbox[-1].body
+
+    client.force_login(first)
+    response = client.get(f"/doctors/{doctor.slug}/appointment/")
+    assert response.status_code == 200
+    assert "waitlist/confirm/" in response.content.decode()
+    client.post(f"/doctors/{doctor.slug}/waitlist/confirm/")
+    booked = Appointment.objects.get(status="scheduled")
+    assert (booked.patient, booked.time) == (first, time(9, 0))
+    assert statuses() == [WaitlistEntry.BOOKED, WaitlistEntry.WAITING]
+    # Повторное подтверждение ничего не меняет.
+    assert waitlist.confirm(WaitlistEntry.objects.filter(patient=first)) is None
+
+
+@pytest.mark.django_db
+def test_slot_is_offered_to_one_patient(doctor, tomorrow, cancel):
+    cancel()
+    FreedSlot.objects.create(doctor=doctor, date=tomorrow, time=time(9, 0))
+    assert waitlist.process() == (2, 1)
+    assert statuses() == [WaitlistEntry.OFFERED, WaitlistEntry.WAITING]
+
+
+@pytest.mark.django_db
+def test_slot_taken_before_confirmation_keeps_patient_waiting(tomorrow, book, queue, cancel):
+    cancel()
+    waitlist.process()
+    book(tomorrow)
+    assert waitlist.confirm(WaitlistEntry.objects.filter(patient=queue[1])) is None
+    assert statuses() == [WaitlistEntry.WAITING, WaitlistEntry.WAITING]
+    assert Appointment.objects.filter(status="scheduled").count() == 1
+
+
+@pytest.mark.django_db
+def test_expired_offer_goes_to_next_in_queue(queue, cancel):
+    cancel()
+    waitlist.process()
+    WaitlistEntry.objects.filter(patient=queue[1]).update(
+        offer_expires_at=timezone.now() - timedelta(minutes=1)
+    )
+    assert waitlist.confirm(WaitlistEntry.objects.filter(patient=queue[1])) is None
+    assert waitlist.expire_entries() == 1
+    assert waitlist.process() == (1, 1)
+    assert statuses() == [WaitlistEntry.EXPIRED, WaitlistEntry.OFFERED]
+
+
+@pytest.mark.django_db
+def test_declined_offer_goes_to_next_in_queue(client, doctor, queue, cancel):
+    cancel()
+    waitlist.process()
+    client.force_login(queue[1])
+    client.post(f"/doctors/{doctor.slug}/waitlist/leave/")
+    assert waitlist.process() == (1, 1)
+    assert statuses() == [WaitlistEntry.LEFT, WaitlistEntry.OFFERED]
+
+
+@pytest.mark.django_db
+def test_failed_processing_keeps_slot_queued(cancel, monkeypatch):
+    def enqueue_offer(entry):
+        raise RuntimeError
+
+    cancel()
+    with monkeypatch.context() as patch:
+        patch.setattr(notifications, "enqueue_offer", enqueue_offer)
+        with pytest.raises(RuntimeError):
+            waitlist.process()
+    assert FreedSlot.objects.count() == 1
+    assert statuses() == [WaitlistEntry.WAITING, WaitlistEntry.WAITING]
+    assert waitlist.process() == (1, 1)
+
+
+def retry_when_released(barrier, action):
+    barrier.wait(timeout=30)
+    deadline = timezone.now() + timedelta(seconds=30)
+    try:
+        while timezone.now() < deadline:
+            try:
+                return action()
+            except OperationalError:
+                # Общая in-memory база SQLite сразу сообщает о блокировке.
+                continue
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cancel_while_processing(doctor, patient, schedule, tomorrow, book):
+    """Отмена во время разбора очереди не теряет время и не дублирует предложения."""
+    schedule(tomorrow)
+    appointments = [book(tomorrow, slot) for slot in (time(9, 0), time(9, 30))]
+    for name in ("first", "second", "third"):
+        waitlist.join(doctor, User.objects.create_user(name), timezone.localdate(), tomorrow)
+    waitlist.release_slot(appointments[0])
+    appointments[0].status = "cancelled"
+    appointments[0].save()
+    client = Client()
+    client.force_login(patient)
+    barrier = threading.Barrier(2)
+    actions = (
+        lambda: client.post(f"/appointments/{appointments[1].pk}/cancel/"),
+        waitlist.process,
+    )
+    threads = [
+        threading.Thread(target=retry_when_released, args=(barrier, action))
+        for action in actions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    waitlist.process()
+    assert not FreedSlot.objects.exists()
+    offers = WaitlistEntry.objects.filter(status=WaitlistEntry.OFFERED)
+    assert sorted(offers.values_list("offer_time", flat=True)) == [time(9, 0), time(9, 30)]
+    assert Notification.objects.filter(kind=Notification.WAITLIST).count() == 2
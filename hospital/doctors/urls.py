@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
@@ -5,6 +6,14 @@ from . import views
 
 app_name = "doctors"
 
+# Под ASGI свободное время и запись обслуживаются асинхронными view.
+if getattr(settings, "ASYNC_BOOKING_VIEWS", False):
+    create_appointment_view = views.create_appointment_async
+    availability_view = views.availability_async
+else:
+    create_appointment_view = views.create_appointment
+    availability_view = views.availability
+
 
 urlpatterns = [
     path("", views.IndexView.as_view(), name="index"),
@@ -12,14 +21,28 @@ urlpatterns = [
     path("doctors/<slug:slug>/", views.DoctorDetailView.as_view(), name="detail"),
     path(
         "doctors/<slug:slug>/appointment/",
-        views.create_appointment,
+        create_appointment_view,
         name="create_appointment",
     ),
+    path(
+        "doctors/<slug:slug>/availability/",
+        availability_view,
+        name="availability",
+    ),
+    path("doctors/<slug:slug>/waitlist/", views.join_waitlist, name="join_waitlist"),
+    path("doctors/<slug:slug>/waitlist/leave/", views.leave_waitlist, name="leave_waitlist"),
+    path(
+        "doctors/<slug:slug>/waitlist/confirm/",
+        views.confirm_waitlist_offer,
+        name="confirm_waitlist_offer",
+    ),
     path(
         "appointments/<int:appointment_id>/cancel/",
         views.cancel_appointment,
         name="cancel_appointment",
     ),
     path("profile/<int:user_id>/", views.profile, name="profile"),
+    path("reports/utilization/", views.utilization_report, name="utilization_report"),
+    path("reports/appointments/export/", views.export_appointments, name="export_appointments"),
     path("edit-profile/", views.EditProfileView.as_view(), name="edit_profile"),
 ]
@@ -1,7 +1,8 @@
+from functools import wraps
+
 from django.db.models import QuerySet
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden
 from django.contrib import messages
-from django.shortcuts import get_object_or_404
 
 from .models import Appointment
 
@@ -13,26 +14,78 @@ def filter_published_objects(queryset):
     return queryset
 
 
-def user_is_owner_or_admin(model, field_name='patient'):
+class RequestObjects:
+    """
+    Объекты, загруженные во время обработки запроса.
+
+    Повторный запрос того же объекта (модель и первичный ключ) возвращает
+    уже загруженный экземпляр без обращения к базе.
+    """
+
+    def __init__(self):
+        self._objects = {}
+
+    @staticmethod
+    def _key(model, pk):
+        return model._meta.concrete_model._meta.label, str(pk)
+
+    def add(self, instance):
+        self._objects[self._key(type(instance), instance.pk)] = instance
+        return instance
+
+    def get(self, queryset, pk):
+        if not isinstance(queryset, QuerySet):
+            queryset = queryset._default_manager.all()
+        key = self._key(queryset.model, pk)
+        if key not in self._objects:
+            self._objects[key] = queryset.filter(pk=pk).first()
+        return self._objects[key]
+
+
+def request_objects(request):
+    """Карта объектов запроса; текущий пользователь в ней уже есть."""
+    objects = getattr(request, "_request_objects", None)
+    if objects is None:
+        objects = request._request_objects = RequestObjects()
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            objects.add(getattr(user, "_wrapped", user))
+    return objects
+
+
+def get_request_object_or_404(request, queryset, pk):
+    """Как ``get_object_or_404``, но объект загружается один раз за запрос."""
+    instance = request_objects(request).get(queryset, pk)
+    if instance is None:
+        raise Http404("Объект не найден.")
+    return instance
+
+
+def user_is_owner_or_admin(model, field_name='patient', select_related=()):
     """
     Декоратор для проверки, является ли текущий пользователь
     владельцем объекта или администратором.
+
+    Проверенный объект остаётся в карте объектов запроса, и view
+    получает его через ``get_request_object_or_404`` без второго запроса.
     """
     def decorator(view_func):
+        @wraps(view_func)
         def wrapper(request, *args, **kwargs):
             object_id = kwargs.get('appointment_id') or kwargs.get('user_id')
 
-            instance = get_object_or_404(model, pk=object_id)
+            queryset = model._default_manager.select_related(*select_related)
+            instance = get_request_object_or_404(request, queryset, object_id)
 
             if model == Appointment and not instance.is_published:
                 messages.error(request, "Запись на приём не найдена.")
                 return HttpResponseForbidden("Запись на приём не найдена.")
 
             if field_name == 'id':
-                owner_id = object_id
+                owner_id = instance.pk
             else:
-                owner = getattr(instance, field_name)
-                owner_id = owner.id
+                # Владелец сравнивается по внешнему ключу, без загрузки объекта.
+                owner_id = getattr(instance, model._meta.get_field(field_name).attname)
 
             if request.user.id != owner_id and not request.user.is_staff:
                 messages.error(request, "У вас нет прав для выполнения этого действия.")
@@ -1,22 +1,54 @@
+from datetime import date, timedelta
+
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
-from django.core.paginator import Paginator
-from django.http import JsonResponse, HttpResponseForbidden
+from django.db import router, transaction
+from django.db.models import Sum
+from django.http import (
+    Http404, JsonResponse, HttpResponseForbidden, HttpResponseNotAllowed, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET, require_POST
 from django.views.generic import ListView, DetailView, CreateView
 from django.views.generic.edit import FormView
 
-from .forms import AppointmentForm, UserEditForm
-from .models import Doctor, Appointment, Schedule
-from .utils import filter_published_objects, user_is_owner_or_admin
+from hospital.database import replica_reads
+from hospital.throttling import throttle, throttled_response_async
+
+from . import aio, export, notifications, stats, waitlist
+from .cache import attach_fragment_versions, bump_version_on_commit
+from .conditional import (
+    availability_etag, availability_state, conditional_page,
+    doctor_detail_state, doctor_list_state,
+)
+from .forms import (
+    AppointmentExportForm, AppointmentForm, ReportPeriodForm, UserEditForm, WaitlistForm,
+)
+from .models import (
+    Doctor, Appointment, AppointmentArchive, DoctorDayStats, Notification, WaitlistEntry,
+)
+from .pagination import KeysetPaginator
+from .search import search_doctors
+from .slots import get_cached_free_slots, get_cached_free_slots_range
+from .utils import (
+    filter_published_objects, get_request_object_or_404, user_is_owner_or_admin
+)
 
 
 PAGES = 5
+REPORT_PAGES = 50
+
+AVAILABILITY_DEFAULT_DAYS = 14
+AVAILABILITY_MAX_DAYS = 62
 
 
 class RegisterView(CreateView):
@@ -25,16 +57,43 @@ class RegisterView(CreateView):
     success_url = reverse_lazy("doctors:index")
 
 
+@method_decorator(replica_reads, name="dispatch")
+@method_decorator(conditional_page(doctor_list_state), name="dispatch")
 class IndexView(ListView):
     template_name = "doctors/index.html"
     model = Doctor
     paginate_by = PAGES
 
+    def get_search_query(self):
+        return self.request.GET.get("q", "").strip()
+
     def get_queryset(self):
-        queryset = super().get_queryset()
-        return filter_published_objects(queryset)
+        queryset = filter_published_objects(super().get_queryset())
+        query = self.get_search_query()
+        if query:
+            return search_doctors(queryset, query)
+        return queryset
+
+    def get_paginate_by(self, queryset):
+        # Результаты поиска ограничены и отсортированы по релевантности.
+        if self.get_search_query():
+            return None
+        return super().get_paginate_by(queryset)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["object_list"] = attach_fragment_versions(list(context["object_list"]))
+        context["search_query"] = self.get_search_query()
+        return context
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size, ("slug",))
+        page = paginator.get_page(self.request.GET)
+        return paginator, page, page.object_list, page.has_other_pages()
 
+
+@method_decorator(replica_reads, name="dispatch")
+@method_decorator(conditional_page(doctor_detail_state), name="dispatch")
 class DoctorDetailView(DetailView):
     model = Doctor
     template_name = "doctors/detail.html"
@@ -42,13 +101,15 @@ class DoctorDetailView(DetailView):
     context_object_name = "doctor"
 
     def get_object(self, queryset=None):
-        return get_object_or_404(
-            Doctor.objects.filter(is_published=True).prefetch_related("schedules"),
+        doctor = get_object_or_404(
+            Doctor.objects.filter(is_published=True),
             slug=self.kwargs[self.slug_url_kwarg],
         )
+        return attach_fragment_versions([doctor])[0]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        # Ленивый queryset: при попадании в кэш фрагмента запрос не выполняется.
         context["schedule"] = self.object.schedules.filter(
             doctor__is_published=True
         ).order_by("day_of_week", "start_time")
@@ -56,6 +117,7 @@ class DoctorDetailView(DetailView):
 
 
 @login_required
+@throttle("booking", methods=("POST",))
 def create_appointment(request, slug):
     doctor = get_object_or_404(
         filter_published_objects(Doctor.objects),
@@ -71,41 +133,12 @@ def create_appointment(request, slug):
                 except ValueError:
                     return JsonResponse({"errors": "Неверный формат даты"}, status=400)
 
-                available_times = []
-
-                day_of_week = selected_date.isoweekday()
-                schedule_entries = Schedule.objects.select_related('doctor').filter(
-                    doctor=doctor, day_of_week=day_of_week
-                )
-
-                occupied_times = set(
-                    Appointment.objects.select_related('doctor').filter(
-                        doctor=doctor,
-                        date=selected_date,
-                        status__in=["scheduled", "completed"],
-                    ).values_list("time", flat=True)
-                )
-
-                for entry in schedule_entries:
-                    current_time = entry.start_time
-                    while current_time < entry.end_time:
-                        if current_time not in occupied_times:
-                            available_times.append(current_time.strftime("%H:%M"))
-                        current_time = (
-                            timezone.datetime.combine(selected_date, current_time)
-                            + timezone.timedelta(minutes=30)
-                        ).time()
-
-                return JsonResponse({"times": available_times})
+                return JsonResponse({"times": get_cached_free_slots(doctor, selected_date)})
             else:
                 return JsonResponse({"errors": "Не указана дата"}, status=400)
 
         form = AppointmentForm(request.POST, doctor=doctor)
-        if form.is_valid():
-            appointment = form.save(commit=False)
-            appointment.doctor = doctor
-            appointment.patient = request.user
-            appointment.save()
+        if form.is_valid() and form.book(request.user):
             messages.success(request, "Вы успешно записались на приём!")
             return redirect("doctors:detail", slug=doctor.slug)
         else:
@@ -118,21 +151,188 @@ def create_appointment(request, slug):
     context = {
         "doctor": doctor,
         "form": form,
+        "waitlist_entry": WaitlistEntry.objects.filter(
+            doctor=doctor, patient=request.user, status__in=waitlist.ACTIVE
+        ).first(),
+        # Поля листа ожидания выводятся в шаблоне вручную, как и выбор времени:
+        # отрисовка виджетов формы заметно удлиняет ответ.
+        "waitlist_dates": (timezone.localdate(), timezone.localdate() + timedelta(days=13)),
     }
     return render(request, "doctors/create_appointment.html", context)
 
 
 @login_required
-@user_is_owner_or_admin(Appointment)
-def cancel_appointment(request, appointment_id):
-    appointment = get_object_or_404(
-        filter_published_objects(Appointment.objects.select_related('patient')),
-        id=appointment_id
+@require_POST
+def join_waitlist(request, slug):
+    """Встать в лист ожидания врача вместо того, чтобы следить за свободным временем."""
+    doctor = get_object_or_404(filter_published_objects(Doctor.objects), slug=slug)
+    form = WaitlistForm(request.POST)
+    if form.is_valid():
+        waitlist.join(
+            doctor, request.user, form.cleaned_data["date_from"], form.cleaned_data["date_to"]
+        )
+        messages.success(
+            request, "Вы в листе ожидания. Когда время освободится, мы пришлём письмо."
+        )
+    else:
+        messages.error(request, " ".join(form.non_field_errors()) or "Проверьте даты.")
+    return redirect("doctors:create_appointment", slug=doctor.slug)
+
+
+@login_required
+@require_POST
+def leave_waitlist(request, slug):
+    waitlist.leave(WaitlistEntry.objects.filter(doctor__slug=slug, patient=request.user))
+    messages.success(request, "Вы покинули лист ожидания.")
+    return redirect("doctors:create_appointment", slug=slug)
+
+
+@login_required
+@require_POST
+def confirm_waitlist_offer(request, slug):
+    """Записаться на время, предложенное из листа ожидания."""
+    appointment = waitlist.confirm(
+        WaitlistEntry.objects.filter(doctor__slug=slug, patient=request.user)
+    )
+    if appointment is None:
+        messages.error(request, "Предложение уже недействительно: срок истёк или время заняли.")
+        return redirect("doctors:create_appointment", slug=slug)
+    messages.success(request, "Вы успешно записались на приём!")
+    return redirect("doctors:detail", slug=slug)
+
+
+def parse_availability_range(request):
+    """Начальная дата и число дней из параметров ``from`` и ``days``."""
+    start = request.GET.get("from")
+    try:
+        start_date = (
+            timezone.datetime.strptime(start, "%Y-%m-%d").date()
+            if start else timezone.localdate()
+        )
+        days = int(request.GET.get("days", AVAILABILITY_DEFAULT_DAYS))
+    except ValueError:
+        raise ValueError("Неверный формат параметров")
+
+    if not 1 <= days <= AVAILABILITY_MAX_DAYS:
+        raise ValueError(f"Количество дней должно быть от 1 до {AVAILABILITY_MAX_DAYS}")
+    if (date.max - start_date).days < days - 1:
+        raise ValueError("Диапазон дат выходит за допустимые пределы")
+    return start_date, days
+
+
+@replica_reads
+@login_required
+@require_GET
+@throttle("availability")
+@conditional_page(availability_state)
+def availability(request, slug):
+    """Свободные слоты врача сразу на диапазон дат."""
+    doctor = get_object_or_404(
+        filter_published_objects(Doctor.objects),
+        slug=slug
     )
 
+    try:
+        start_date, days = parse_availability_range(request)
+    except ValueError as error:
+        return JsonResponse({"errors": str(error)}, status=400)
+
+    slots = get_cached_free_slots_range(doctor, start_date, days)
+    return JsonResponse({
+        "from": start_date.isoformat(),
+        "days": {day.isoformat(): times for day, times in slots.items()},
+    })
+
+
+async def create_appointment_async(request, slug):
+    """
+    Асинхронная версия ``create_appointment`` для ASGI.
+
+    Запрос свободного времени на дату обслуживается в цикле событий,
+    остальные запросы передаются синхронному view в пул потоков.
+    """
+    if request.method != "POST" or request.headers.get("x-requested-with") != "XMLHttpRequest":
+        return await aio.run_db(create_appointment, request, slug)
+
+    user, doctor_id = await aio.load_user_and_doctor(request, slug)
+    if not user.is_authenticated:
+        return aio.login_redirect(request)
+    # Лимит проверяется здесь, а не декоратором: остальные запросы
+    # считает синхронный create_appointment.
+    throttled = await throttled_response_async(request, "booking")
+    if throttled is not None:
+        return throttled
+    if doctor_id is None:
+        raise Http404("Врач не найден.")
+
+    date = request.POST.get("date")
+    if not date:
+        return JsonResponse({"errors": "Не указана дата"}, status=400)
+    try:
+        selected_date = timezone.datetime.strptime(date, "%Y-%m-%d").date()
+    except ValueError:
+        return JsonResponse({"errors": "Неверный формат даты"}, status=400)
+
+    slots = await aio.get_free_slots_range(doctor_id, selected_date, 1)
+    return JsonResponse({"times": slots[selected_date]})
+
+
+@replica_reads
+async def availability_async(request, slug):
+    """Асинхронная версия ``availability`` для ASGI."""
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+
+    user, doctor_id = await aio.load_user_and_doctor(request, slug)
+    if not user.is_authenticated:
+        return aio.login_redirect(request)
+    throttled = await throttled_response_async(request, "availability")
+    if throttled is not None:
+        return throttled
+    if doctor_id is None:
+        raise Http404("Врач не найден.")
+
+    etag = quote_etag(await aio.run_cache(availability_etag, request, doctor_id))
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        try:
+            start_date, days = parse_availability_range(request)
+        except ValueError as error:
+            response = JsonResponse({"errors": str(error)}, status=400)
+        else:
+            slots = await aio.get_free_slots_range(doctor_id, start_date, days)
+            response = JsonResponse({
+                "from": start_date.isoformat(),
+                "days": {day.isoformat(): times for day, times in slots.items()},
+            })
+        response.headers.setdefault("ETag", etag)
+    patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    return response
+
+
+@login_required
+@user_is_owner_or_admin(Appointment, select_related=("doctor",))
+def cancel_appointment(request, appointment_id):
+    appointment = get_request_object_or_404(request, Appointment, appointment_id)
+
     if request.method == "POST":
-        appointment.status = "cancelled"
-        appointment.save()
+        # Условный UPDATE: из двух одновременных отмен строку меняет одна,
+        # и только она ставит письмо и освободившееся время в очередь.
+        # ``update`` не вызывает ``save`` и сигналы — счётчики и версия
+        # кэша обновляются здесь же.
+        with transaction.atomic():
+            previous = appointment.locked_stats_key(router.db_for_write(Appointment))
+            cancelled = (
+                Appointment.objects.filter(pk=appointment.pk)
+                .exclude(status="cancelled")
+                .update(status="cancelled")
+            )
+            if cancelled:
+                current = previous and previous[:2] + ("cancelled",)
+                DoctorDayStats.objects.move(previous, current)
+                bump_version_on_commit(appointment.doctor_id)
+                notifications.enqueue(appointment, Notification.CANCELLED)
+                waitlist.release_slot(appointment)
         messages.success(request, "Ваша запись на приём успешно отменена.")
         return redirect("doctors:index")
 
@@ -143,25 +343,129 @@ def cancel_appointment(request, appointment_id):
 @login_required
 @user_is_owner_or_admin(User, field_name='id')
 def profile(request, user_id):
-    user = get_object_or_404(User, pk=user_id)
+    user = get_request_object_or_404(request, User, user_id)
+    archived = request.GET.get("archived") == "1"
 
-    appointments = filter_published_objects(
-        Appointment.objects.filter(patient=user, status="scheduled")
-        .prefetch_related("doctor", "patient")
-    ).order_by("date", "time")
+    if archived:
+        # История из архива: сначала самые поздние записи.
+        appointments = filter_published_objects(
+            AppointmentArchive.objects.filter(patient=user).select_related("doctor")
+        )
+        ordering = ("-date", "-time", "-id")
+    else:
+        appointments = filter_published_objects(
+            Appointment.objects.filter(patient=user, status="scheduled")
+            .select_related("doctor")
+        )
+        ordering = ("date", "time", "id")
 
-    paginator = Paginator(appointments, PAGES)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    paginator = KeysetPaginator(appointments, PAGES, ordering)
+    page_obj = paginator.get_page(request.GET)
 
     context = {
         "profile": user,
         "page_obj": page_obj,
         "appointments": page_obj.object_list,
+        "archived": archived,
     }
     return render(request, "doctors/profile.html", context)
 
 
+@staff_member_required
+def utilization_report(request):
+    """Загрузка врачей за период; читает только счётчики ``DoctorDayStats``."""
+    form = ReportPeriodForm(request.GET or None)
+    if form.is_bound and form.is_valid():
+        date_from, date_to = form.cleaned_data["date_from"], form.cleaned_data["date_to"]
+    else:
+        date_to = timezone.localdate()
+        date_from = date_to - timedelta(days=29)
+    period = (date_from, date_to)
+
+    slug = request.GET.get("doctor")
+    if slug:
+        doctor = get_object_or_404(Doctor, slug=slug)
+        counters = {
+            row.date: row
+            for row in DoctorDayStats.objects.filter(doctor=doctor, date__range=period)
+        }
+        slots = stats.daily_capacity([doctor.pk], date_from, date_to)[doctor.pk]
+        rows = []
+        day = date_from
+        while day <= date_to:
+            row = counters.get(day)
+            rows.append({
+                "date": day,
+                "scheduled": row.scheduled if row else 0,
+                "completed": row.completed if row else 0,
+                "cancelled": row.cancelled if row else 0,
+                "capacity": slots[day],
+            })
+            day += timedelta(days=1)
+        page_obj = None
+    else:
+        doctor = None
+        paginator = KeysetPaginator(
+            Doctor.objects.filter(is_published=True).only("slug", "name", "specialization"),
+            REPORT_PAGES, ("slug",),
+        )
+        page_obj = paginator.get_page(request.GET)
+        doctors = list(page_obj.object_list)
+        ids = [item.pk for item in doctors]
+        totals = {
+            row["doctor_id"]: row
+            for row in DoctorDayStats.objects.filter(doctor_id__in=ids, date__range=period)
+            .values("doctor_id")
+            .annotate(
+                scheduled=Sum("scheduled"), completed=Sum("completed"), cancelled=Sum("cancelled")
+            )
+        }
+        slots = stats.capacity(ids, date_from, date_to)
+        rows = [
+            {
+                "doctor": item,
+                "scheduled": totals.get(item.pk, {}).get("scheduled", 0),
+                "completed": totals.get(item.pk, {}).get("completed", 0),
+                "cancelled": totals.get(item.pk, {}).get("cancelled", 0),
+                "capacity": slots[item.pk],
+            }
+            for item in doctors
+        ]
+
+    for row in rows:
+        booked = row["scheduled"] + row["completed"]
+        row["utilization"] = round(100 * booked / row["capacity"]) if row["capacity"] else None
+
+    context = {
+        "form": form,
+        "doctor": doctor,
+        "rows": rows,
+        "page_obj": page_obj,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    return render(request, "doctors/utilization_report.html", context)
+
+
+@staff_member_required
+@replica_reads
+@require_GET
+def export_appointments(request):
+    """Потоковая выгрузка записей на приём в CSV или JSON Lines."""
+    form = AppointmentExportForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+    filters = dict(form.cleaned_data)
+    fmt = filters.pop("format")
+    queryset = export.export_queryset(**filters)
+    response = StreamingHttpResponse(
+        export.export_appointments(queryset, fmt), content_type=export.CONTENT_TYPES[fmt]
+    )
+    filename = f"appointments-{timezone.localdate():%Y%m%d}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 class EditProfileView(LoginRequiredMixin, FormView):
     template_name = "doctors/edit_profile.html"
     form_class = UserEditForm
@@ -0,0 +1,232 @@
+"""
+Лист ожидания и предложение освободившегося времени.
+
+Отмена записи, которую ждут пациенты из листа ожидания, добавляет
+строку ``FreedSlot`` в той же транзакции. Команда ``process_waitlist``
+предлагает освободившееся время первому по очереди пациенту, чей
+диапазон дат включает этот день: заявка переходит в статус
+``offered`` и пациенту уходит письмо. Одно время предлагается одному
+пациенту за раз (ограничение ``unique_slot_offer``).
+
+Пациент подтверждает предложение на странице записи. Подтверждение —
+такая же вставка ``Appointment``, как обычная запись, под уникальным
+ограничением на время врача, поэтому время, которое успели занять через
+форму, второй раз не выдаётся. Отклонённое или не подтверждённое в срок
+предложение закрывает заявку, а время снова встаёт в очередь.
+
+Строки ``FreedSlot`` удаляются в той же транзакции, в которой созданы
+предложения: если обработчик прервётся, время останется в очереди.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import notifications
+from .models import (
+    Appointment, Doctor, FreedSlot, Notification, WaitlistEntry, is_slot_conflict,
+)
+from .slots import get_free_slots
+
+
+# Сколько пациентов из очереди пробовать на одно время: предложение
+# не создаётся, если пациент как раз покинул лист ожидания.
+CANDIDATES_PER_SLOT = 10
+
+ACTIVE = (WaitlistEntry.WAITING, WaitlistEntry.OFFERED)
+OFFER_CONSTRAINT = "unique_slot_offer"
+
+
+def offer_timeout():
+    return timedelta(minutes=getattr(settings, "WAITLIST_OFFER_MINUTES", 120))
+
+
+def waiting_for(doctor_id, date):
+    return WaitlistEntry.objects.filter(
+        doctor_id=doctor_id, status=WaitlistEntry.WAITING, date_from__lte=date, date_to__gte=date
+    )
+
+
+def join(doctor, patient, date_from, date_to):
+    """
+    Ставит пациента в очередь к врачу или меняет даты уже поданной заявки;
+    место в очереди и предложенное время при этом сохраняются.
+    """
+    entry, _ = WaitlistEntry.objects.update_or_create(
+        doctor=doctor, patient=patient, status__in=ACTIVE,
+        defaults={"date_from": date_from, "date_to": date_to},
+    )
+    return entry
+
+
+def close(entries, status):
+    """
+    Переводит заявки ``entries`` в ``status``; предложенное по ним время
+    снова встаёт в очередь. Вызывается в транзакции.
+    """
+    rows = list(
+        entries.select_for_update()
+        .values_list("pk", "status", "doctor_id", "offer_date", "offer_time")
+    )
+    WaitlistEntry.objects.filter(pk__in=[row[0] for row in rows]).update(status=status)
+    release_slots([row[2:] for row in rows if row[1] == WaitlistEntry.OFFERED])
+    return len(rows)
+
+
+def leave(entries):
+    """Пациент покидает лист ожидания или отказывается от предложенного времени."""
+    with transaction.atomic():
+        return close(entries.filter(status__in=ACTIVE), WaitlistEntry.LEFT)
+
+
+def release_slots(appointments):
+    """
+    Ставит в очередь время отменённых записей ``(doctor_id, date, time)``,
+    если его кто-то ждёт. Вызывается в транзакции отмены.
+    """
+    today = timezone.localdate()
+    slots = [(doctor_id, date, time) for doctor_id, date, time in appointments if date >= today]
+    if not slots:
+        return 0
+    wanted = Q()
+    for doctor_id, date, _ in slots:
+        wanted |= Q(doctor_id=doctor_id, date_from__lte=date, date_to__gte=date)
+    waiting = set(
+        WaitlistEntry.objects.filter(wanted, status=WaitlistEntry.WAITING)
+        .values_list("doctor_id", "date_from", "date_to")
+    )
+    freed = [
+        FreedSlot(doctor_id=doctor_id, date=date, time=time)
+        for doctor_id, date, time in slots
+        if any(
+            waiting_doctor == doctor_id and date_from <= date <= date_to
+            for waiting_doctor, date_from, date_to in waiting
+        )
+    ]
+    FreedSlot.objects.bulk_create(freed)
+    return len(freed)
+
+
+def release_slot(appointment):
+    if not appointment.is_published:
+        return 0
+    return release_slots([(appointment.doctor_id, appointment.date, appointment.time)])
+
+
+def slot_start(date, time):
+    return timezone.make_aware(datetime.combine(date, time))
+
+
+def is_bookable(doctor_id, date, time):
+    """Время в прошлом, вне расписания или уже занятое не выдаётся."""
+    if slot_start(date, time) <= timezone.now():
+        return False
+    return time.strftime("%H:%M") in get_free_slots(doctor_id, date)
+
+
+def is_offer_conflict(error):
+    """``IntegrityError`` из-за того, что время уже предложено другому пациенту."""
+    table = WaitlistEntry._meta.db_table
+    message = str(error)
+    return OFFER_CONSTRAINT in message or (
+        f"{table}.doctor_id, {table}.offer_date, {table}.offer_time" in message
+    )
+
+
+def offer_slot(doctor_id, date, time):
+    """Предлагает время первому подходящему пациенту; возвращает заявку или ``None``."""
+    if not is_bookable(doctor_id, date, time):
+        return None
+    # Предложение не переживает начало приёма.
+    expires_at = min(timezone.now() + offer_timeout(), slot_start(date, time))
+    candidates = waiting_for(doctor_id, date).order_by("created_at", "pk")
+    for entry in candidates[:CANDIDATES_PER_SLOT]:
+        try:
+            with transaction.atomic():
+                # Заявку могли отозвать после выборки: тогда берётся следующая.
+                offered = WaitlistEntry.objects.filter(
+                    pk=entry.pk, status=WaitlistEntry.WAITING
+                ).update(
+                    status=WaitlistEntry.OFFERED,
+                    offer_date=date,
+                    offer_time=time,
+                    offer_expires_at=expires_at,
+                )
+                if not offered:
+                    continue
+                notifications.enqueue_offer(entry)
+        except IntegrityError as error:
+            if not is_offer_conflict(error):
+                raise
+            # Время уже предложено другому пациенту.
+            return None
+        return entry
+    return None
+
+
+def confirm(entries):
+    """
+    Записывает пациента на предложенное по заявке из ``entries`` время;
+    возвращает запись или ``None``, если предложение истекло или время
+    уже заняли. Во втором случае пациент остаётся в очереди.
+    """
+    entry = entries.filter(
+        status=WaitlistEntry.OFFERED, offer_expires_at__gt=timezone.now()
+    ).first()
+    if entry is None:
+        return None
+    if is_bookable(entry.doctor_id, entry.offer_date, entry.offer_time):
+        try:
+            with transaction.atomic():
+                # Одновременные подтверждения и истечение срока: переход делает один.
+                confirmed = WaitlistEntry.objects.filter(
+                    pk=entry.pk, status=WaitlistEntry.OFFERED, offer_expires_at__gt=timezone.now()
+                ).update(status=WaitlistEntry.BOOKED)
+                if not confirmed:
+                    return None
+                appointment = Appointment(
+                    doctor_id=entry.doctor_id, patient_id=entry.patient_id,
+                    date=entry.offer_date, time=entry.offer_time,
+                )
+                appointment.save()
+                notifications.enqueue(appointment, Notification.BOOKED)
+            return appointment
+        except IntegrityError as error:
+            if not is_slot_conflict(error):
+                raise
+    # Время заняли через обычную запись или убрали из расписания.
+    WaitlistEntry.objects.filter(pk=entry.pk, status=WaitlistEntry.OFFERED).update(
+        status=WaitlistEntry.WAITING
+    )
+    return None
+
+
+def expire_entries():
+    """Закрывает заявки, диапазон которых уже прошёл, и просроченные предложения."""
+    expired = Q(status=WaitlistEntry.WAITING, date_to__lt=timezone.localdate()) | Q(
+        status=WaitlistEntry.OFFERED, offer_expires_at__lte=timezone.now()
+    )
+    with transaction.atomic():
+        return close(WaitlistEntry.objects.filter(expired), WaitlistEntry.EXPIRED)
+
+
+def process(batch_size=100):
+    """Разбирает пачку освободившегося времени; возвращает ``(разобрано, предложено)``."""
+    with transaction.atomic():
+        queue = FreedSlot.objects.order_by("pk")
+        if connection.features.has_select_for_update_skip_locked:
+            queue = queue.select_for_update(skip_locked=True)
+        rows = list(queue.values_list("pk", "doctor_id", "date", "time")[:batch_size])
+        published = set(
+            Doctor.objects.filter(
+                pk__in={row[1] for row in rows}, is_published=True
+            ).values_list("pk", flat=True)
+        )
+        offered = sum(
+            1 for _, doctor_id, date, time in rows
+            if doctor_id in published and offer_slot(doctor_id, date, time)
+        )
+        FreedSlot.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows), offered
@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
+started = time.perf_counter()
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital.settings')
 
 application = get_asgi_application()
+
+from hospital.warmup import warm_up  # noqa: E402 - нужен настроенный Django
+
+warm_up(started, async_pool=True)
@@ -0,0 +1,239 @@
+"""
+Статические файлы и медиа в рабочем режиме.
+
+``collectstatic`` с ``CompressedManifestStaticFilesStorage`` добавляет
+к именам файлов хэш содержимого и рядом со сжимаемыми файлами кладёт
+копии ``.gz`` и, если установлен пакет ``brotli``, ``.br``. Файл с хэшем
+в имени никогда не меняется, поэтому отдаётся с
+``Cache-Control: immutable`` на год: повторные просмотры страниц
+не скачивают статику вовсе.
+
+Если перед приложением нет веб-сервера, ``serve_static`` и ``serve_media``
+(включаются настройкой ``SERVE_ASSETS``) отдают файлы через
+``FileResponse``: под gunicorn это ``sendfile`` без копирования в Python.
+Поддерживаются условные запросы и один диапазон ``Range``; заголовок
+с несколькими диапазонами игнорируется и отдаётся весь файл. Медиа
+(фотографии врачей) могут перезаписываться под тем же именем, поэтому
+кэшируются на ``MEDIA_MAX_AGE`` с проверкой по ``ETag``.
+"""
+import gzip
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+
+COMPRESSIBLE_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico",
+}
+MIN_COMPRESS_SIZE = 256
+# Варианты кодирования в порядке предпочтения.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+IMMUTABLE = "public, max-age=31536000, immutable"
+MEDIA_MAX_AGE = 86400
+STATIC_MAX_AGE = 3600
+
+_HASHED_NAME = re.compile(r"\.[0-9a-f]{12}\.[^./]+$")
+_RANGE = re.compile(r"^bytes=(?:(\d+)-(\d*)|-(\d+))$")
+
+
+def compress(path):
+    """Пишет ``path.gz`` и ``path.br``, если они меньше исходного файла."""
+    with open(path, "rb") as source:
+        data = source.read()
+    variants = [(".gz", gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(data, quality=11)))
+    written = []
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, "wb") as target:
+                target.write(compressed)
+            written.append(path + suffix)
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Хэшированные имена плюс заранее сжатые копии файлов."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        # CSS обрабатывается в несколько проходов; сжимается итоговое имя.
+        final_names = {}
+        for name, hashed_name, processed in super().post_process(paths, dry_run, **options):
+            if hashed_name and not isinstance(processed, Exception):
+                final_names[name] = hashed_name
+            yield name, hashed_name, processed
+        if dry_run:
+            return
+        for name, hashed_name in final_names.items():
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            for stored_name in (name, hashed_name):
+                path = self.path(stored_name)
+                if os.path.getsize(path) >= MIN_COMPRESS_SIZE:
+                    compress(path)
+
+
+class RangeFile:
+    """Часть файла от текущей позиции длиной ``length`` байт."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def single_range(request):
+    """
+    Заголовок ``Range`` с одним диапазоном байт или ``None``. Несколько
+    диапазонов и неверный синтаксис игнорируются: отдаётся весь файл.
+    """
+    header = request.META.get("HTTP_RANGE", "").strip()
+    return header if _RANGE.match(header) else None
+
+
+def parse_range(header, size):
+    """``(start, end)`` включительно или ``None``, если диапазон за концом файла."""
+    start, end, suffix = _RANGE.match(header).groups()
+    if suffix is not None:
+        start, end = max(size - int(suffix), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def accepted_encodings(header):
+    """Вес ``q`` поддерживаемых кодировок из ``Accept-Encoding``; с нулевым не берутся."""
+    weights = {}
+    for item in header.split(","):
+        coding, *params = item.strip().lower().split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            weights[coding.strip()] = q
+    accepted = {}
+    for encoding, _ in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > 0:
+            accepted[encoding] = q
+    return accepted
+
+
+def select_encoding(request, path, allow_compressed):
+    """Путь, размер и кодировку лучшего доступного варианта файла."""
+    if allow_compressed:
+        weights = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        # При равном весе — в порядке ENCODINGS.
+        for encoding, suffix in sorted(ENCODINGS, key=lambda item: -weights.get(item[0], 0)):
+            if encoding not in weights:
+                continue
+            try:
+                stat = os.stat(path + suffix)
+            except OSError:
+                continue
+            return path + suffix, stat, encoding
+    try:
+        stat = os.stat(path)
+    except OSError:
+        raise Http404("Файл не найден.")
+    if not os.path.isfile(path):
+        raise Http404("Файл не найден.")
+    return path, stat, None
+
+
+def serve_file(request, root, path, cache_control):
+    # Путь за пределами root отклоняется safe_join (SuspiciousFileOperation, 400).
+    fullpath = safe_join(root, posixpath.normpath(path).lstrip("/"))
+    range_header = single_range(request)
+    # Диапазоны отдаются только из несжатого файла.
+    filepath, stat, encoding = select_encoding(request, fullpath, not range_header)
+
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    if_none_match = request.META.get("HTTP_IF_NONE_MATCH")
+    modified_since = parse_http_date_safe(request.META.get("HTTP_IF_MODIFIED_SINCE", ""))
+    if (if_none_match and etag in if_none_match) or (
+        not if_none_match and modified_since and int(stat.st_mtime) <= modified_since
+    ):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        response["Cache-Control"] = cache_control
+        return response
+
+    content_type, original_encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    size = stat.st_size
+    span = parse_range(range_header, size) if range_header else None
+    if range_header and span is None:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    file = open(filepath, "rb")
+    if span is None:
+        response = FileResponse(file, content_type=content_type)
+        response["Content-Length"] = size
+    else:
+        start, end = span
+        file.seek(start)
+        length = end - start + 1
+        # До конца файла отдаёт сам файл (sendfile), иначе — ограниченное чтение.
+        body = file if end == size - 1 else RangeFile(file, length)
+        response = FileResponse(body, status=206, content_type=content_type)
+        response["Content-Length"] = length
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    # FileResponse угадывает тип по имени файла, а у сжатой копии оно с .gz/.br;
+    # по тому же имени он добавил бы Content-Disposition с «.gz» на конце.
+    response["Content-Type"] = content_type
+    del response["Content-Disposition"]
+    if encoding:
+        response["Content-Encoding"] = encoding
+    elif original_encoding:
+        response["Content-Encoding"] = original_encoding
+    response["Vary"] = "Accept-Encoding"
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    response["Cache-Control"] = cache_control
+    return response
+
+
+@require_safe
+def serve_static(request, path):
+    """Файл из ``STATIC_ROOT``; имена с хэшем кэшируются навсегда."""
+    cache_control = IMMUTABLE if _HASHED_NAME.search(path) else f"public, max-age={STATIC_MAX_AGE}"
+    return serve_file(request, settings.STATIC_ROOT, path, cache_control)
+
+
+@require_safe
+def serve_media(request, path):
+    """Загруженный файл из ``MEDIA_ROOT``."""
+    return serve_file(request, settings.MEDIA_ROOT, path, f"public, max-age={MEDIA_MAX_AGE}")
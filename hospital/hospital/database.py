@@ -0,0 +1,183 @@
+"""
+Чтение с реплик базы данных.
+
+Запись всегда идёт в ``default``. Чтение уходит на одну из реплик
+(``DATABASE_REPLICAS``) только внутри view, явно отмеченных
+``replica_reads``: каталог врачей и расчёт свободного времени. Всё
+остальное, в том числе запись на приём и её отмена, читает основную базу.
+
+Реплика выбирается одна на весь запрос, чтобы страница не собиралась
+из реплик с разным отставанием. Реплика может отставать, поэтому после
+записи чтение закрепляется за основной базой: до конца запроса и ещё
+на ``REPLICA_PIN_SECONDS`` для этого браузера (cookie), чтобы пациент
+сразу увидел свою запись. Другие пользователи могут недолго видеть данные
+реплики; занятое время всё равно не удастся записать дважды благодаря
+уникальному ограничению в основной базе. Прочитанное с реплики в общий
+кэш не попадает (см. ``doctors.cache``).
+"""
+import asyncio
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+
+PIN_COOKIE = "primary_pin"
+
+# С реплик читаются только данные этих приложений: пользователи и сессии
+# всегда берутся из основной базы, иначе только что вошедший пациент
+# может не найтись на отстающей реплике.
+REPLICA_APPS = {"doctors"}
+# Записи в эти приложения не закрепляют чтение за основной базой.
+UNPINNED_APPS = {"sessions"}
+
+_replica_allowed = ContextVar("replica_allowed", default=False)
+# Изменяемый объект, а не флаг: запись из пула потоков (скопированный
+# контекст) должна быть видна middleware исходного запроса.
+_request_state = ContextVar("database_request_state", default=None)
+
+
+class RequestState:
+    __slots__ = ("pinned", "replica")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.replica = None
+
+
+def replica_reads(view_func):
+    """Разрешает view читать с реплики, если чтение не закреплено."""
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            token = _replica_allowed.set(True)
+            try:
+                return await view_func(request, *args, **kwargs)
+            finally:
+                _replica_allowed.reset(token)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        token = _replica_allowed.set(True)
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            _replica_allowed.reset(token)
+    return wrapper
+
+
+def pin_to_primary():
+    state = _request_state.get()
+    if state is not None:
+        state.pinned = True
+
+
+def is_pinned():
+    """Чтение текущего запроса закреплено за основной базой."""
+    state = _request_state.get()
+    return state is not None and state.pinned
+
+
+def using_replica():
+    return _replica_allowed.get() and not is_pinned()
+
+
+def reads_from_replica():
+    """Данные ``REPLICA_APPS`` сейчас читаются с реплики."""
+    return bool(getattr(settings, "DATABASE_REPLICAS", ())) and using_replica()
+
+
+def choose_replica(replicas):
+    state = _request_state.get()
+    if state is None:
+        return random.choice(replicas)
+    if state.replica not in replicas:
+        state.replica = random.choice(replicas)
+    return state.replica
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, "DATABASE_REPLICAS", ())
+        if replicas and model._meta.app_label in REPLICA_APPS and using_replica():
+            return choose_replica(replicas)
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in UNPINNED_APPS:
+            pin_to_primary()
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class PrimaryPinMiddleware:
+    """
+    Закрепляет чтение за основной базой после записи.
+
+    Пока у браузера есть cookie ``primary_pin``, реплики не используются.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, "REPLICA_PIN_SECONDS", 5)
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        state = RequestState(PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    async def __acall__(self, request):
+        state = RequestState(PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.process_response(state, response)
+
+    def process_response(self, state, response):
+        if state.pinned:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=self.pin_seconds, httponly=True, samesite="Lax"
+            )
+        return response
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Включает WAL для SQLite: читатели не ждут писателя, а писатель
+    не ждёт читателей. ``synchronous`` остаётся ``FULL``: с ``NORMAL``
+    при отключении питания могут пропасть уже подтверждённые записи.
+    """
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode=WAL")
+
+
+def copy_sqlite_database(source="default", target="replica"):
+    """Копирует содержимое SQLite-базы ``source`` в ``target``."""
+    source_connection, target_connection = connections[source], connections[target]
+    source_connection.ensure_connection()
+    target_connection.ensure_connection()
+    source_connection.connection.backup(target_connection.connection)
@@ -0,0 +1,183 @@
+"""
+Замер SQL-запросов и отрисовки шаблонов в рамках одного HTTP-запроса.
+
+Middleware включается настройкой ``SQL_INSTRUMENTATION``. Когда она
+выключена, Django убирает middleware из цепочки (``MiddlewareNotUsed``)
+и запросы не замедляются. При включённой — замеряется доля запросов
+``SQL_INSTRUMENTATION_SAMPLE_RATE``: на каждое SQL-выражение приходится
+один вызов таймера, а разбор повторов выполняется уже после ответа.
+
+Замер ставится на каждое подключение к базе при его открытии, поэтому
+учитываются и запросы из потоков пула ``doctors.aio``: профиль
+запроса передаётся туда вместе с контекстом (``contextvars``).
+
+Результат отдаётся в заголовке ``Server-Timing``, медленные запросы
+(дольше ``SQL_INSTRUMENTATION_SLOW_MS``) пишутся в журнал
+``hospital.instrumentation`` одной JSON-строкой вместе с самыми
+долгими и повторяющимися SQL-выражениями.
+"""
+import json
+import logging
+import random
+import re
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger("hospital.instrumentation")
+
+MAX_LOGGED_QUERIES = 10
+
+_current_profile = ContextVar("sql_instrumentation_profile", default=None)
+_IN_LIST = re.compile(r"\((?:\s*%s\s*,)+\s*%s\s*\)")
+_NUMBERS = re.compile(r"\b\d+\b")
+
+
+def fingerprint(sql):
+    """Приводит SQL к виду, не зависящему от длины ``IN (...)`` и чисел."""
+    return _NUMBERS.sub("N", _IN_LIST.sub("(%s, ...)", sql))
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def record(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((context["connection"].alias, sql, time.perf_counter() - started))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def duplicates(self):
+        counts = Counter(fingerprint(sql) for _, sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def slowest(self, limit=MAX_LOGGED_QUERIES):
+        totals = defaultdict(lambda: [0, 0.0])
+        for alias, sql, duration in self.queries:
+            total = totals[(alias, sql)]
+            total[0] += 1
+            total[1] += duration
+        ordered = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return [
+            {"alias": alias, "sql": sql, "count": count, "ms": round(duration * 1000, 2)}
+            for (alias, sql), (count, duration) in ordered[:limit]
+        ]
+
+
+def _record_query(execute, sql, params, many, context):
+    # execute_wrapper каждого подключения; вне замеряемого запроса ничего не делает.
+    profile = _current_profile.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.record(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def install_query_recording():
+    """Ставит замер на открытые подключения текущего потока и на все будущие."""
+    connection_created.connect(
+        install_query_recorder, weak=False, dispatch_uid="sql_instrumentation"
+    )
+    for connection in connections.all():
+        install_query_recorder(connection)
+
+
+def _render_with_timing(render):
+    def wrapper(self, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        # Вложенная отрисовка (render_to_string внутри тега) не считается дважды.
+        profile._template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            profile._template_depth -= 1
+            if not profile._template_depth:
+                profile.template_time += time.perf_counter() - started
+    wrapper.timed = True
+    return wrapper
+
+
+def install_template_timing():
+    if not getattr(Template.render, "timed", False):
+        Template.render = _render_with_timing(Template.render)
+
+
+def server_timing(profile, total):
+    metrics = [
+        f'db;dur={profile.db_time * 1000:.1f};desc="SQL: {len(profile.queries)}"',
+        f"tpl;dur={profile.template_time * 1000:.1f}",
+        f"total;dur={total * 1000:.1f}",
+    ]
+    duplicates = profile.duplicates()
+    if duplicates:
+        # Значения заголовков должны быть в ASCII, иначе Django кодирует их по MIME.
+        metrics.append(f'dup;desc="Repeated: {sum(duplicates.values()) - len(duplicates)}"')
+    return ", ".join(metrics)
+
+
+class SQLInstrumentationMiddleware:
+    """Считает SQL-запросы и время отрисовки, добавляет ``Server-Timing``."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, "SQL_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "SQL_INSTRUMENTATION_SAMPLE_RATE", 1.0)
+        self.slow_ms = getattr(settings, "SQL_INSTRUMENTATION_SLOW_MS", 500)
+        install_template_timing()
+        install_query_recording()
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+
+        total = time.perf_counter() - profile.started
+        response["Server-Timing"] = server_timing(profile, total)
+        if total * 1000 >= self.slow_ms:
+            self.log_slow_request(request, response, profile, total)
+        return response
+
+    def log_slow_request(self, request, response, profile, total):
+        record = {
+            "event": "slow_request",
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "db_ms": round(profile.db_time * 1000, 2),
+            "template_ms": round(profile.template_time * 1000, 2),
+            "queries": len(profile.queries),
+            "duplicates": profile.duplicates(),
+            "slowest": profile.slowest(),
+        }
+        logger.warning(json.dumps(record, ensure_ascii=False))
@@ -48,7 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'hospital.instrumentation.SQLInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'hospital.database.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -65,8 +67,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Скомпилированные шаблоны хранятся в памяти процесса и при DEBUG;
+            # runserver сбрасывает их при изменении файлов шаблонов.
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -83,10 +92,41 @@ WSGI_APPLICATION = 'hospital.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Локальная реплика — отдельный файл SQLite, который нужно копировать
+# из основной базы; чтение с неё включается в hospital/settings_replica.py.
+# WAL включается при подключении (hospital.database.configure_sqlite).
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_replica.sqlite3',
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'timeout': 20,
+        },
+    },
+}
+
+DATABASE_ROUTERS = ['hospital.database.PrimaryReplicaRouter']
+
+# Псевдонимы баз, с которых читают каталог врачей и свободное время.
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи браузер читает только основную базу.
+REPLICA_PIN_SECONDS = 5
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hospital',
     }
 }
 
@@ -133,12 +173,80 @@ LOGIN_URL = 'login'
 
 STATIC_URL = '/static/'
 
+# Сюда собирает файлы collectstatic; в рабочем режиме (settings_production)
+# имена получают хэш содержимого, а рядом кладутся сжатые копии.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
 STATICFILES_DIRS = [
     BASE_DIR / 'static_dev',
 ]
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Отдавать статику и медиа самим приложением (hospital/assets.py), когда
+# перед ним нет веб-сервера. При DEBUG они отдаются средствами Django.
+SERVE_ASSETS = False
+
+# Замер SQL-запросов и времени отрисовки (заголовок Server-Timing).
+# Выключенный middleware не участвует в обработке запросов.
+SQL_INSTRUMENTATION = False
+SQL_INSTRUMENTATION_SAMPLE_RATE = 1.0
+SQL_INSTRUMENTATION_SLOW_MS = 500
+
+# Асинхронные view свободного времени и записи (для запуска под ASGI)
+# и размер пула потоков, в котором они обращаются к базе.
+ASYNC_BOOKING_VIEWS = False
+ASYNC_DB_WORKERS = 8
+
+# Прогрев процесса в wsgi.py/asgi.py до первого запроса (hospital/warmup.py):
+# шаблоны, URL и подключения к базам. WARMUP_AVAILABILITY_DOCTORS самых
+# загруженных сегодня врачей получают свободное время в кэш, пока
+# прогрев не превысил WARMUP_BUDGET_SECONDS.
+WARMUP = True
+WARMUP_AVAILABILITY_DOCTORS = 0
+WARMUP_BUDGET_SECONDS = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'hospital.warmup': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Сколько дней записи на приём хранятся в основной таблице
+# (см. команду archive_appointments).
+APPOINTMENT_RETENTION_DAYS = 365
+
+# Письма пациентам о записи, отмене и приёме на следующий день
+# отправляет команда send_notifications; неудачные попытки повторяются
+# с паузой NOTIFICATION_RETRY_SECONDS, удваивающейся с каждой попыткой.
+APPOINTMENT_NOTIFICATIONS = True
+NOTIFICATION_MAX_ATTEMPTS = 6
+NOTIFICATION_RETRY_SECONDS = 60
+
+# Сколько минут пациент из листа ожидания может подтвердить предложенное
+# время (см. doctors/waitlist.py); потом оно достаётся следующему.
+WAITLIST_OFFER_MINUTES = 120
+
+# Ограничение частоты запросов (см. hospital/throttling.py): ведро
+# на пользователя и на IP-адрес для каждого ограниченного view.
+# CacheBackend делит лимиты между процессами через кэш THROTTLE_CACHE;
+# за обратным прокси адрес клиента берётся из THROTTLE_IP_HEADER
+# (например, "HTTP_X_REAL_IP").
+THROTTLE_BACKEND = "hospital.throttling.LocalBackend"
+THROTTLE_IP_HEADER = None
+THROTTLES = {
+    "availability": {"user": "120/m", "ip": "600/m"},
+    "booking": {"user": "30/m", "ip": "120/m"},
+}
+
+# Потоки, строящие уменьшенные копии фотографий врачей.
+IMAGE_VARIANT_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
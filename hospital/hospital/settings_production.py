@@ -0,0 +1,17 @@
+"""
+Рабочий режим отдачи статики: имена с хэшем содержимого, сжатые копии
+и кэширование в браузере навсегда.
+
+    python manage.py collectstatic --settings=hospital.settings_production
+    gunicorn hospital.wsgi --env DJANGO_SETTINGS_MODULE=hospital.settings_production
+
+Если перед приложением стоит веб-сервер, он должен отдавать
+``STATIC_ROOT`` и ``MEDIA_ROOT`` сам (с ``gzip_static``/``brotli_static``),
+а ``SERVE_ASSETS`` нужно выключить.
+"""
+from .settings import *  # noqa: F401,F403
+
+
+DEBUG = False
+STATICFILES_STORAGE = 'hospital.assets.CompressedManifestStaticFilesStorage'
+SERVE_ASSETS = True
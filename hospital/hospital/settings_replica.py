@@ -0,0 +1,14 @@
+"""
+Настройки с чтением каталога врачей и свободного времени с реплики.
+
+Локально реплика — файл ``db_replica.sqlite3``; перед запуском его
+нужно создать копированием основной базы::
+
+    python manage.py migrate
+    python manage.py shell -c "from hospital.database import copy_sqlite_database; copy_sqlite_database()"
+    python manage.py runserver --settings=hospital.settings_replica
+"""
+from .settings import *  # noqa: F401,F403
+
+
+DATABASE_REPLICAS = ['replica']
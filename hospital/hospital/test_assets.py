@@ -0,0 +1,70 @@
+import gzip
+
+import pytest
+from django.test import RequestFactory
+
+from hospital import assets
+
+
+@pytest.fixture
+def static_root(settings, tmp_path):
+    settings.STATIC_ROOT = tmp_path
+    (tmp_path / "site.0123456789ab.css").write_text("body { margin: 0; }\n" * 50)
+    assets.compress(str(tmp_path / "site.0123456789ab.css"))
+    return tmp_path
+
+
+def get(path, **headers):
+    return assets.serve_static(RequestFactory().get(path, **headers), path.split("/", 2)[2])
+
+
+def test_hashed_file_is_served_compressed_and_immutable(static_root):
+    original = (static_root / "site.0123456789ab.css").read_bytes()
+    response = get("/static/site.0123456789ab.css", HTTP_ACCEPT_ENCODING="gzip, deflate")
+    assert response.status_code == 200
+    assert response["Content-Encoding"] == "gzip"
+    assert response["Content-Type"] == "text/css"
+    assert response["Cache-Control"] == assets.IMMUTABLE
+    assert gzip.decompress(b"".join(response.streaming_content)) == original
+
+    response = get(
+        "/static/site.0123456789ab.css",
+        HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=response["ETag"],
+    )
+    assert response.status_code == 304
+
+
+def test_range_is_served_from_original(static_root):
+    original = (static_root / "site.0123456789ab.css").read_bytes()
+    response = get(
+        "/static/site.0123456789ab.css", HTTP_RANGE="bytes=5-14", HTTP_ACCEPT_ENCODING="gzip"
+    )
+    assert response.status_code == 206
+    assert response["Content-Range"] == f"bytes 5-14/{len(original)}"
+    assert "Content-Encoding" not in response
+    assert b"".join(response.streaming_content) == original[5:15]
+
+    response = get("/static/site.0123456789ab.css", HTTP_RANGE=f"bytes={len(original)}-")
+    assert response.status_code == 416
+
+
+@pytest.mark.parametrize("accept, encoding", [
+    ("gzip;q=0", None),
+    ("gzip; q=0.0, deflate", None),
+    ("*;q=0", None),
+    ("*", "gzip"),
+    ("deflate, GZIP;q=0.5", "gzip"),
+])
+def test_accept_encoding_weights(static_root, accept, encoding):
+    response = get("/static/site.0123456789ab.css", HTTP_ACCEPT_ENCODING=accept)
+    assert response.get("Content-Encoding") == encoding
+    assert "Content-Disposition" not in response
+
+
+@pytest.mark.parametrize("header", ["bytes=0-0,5-9", "items=0-9", "bytes=-", "bytes=a-b"])
+def test_unsupported_range_returns_whole_file(static_root, header):
+    original = (static_root / "site.0123456789ab.css").read_bytes()
+    response = get("/static/site.0123456789ab.css", HTTP_RANGE=header)
+    assert response.status_code == 200
+    assert "Content-Range" not in response
+    assert b"".join(response.streaming_content) == original
@@ -0,0 +1,47 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from doctors import aio
+from doctors.models import Doctor
+from hospital.instrumentation import RequestProfile, SQLInstrumentationMiddleware, server_timing
+
+
+@pytest.fixture(autouse=True)
+def instrumentation(settings):
+    settings.SQL_INSTRUMENTATION = True
+    settings.SQL_INSTRUMENTATION_SLOW_MS = 10 ** 6
+
+
+def test_server_timing_is_ascii():
+    profile = RequestProfile()
+    profile.queries = [("default", "SELECT * FROM t WHERE id IN (%s, %s)", 0.001)] * 3
+    profile.queries.append(("default", "SELECT * FROM t WHERE id IN (%s)", 0.001))
+    header = server_timing(profile, 0.01)
+    assert header.isascii()
+    assert 'db;dur=4.0;desc="SQL: 4"' in header
+    assert 'dup;desc="Repeated: 2"' in header
+
+
+@pytest.mark.django_db
+def test_middleware_counts_request_queries(client, doctor):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(reverse("doctors:index"))
+    assert f'desc="SQL: {len(queries)}"' in response["Server-Timing"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_queries_in_async_pool_are_recorded(fresh_pool, doctor):
+    # Потоки нового пула открывают подключения уже после установки замера.
+    def view(request):
+        count = async_to_sync(aio.run_db)(Doctor.objects.count)
+        Doctor.objects.exists()
+        return HttpResponse(str(count))
+
+    response = SQLInstrumentationMiddleware(view)(RequestFactory().get("/"))
+    assert response.content == b"1"
+    assert 'desc="SQL: 2"' in response["Server-Timing"]
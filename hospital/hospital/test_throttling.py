@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from hospital.throttling import CacheBackend, LocalBackend, throttle
+
+
+def fixed_clock(backend):
+    backend.clock = lambda: 1000.0
+    return backend
+
+
+@pytest.fixture(params=[LocalBackend, CacheBackend])
+def backend(request):
+    return fixed_clock(request.param())
+
+
+def test_rejected_request_does_not_charge_other_buckets(backend):
+    first = [("u1", 30, 2), ("ip", 20, 3)]
+    assert [backend.hit(first) for _ in range(2)] == [0.0, 0.0]
+    for _ in range(5):
+        assert backend.hit(first) == 30
+    # Отклонённые запросы первого пользователя не съели ведро IP.
+    assert backend.hit([("u2", 30, 2), ("ip", 20, 3)]) == 0.0
+    assert backend.hit([("u3", 30, 2), ("ip", 20, 3)]) == 20
+
+
+def test_local_backend_evicts_least_recently_used():
+    backend = fixed_clock(LocalBackend(max_keys=10))
+    for number in range(10):
+        backend.hit([(f"k{number}", 60, 1)])
+    backend.hit([("k0", 1, 100)])
+    backend.hit([("k10", 60, 1)])
+    assert len(backend._full_at) == 9
+    assert {"k0", "k10"} <= set(backend._full_at)
+    assert "k1" not in backend._full_at
+    # Оставшиеся вёдра по-прежнему ограничивают запросы.
+    assert backend.hit([("k10", 60, 1)]) == 60
+
+
+@pytest.mark.django_db
+def test_async_view_uses_shared_cache_from_pool(settings, monkeypatch):
+    settings.THROTTLE_BACKEND = "hospital.throttling.CacheBackend"
+    settings.THROTTLES = {"slow": {"ip": "1/m"}}
+    threads = []
+    hit = CacheBackend.hit
+
+    def recording_hit(self, buckets):
+        threads.append(threading.current_thread().name)
+        return hit(self, buckets)
+
+    monkeypatch.setattr(CacheBackend, "hit", recording_hit)
+
+    @throttle("slow")
+    async def view(request):
+        return HttpResponse("ok")
+
+    responses = [async_to_sync(view)(RequestFactory().get("/")) for _ in range(2)]
+    assert [response.status_code for response in responses] == [200, 429]
+    assert len(threads) == 2
+    assert all(name.startswith("async-db") for name in threads)
@@ -0,0 +1,66 @@
+import os
+import signal
+import time
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.template import engines
+
+from doctors import aio
+from hospital import warmup
+
+
+@pytest.mark.django_db
+def test_warm_up_compiles_templates_and_reports_stages(settings, doctor):
+    settings.WARMUP_AVAILABILITY_DOCTORS = 3
+    result = warmup.warm_up(started=0.0)
+
+    templates = sum(1 for path in settings.TEMPLATES_DIR.rglob("*") if path.is_file())
+    assert result["templates"]["count"] + len(result["templates"]["failed"]) == templates
+    assert result["templates"]["count"] > 0
+    assert result["urls"]["count"] > 0
+    assert result["databases"]["count"] == 1
+    assert result["availability"]["count"] == 1
+    assert result["total_ms"] >= result["warmup_ms"]
+    assert warmup.report == result
+
+    loader = engines["django"].engine.template_loaders[0]
+    assert "doctors/index.html" in {key.split("-")[0] for key in loader.get_template_cache}
+
+
+def test_warm_up_can_be_disabled(settings):
+    settings.WARMUP = False
+    assert warmup.warm_up() == {}
+
+
+@pytest.mark.django_db
+def test_pool_is_not_warmed_without_async_views(settings, fresh_pool):
+    settings.ASYNC_BOOKING_VIEWS = False
+    result = warmup.warm_up(async_pool=True)
+    assert result["databases"]["count"] == 1
+    assert aio._executor is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_pool_warmed_before_fork_works_in_child(settings, fresh_pool):
+    settings.ASYNC_DB_WORKERS = 2
+    assert warmup.warm_connections(async_pool=True) == 2
+
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            code = 0 if async_to_sync(aio.run_db)(lambda: 42) == 42 else 1
+        finally:
+            os._exit(code)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        finished, status = os.waitpid(pid, os.WNOHANG)
+        if finished:
+            break
+        time.sleep(0.05)
+    else:
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+        pytest.fail("run_db завис в дочернем процессе")
+    assert os.waitstatus_to_exitcode(status) == 0
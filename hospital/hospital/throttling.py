@@ -0,0 +1,220 @@
+"""
+Ограничение частоты запросов к дорогим view.
+
+Лимиты задаются по имени в ``THROTTLES``: для каждого имени — скорость
+на пользователя (``user``) и на IP-адрес (``ip``) в виде ``"30/m"``.
+Скорость работает как ведро на ``N`` запросов, которое пополняется
+равномерно за период, поэтому короткие всплески допускаются, а
+постоянный поток выше лимита — нет. Ведро хранится одним числом —
+моментом, когда оно снова будет полным (алгоритм GCRA).
+
+Бэкенд задаётся ``THROTTLE_BACKEND``:
+
+* ``LocalBackend`` — словарь в памяти процесса, проверка занимает
+  единицы микросекунд, но у каждого процесса свои лимиты;
+* ``CacheBackend`` — кэш ``THROTTLE_CACHE``, общий для процессов.
+  Чтение и запись не атомарны, поэтому при одновременных запросах
+  одного клиента лимит может быть немного превышен. В асинхронных view
+  обращения к нему идут через пул потоков ``doctors.aio``, как и
+  остальные обращения к общему кэшу.
+
+Запрос списывается сразу со всех своих вёдер (пользователь и IP) и
+только если ни одно из них не переполнено: отклонённый запрос не
+уменьшает остаток в других вёдрах.
+
+Превысившему лимит отвечает ``429`` с заголовком ``Retry-After``.
+"""
+import asyncio
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse, JsonResponse
+from django.utils.functional import empty
+from django.utils.module_loading import import_string
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+MESSAGE = "Слишком много запросов. Повторите попытку позже."
+
+
+def parse_rate(rate):
+    """``"30/m"`` -> ``(интервал между запросами, размер ведра)``."""
+    count, period = rate.split("/")
+    count = int(count)
+    return PERIODS[period[0]] / count, count
+
+
+def charge(buckets, full_at, now):
+    """
+    Новые ``full_at`` вёдер ``[(key, interval, capacity)]`` и наибольшее
+    ожидание; при ненулевом ожидании вёдра не меняются.
+    """
+    updated = {}
+    wait = 0.0
+    for key, interval, capacity in buckets:
+        updated[key] = max(full_at.get(key, now), now) + interval
+        wait = max(wait, updated[key] - now - capacity * interval)
+    return updated, wait
+
+
+class LocalBackend:
+    """Вёдра в памяти процесса."""
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        # Порядок ключей — порядок последнего списания.
+        self._full_at = {}
+        self._lock = threading.Lock()
+
+    def hit(self, buckets):
+        """Списывает запрос со всех ``buckets``; возвращает 0 или сколько секунд ждать."""
+        now = self.clock()
+        with self._lock:
+            updated, wait = charge(buckets, self._full_at, now)
+            if wait > 0:
+                return wait
+            for key, full_at in updated.items():
+                self._full_at.pop(key, None)
+                self._full_at[key] = full_at
+            if len(self._full_at) > self.max_keys:
+                self._prune(now)
+        return 0.0
+
+    def _prune(self, now):
+        # Полное ведро не отличается от отсутствующего. Если активных
+        # вёдер всё равно больше предела, вытесняются давно не
+        # использованные; запас в 10% делает очистку редкой.
+        for key in [key for key, value in self._full_at.items() if value <= now]:
+            del self._full_at[key]
+        keys = iter(list(self._full_at))
+        while len(self._full_at) > self.max_keys * 9 // 10:
+            del self._full_at[next(keys)]
+
+
+class CacheBackend:
+    """Вёдра в общем кэше ``THROTTLE_CACHE``."""
+
+    clock = staticmethod(time.time)
+
+    def __init__(self):
+        self.cache = caches[getattr(settings, "THROTTLE_CACHE", "default")]
+
+    def hit(self, buckets):
+        now = self.clock()
+        buckets = [(f"throttle:{key}", interval, capacity) for key, interval, capacity in buckets]
+        stored = self.cache.get_many([key for key, _, _ in buckets])
+        updated, wait = charge(buckets, stored, now)
+        if wait > 0:
+            return wait
+        for key, full_at in updated.items():
+            self.cache.set(key, full_at, math.ceil(full_at - now))
+        return 0.0
+
+
+_state = {}
+
+
+def get_backend():
+    if "backend" not in _state:
+        path = getattr(settings, "THROTTLE_BACKEND", "hospital.throttling.LocalBackend")
+        _state["backend"] = import_string(path)()
+    return _state["backend"]
+
+
+def get_rules(name):
+    """Правила ``[(scope, interval, capacity)]`` для имени из ``THROTTLES``."""
+    rules = _state.setdefault("rules", {})
+    if name not in rules:
+        config = getattr(settings, "THROTTLES", {}).get(name, {})
+        rules[name] = [
+            (scope, *parse_rate(config[scope])) for scope in ("user", "ip") if config.get(scope)
+        ]
+    return rules[name]
+
+
+@receiver(setting_changed)
+def reset_throttles(setting, **kwargs):
+    if setting in ("THROTTLES", "THROTTLE_BACKEND", "THROTTLE_CACHE"):
+        _state.clear()
+
+
+def user_key(request):
+    """
+    Идентификатор пользователя без обращения к базе: ``pk``, если
+    пользователь уже загружен, иначе ключ сессии (асинхронные view).
+    """
+    user = getattr(request, "user", None)
+    wrapped = getattr(user, "_wrapped", user)
+    if wrapped is not empty and wrapped is not None:
+        return f"u{wrapped.pk}" if wrapped.pk is not None else None
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f"s{session_key}" if session_key else None
+
+
+def client_ip(request):
+    header = getattr(settings, "THROTTLE_IP_HEADER", None)
+    if header and request.META.get(header):
+        return request.META[header].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
+
+
+def throttled_response(request, name):
+    """Ответ ``429``, если запрос превышает лимит ``name``, иначе ``None``."""
+    rules = get_rules(name)
+    if not rules:
+        return None
+    buckets = []
+    for scope, interval, capacity in rules:
+        client = user_key(request) if scope == "user" else client_ip(request)
+        if client is not None:
+            buckets.append((f"{name}:{client}", interval, capacity))
+    wait = get_backend().hit(buckets) if buckets else 0.0
+    if not wait:
+        return None
+    if request.headers.get("x-requested-with") == "XMLHttpRequest":
+        response = JsonResponse({"errors": MESSAGE}, status=429)
+    else:
+        response = HttpResponse(MESSAGE, status=429, content_type="text/plain; charset=utf-8")
+    response["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+async def throttled_response_async(request, name):
+    """``throttled_response`` для асинхронных view: не блокирует цикл событий."""
+    if isinstance(get_backend(), LocalBackend):
+        return throttled_response(request, name)
+    from doctors import aio
+
+    return await aio.run_db(throttled_response, request, name)
+
+
+def throttle(name, methods=None):
+    """Ограничивает view лимитом ``name``; ``methods`` — какие методы считать."""
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if methods is None or request.method in methods:
+                    response = await throttled_response_async(request, name)
+                    if response is not None:
+                        return response
+                return await view_func(request, *args, **kwargs)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                response = throttled_response(request, name)
+                if response is not None:
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -14,13 +14,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from doctors import views
 from django.conf import settings
+from hospital import assets
 
 urlpatterns = [
     path('', include('doctors.urls')),
@@ -36,5 +37,11 @@ urlpatterns = [
     ),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
+if settings.SERVE_ASSETS:
+    urlpatterns += [
+        re_path(rf'^{settings.STATIC_URL.lstrip("/")}(?P<path>.+)$', assets.serve_static),
+        re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$', assets.serve_media),
+    ]
+
 handler404 = 'pages.views.page_not_found'
 handler500 = 'pages.views.page_internal_server_error'
@@ -0,0 +1,203 @@
+"""
+Прогрев процесса перед первыми запросами.
+
+Вызывается из ``wsgi.py`` и ``asgi.py`` после загрузки Django. Без него
+первые запросы нового процесса платят за компиляцию шаблонов, разбор
+шаблонов URL и подключение к базе. Этапы:
+
+* компиляция всех шаблонов из ``templates/`` (они остаются в кэширующем
+  загрузчике);
+* ``reverse`` и ``resolve`` всех именованных URL ``doctors`` и ``pages``;
+* подключение к основной базе и репликам: в текущем потоке для WSGI
+  и во всех потоках пула ``doctors.aio`` для ASGI с асинхронными view
+  (``ASYNC_BOOKING_VIEWS``). Пул не переживает ``fork``, поэтому
+  при ``--preload`` рабочий процесс прогревает свой пул сразу после
+  ``fork``, не дожидаясь подключений;
+* по желанию — свободное время на сегодня для ``WARMUP_AVAILABILITY_DOCTORS``
+  самых загруженных врачей, пока не истёк ``WARMUP_BUDGET_SECONDS``.
+
+Время каждого этапа пишется одной JSON-строкой в журнал ``hospital.warmup``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template import engines
+from django.urls import converters, get_resolver, resolve, reverse
+
+
+logger = logging.getLogger("hospital.warmup")
+
+URL_NAMESPACES = ("doctors", "pages")
+# Значения для построения URL с параметрами; другие конвертеры пропускаются.
+SAMPLE_ARGUMENTS = {
+    converters.IntConverter: 1,
+    converters.SlugConverter: "warmup",
+    converters.StringConverter: "warmup",
+    converters.PathConverter: "warmup",
+}
+
+# Последний отчёт о прогреве в этом процессе.
+report = {}
+_fork_hook = []
+
+
+def warm_templates():
+    """
+    Компилирует шаблоны из каталогов ``DIRS``. Возвращает их число
+    и имена шаблонов, которые не компилируются.
+    """
+    count, failed = 0, []
+    for engine in engines.all():
+        for directory in getattr(engine, "dirs", ()):
+            for path in sorted(Path(directory).rglob("*")):
+                if not path.is_file():
+                    continue
+                name = path.relative_to(directory).as_posix()
+                try:
+                    engine.get_template(name)
+                except Exception as error:
+                    logger.warning("Шаблон %s не компилируется: %s", name, error)
+                    failed.append(name)
+                    continue
+                count += 1
+    return {"count": count, "failed": failed}
+
+
+def warm_urls():
+    """Строит и разбирает пример каждого именованного URL; возвращает их число."""
+    resolver = get_resolver()
+    count = 0
+    for namespace in URL_NAMESPACES:
+        _, namespace_resolver = resolver.namespace_dict[namespace]
+        for pattern in namespace_resolver.url_patterns:
+            name = getattr(pattern, "name", None)
+            if not name:
+                continue
+            kwargs = {
+                key: SAMPLE_ARGUMENTS.get(type(converter))
+                for key, converter in pattern.pattern.converters.items()
+            }
+            if None in kwargs.values():
+                continue
+            resolve(reverse(f"{namespace}:{name}", kwargs=kwargs))
+            count += 1
+    return count
+
+
+def database_aliases():
+    return ["default", *getattr(settings, "DATABASE_REPLICAS", ())]
+
+
+def connect_databases():
+    for alias in database_aliases():
+        connections[alias].ensure_connection()
+
+
+def warm_connections(async_pool=False, wait=True):
+    """
+    Подключается к базам; для ASGI — в каждом потоке пула ``doctors.aio``.
+    Возвращает число подготовленных потоков (без ``wait`` — запущенных).
+    """
+    if not async_pool:
+        connect_databases()
+        return 1
+
+    from doctors import aio
+
+    executor = aio.get_executor()
+    workers = getattr(settings, "ASYNC_DB_WORKERS", 8)
+    # Барьер не даёт одному потоку взять несколько задач: пул создаёт все потоки.
+    barrier = threading.Barrier(workers, timeout=5)
+
+    def connect():
+        connect_databases()
+        barrier.wait()
+
+    futures = [executor.submit(connect) for _ in range(workers)]
+    if not wait:
+        return len(futures)
+    return sum(1 for future in futures if future.exception() is None)
+
+
+def warm_availability(limit, deadline):
+    """Свободное время на сегодня для ``limit`` самых загруженных врачей."""
+    from django.utils import timezone
+
+    from doctors.models import Doctor, DoctorDayStats
+    from doctors.slots import get_cached_free_slots_range
+    from doctors.views import AVAILABILITY_DEFAULT_DAYS
+
+    today = timezone.localdate()
+    busiest = list(
+        DoctorDayStats.objects.filter(date=today, doctor__is_published=True)
+        .order_by("-scheduled")
+        .values_list("doctor_id", flat=True)[:limit]
+    )
+    if len(busiest) < limit:
+        busiest += list(
+            Doctor.objects.filter(is_published=True)
+            .exclude(pk__in=busiest)
+            .values_list("pk", flat=True)[:limit - len(busiest)]
+        )
+    count = 0
+    for doctor_id in busiest:
+        if time.perf_counter() > deadline:
+            break
+        get_cached_free_slots_range(Doctor(pk=doctor_id), today, AVAILABILITY_DEFAULT_DAYS)
+        count += 1
+    return count
+
+
+def warm_up(started=None, async_pool=False):
+    """Выполняет все этапы прогрева и пишет отчёт; возвращает его."""
+    if not getattr(settings, "WARMUP", True):
+        return {}
+    begin = time.perf_counter()
+    deadline = begin + getattr(settings, "WARMUP_BUDGET_SECONDS", 10)
+    # Пул нужен только асинхронным view.
+    async_pool = async_pool and getattr(settings, "ASYNC_BOOKING_VIEWS", False)
+    stages = [
+        ("templates", warm_templates),
+        ("urls", warm_urls),
+        ("databases", lambda: warm_connections(async_pool)),
+    ]
+    limit = getattr(settings, "WARMUP_AVAILABILITY_DOCTORS", 0)
+    if limit:
+        stages.append(("availability", lambda: warm_availability(limit, deadline)))
+
+    result = {"event": "warmup", "pid": os.getpid()}
+    if started is not None:
+        result["django_setup_ms"] = round((begin - started) * 1000, 1)
+    for name, stage in stages:
+        stage_started = time.perf_counter()
+        try:
+            outcome = stage()
+        except Exception:
+            # Прогрев не должен мешать процессу начать обслуживать запросы.
+            logger.exception("Этап прогрева %s не выполнен", name)
+            outcome = None
+        result[name] = outcome if isinstance(outcome, dict) else {"count": outcome}
+        result[name]["ms"] = round((time.perf_counter() - stage_started) * 1000, 1)
+    finished = time.perf_counter()
+    result["warmup_ms"] = round((finished - begin) * 1000, 1)
+    if started is not None:
+        result["total_ms"] = round((finished - started) * 1000, 1)
+
+    if not _fork_hook:
+        # Подключения, открытые до fork (gunicorn --preload), не должны
+        # достаться дочерним процессам, а пул дочерний процесс создаёт свой.
+        os.register_at_fork(before=connections.close_all)
+        if async_pool:
+            # Регистрируется после сброса пула в doctors.aio и вызывается за ним.
+            os.register_at_fork(after_in_child=lambda: warm_connections(True, wait=False))
+        _fork_hook.append(True)
+    report.clear()
+    report.update(result)
+    logger.info(json.dumps(result, ensure_ascii=False))
+    return result
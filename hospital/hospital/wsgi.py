@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/3.2/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
+started = time.perf_counter()
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'hospital.settings')
 
 application = get_wsgi_application()
+
+from hospital.warmup import warm_up  # noqa: E402 - нужен настроенный Django
+
+warm_up(started)